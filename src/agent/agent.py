@@ -1,11 +1,14 @@
 import abc
-import collections
-import dataclasses
 import math
 import numpy
 
 from typing import Tuple
 
+from src.agent import (
+    detector as detector_module,
+    quantile_index as quantile_index_module,
+    window as window_module,
+)
 from src.prob import rv
 from src.utils.debug import *
 
@@ -31,110 +34,591 @@ class Agent(abc.ABC):
     def observe(self, arm_id: int, reward: float):
         pass
 
+    # Returns `num_actions` independent actions as an int array.
+    @abc.abstractmethod
+    def next_actions(self, num_actions: int) -> numpy.ndarray:
+        pass
+
+    # Applies `observe(arm_id, reward)` for each pair in order.
+    @abc.abstractmethod
+    def observe_batch(self, arm_ids: numpy.ndarray, rewards: numpy.ndarray):
+        pass
+
+
+def to_arm_id_and_reward_arrays(arm_ids, rewards) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    arm_id_array = numpy.asarray(arm_ids, dtype=numpy.int64).ravel()
+    reward_array = numpy.asarray(rewards, dtype=float).ravel()
+    check(
+        arm_id_array.shape == reward_array.shape,
+        "`arm_ids` and `rewards` should have the same length",
+        num_arm_ids=len(arm_id_array),
+        num_rewards=len(reward_array),
+    )
+
+    return arm_id_array, reward_array
+
 
 class ThompsonSamplingAgent(Agent):
-    def __init__(self, name: str, num_arms: int):
+    # If `tail_tolerance` is set, actions are chosen with an `UpperQuantileIndex`, which
+    # draws samples only for the arms that could win rather than for every arm.
+    # If `min_reward` is set, e.g., to 0 for positive rewards, reward samples are drawn from
+    # Normal(mean, stdev) truncated to [min_reward, inf).
+    def __init__(
+        self,
+        name: str,
+        num_arms: int,
+        rng: numpy.random.Generator = None,
+        tail_tolerance: float = None,
+        min_reward: float = None,
+    ):
         super().__init__(name=name, num_arms=num_arms)
+        check(
+            tail_tolerance is None or min_reward is None,
+            "`min_reward` is not supported with `tail_tolerance`",
+            tail_tolerance=tail_tolerance,
+            min_reward=min_reward,
+        )
+
+        # The index draws Normal(mean, stdev) samples, so it would not follow the posterior of
+        # the agents that override `sample_rewards()`.
+        check(
+            tail_tolerance is None or type(self).sample_rewards is ThompsonSamplingAgent.sample_rewards,
+            "`tail_tolerance` is only supported with the Normal(mean, stdev) posterior draw",
+            agent_type=type(self).__name__,
+        )
+
+        self.rng = rng if rng is not None else numpy.random.default_rng()
+        self.tail_tolerance = tail_tolerance
+        self.min_reward = min_reward
+        # Built on the first call to `next_action()`.
+        self.quantile_index = None
 
+    # Returns the per-arm (mean, stdev) arrays of shape (num_arms,).
+    # Note: Returned arrays may be views of the agent state, so they should not be modified.
     @abc.abstractmethod
-    def mean_stdev_reward(self, arm_id: int):
+    def mean_stdev_reward_arrays(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
         pass
 
+    def mean_stdev_reward(self, arm_id: int) -> Tuple[float, float]:
+        mean_array, stdev_array = self.mean_stdev_reward_arrays()
+        return float(mean_array[arm_id]), float(stdev_array[arm_id])
+
+    # Returns reward samples of shape (num_arms,), or (num_samples, num_arms) if `num_samples` is given.
+    def sample_rewards(self, num_samples: int = None) -> numpy.ndarray:
+        mean_array, stdev_array = self.mean_stdev_reward_arrays()
+        size = None if num_samples is None else (num_samples, self.num_arms)
+        if self.min_reward is not None:
+            return rv.sample_truncated_normal(
+                rng=self.rng, mu=mean_array, sigma=stdev_array, lower=self.min_reward, upper=numpy.inf, size=size
+            )
+
+        return self.rng.normal(loc=mean_array, scale=stdev_array, size=size)
+
     def next_action(self) -> int:
-        # Choose the node with min wait time sample
-        action, max_sample = None, float("-Inf")
-        for arm_id in range(self.num_arms):
-            mean, stdev = self.mean_stdev_reward(arm_id=arm_id)
-            log(DEBUG, f"arm_id= {arm_id}", mean=mean, stdev=stdev)
+        if self.tail_tolerance is not None:
+            if self.quantile_index is None:
+                mean_array, stdev_array = self.mean_stdev_reward_arrays()
+                self.quantile_index = quantile_index_module.UpperQuantileIndex(
+                    mean_array=mean_array,
+                    stdev_array=stdev_array,
+                    tail_tolerance=self.tail_tolerance,
+                )
+
+            return self.quantile_index.next_action(rng=self.rng)
 
-            # s = rv.TruncatedNormal(mu=mean, sigma=stdev).sample()
-            s = rv.Normal(mu=mean, sigma=stdev).sample()
-            if s > max_sample:
-                max_sample = s
-                action = arm_id
-                # log(DEBUG, "s > max_sample", s=s, max_sample=max_sample, action=action)
+        # Choose the arm with the max reward sample
+        return int(numpy.argmax(self.sample_rewards()))
 
-        return action
+    def next_actions(self, num_actions: int) -> numpy.ndarray:
+        if self.tail_tolerance is not None:
+            return numpy.array([self.next_action() for _ in range(num_actions)], dtype=numpy.int64)
 
+        return numpy.argmax(self.sample_rewards(num_samples=num_actions), axis=1)
 
-@dataclasses.dataclass
-class RewardRecord:
-    count: int = dataclasses.field(default=0)
-    E_reward: float = dataclasses.field(default=0)
-    E_reward_2: float = dataclasses.field(default=0)
+    # Should be called by the subclasses after the stats of the arms in `arm_id_array` change.
+    def update_quantile_index(self, arm_id_array: numpy.ndarray):
+        if self.quantile_index is None:
+            return
 
-    def update(self, reward: float):
-        self.E_reward = (self.count * self.E_reward + reward) / (self.count + 1)
-        self.E_reward_2 = (self.count * self.E_reward_2 + reward**2) / (self.count + 1)
-        self.count += 1
+        mean_stdev_list = [self.mean_stdev_reward(arm_id=arm_id) for arm_id in arm_id_array.tolist()]
+        for arm_id, (mean, stdev) in zip(arm_id_array.tolist(), mean_stdev_list):
+            self.quantile_index.update(arm_id=arm_id, mean=mean, stdev=stdev)
 
 
 class ThompsonSamplingAgent_full(ThompsonSamplingAgent):
-    def __init__(self, name: str, num_arms: int):
-        super().__init__(name=name, num_arms=num_arms)
+    # Keeps the per-arm reward stats in contiguous (count, mean, M2) arrays updated with
+    # Welford's algorithm, where M2 is the sum of squared deviations from the mean.
+    # `dtype=numpy.float32` halves the memory, e.g., 12 MB for 1M arms.
+    def __init__(
+        self,
+        name: str,
+        num_arms: int,
+        rng: numpy.random.Generator = None,
+        tail_tolerance: float = None,
+        min_reward: float = None,
+        dtype: numpy.dtype = numpy.float64,
+    ):
+        super().__init__(name=name, num_arms=num_arms, rng=rng, tail_tolerance=tail_tolerance, min_reward=min_reward)
+
+        self.dtype = numpy.dtype(dtype)
+        check(self.dtype in (numpy.float32, numpy.float64), "`dtype` should be float32 or float64", dtype=dtype)
+        count_dtype = numpy.int32 if self.dtype == numpy.float32 else numpy.int64
+
+        self.count_array = numpy.zeros(num_arms, dtype=count_dtype)
+        self.mean_array = numpy.zeros(num_arms, dtype=self.dtype)
+        self.M2_array = numpy.zeros(num_arms, dtype=self.dtype)
 
-        # `reward_tuple` = (count, E_reward, E_reward_2)
-        self.arm_id_to_reward_record_map = {arm_id: RewardRecord() for arm_id in range(num_arms)}
+    def __repr__(self):
+        return (
+            "ThompsonSamplingAgent_full( \n"
+            f"\t name= {self.name} \n"
+            f"\t num_arms= {self.num_arms} \n"
+            f"\t dtype= {self.dtype} \n"
+            ")"
+        )
 
-    def mean_stdev_reward(self, arm_id: str) -> Tuple[float, float]:
-        reward_record = self.arm_id_to_reward_record_map[arm_id]
+    def nbytes(self) -> int:
+        return self.count_array.nbytes + self.mean_array.nbytes + self.M2_array.nbytes
 
-        stdev = 0
-        diff = reward_record.E_reward**2 - reward_record.E_reward_2
-        if diff > 0:
-            stdev = math.sqrt(diff)
-        else:
-            log(DEBUG, f"arm_id= {arm_id}", diff=diff)
+    def mean_stdev_reward_arrays(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        stdev_array = numpy.sqrt(self.M2_array / numpy.maximum(self.count_array, 1))
+        stdev_array[stdev_array == 0] = 1
 
+        return self.mean_array, stdev_array
+
+    def mean_stdev_reward(self, arm_id: int) -> Tuple[float, float]:
+        count = self.count_array[arm_id]
+        stdev = math.sqrt(self.M2_array[arm_id] / count) if count else 0
         if stdev == 0:
             stdev = 1
 
-        return reward_record.E_reward, stdev
+        return float(self.mean_array[arm_id]), stdev
 
     def observe(self, arm_id: int, reward: float):
-        self.arm_id_to_reward_record_map[arm_id].update(reward=reward)
-        log(DEBUG, "recorded", arm_id=arm_id, reward=reward)
+        count = self.count_array[arm_id] + 1
+        mean = self.mean_array[arm_id]
+        delta = reward - mean
+        mean += delta / count
+
+        self.count_array[arm_id] = count
+        self.mean_array[arm_id] = mean
+        self.M2_array[arm_id] += delta * (reward - mean)
+        if self.quantile_index is not None:
+            self.update_quantile_index(arm_id_array=numpy.array([arm_id]))
+
+    def observe_batch(self, arm_ids: numpy.ndarray, rewards: numpy.ndarray):
+        arm_id_array, reward_array = to_arm_id_and_reward_arrays(arm_ids, rewards)
+
+        # Compute the (count, mean, M2) of the batch per arm, and merge them into the
+        # current stats with the parallel variant of Welford's algorithm (Chan et al.).
+        batch_count_array = numpy.bincount(arm_id_array, minlength=self.num_arms)
+        touched = batch_count_array > 0
+        batch_mean_array = numpy.bincount(arm_id_array, weights=reward_array, minlength=self.num_arms).astype(numpy.float64)
+        batch_mean_array[touched] /= batch_count_array[touched]
+        batch_M2_array = numpy.bincount(
+            arm_id_array, weights=(reward_array - batch_mean_array[arm_id_array])**2, minlength=self.num_arms
+        )
 
+        count_array = self.count_array[touched].astype(numpy.float64)
+        batch_count_array = batch_count_array[touched]
+        new_count_array = count_array + batch_count_array
+        delta_array = batch_mean_array[touched] - self.mean_array[touched]
+
+        self.mean_array[touched] += delta_array * batch_count_array / new_count_array
+        self.M2_array[touched] += batch_M2_array[touched] + delta_array**2 * count_array * batch_count_array / new_count_array
+        self.count_array[touched] = new_count_array
+        self.update_quantile_index(arm_id_array=numpy.flatnonzero(touched))
+
+
+class ThompsonSamplingAgent_betaBernoulli(ThompsonSamplingAgent):
+    # Beta(alpha, beta) posterior over the success probability of each arm.
+    # Rewards are expected in [0, 1]; a fractional reward `r` counts as `r` successes
+    # and `1 - r` failures.
+    def __init__(
+        self,
+        name: str,
+        num_arms: int,
+        rng: numpy.random.Generator = None,
+        alpha_0: float = 1,
+        beta_0: float = 1,
+    ):
+        super().__init__(name=name, num_arms=num_arms, rng=rng)
+
+        self.alpha_0 = alpha_0
+        self.beta_0 = beta_0
+
+        self.alpha_array = numpy.full(num_arms, alpha_0, dtype=numpy.float64)
+        self.beta_array = numpy.full(num_arms, beta_0, dtype=numpy.float64)
 
-class ThompsonSamplingAgent_wWin(ThompsonSamplingAgent):
-    def __init__(self, name: str, num_arms: int, win_len: int):
-        super().__init__(name=name, num_arms=num_arms)
+    def __repr__(self):
+        return (
+            "ThompsonSamplingAgent_betaBernoulli( \n"
+            f"\t name= {self.name} \n"
+            f"\t num_arms= {self.num_arms} \n"
+            f"\t alpha_0= {self.alpha_0} \n"
+            f"\t beta_0= {self.beta_0} \n"
+            ")"
+        )
 
-        self.win_len = win_len
+    def posterior_mean_stdev(self, index) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        alpha, beta = self.alpha_array[index], self.beta_array[index]
+        alpha_plus_beta = alpha + beta
+        return alpha / alpha_plus_beta, numpy.sqrt(alpha * beta / (alpha_plus_beta**2 * (alpha_plus_beta + 1)))
 
-        self.arm_id_to_reward_queue_map = {
-            arm_id: collections.deque(maxlen=win_len) for arm_id in range(self.num_arms)
-        }
+    def mean_stdev_reward_arrays(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        return self.posterior_mean_stdev(index=slice(None))
 
-    def mean_stdev_reward(self, arm_id: str) -> Tuple[float, float]:
-        reward_queue = self.arm_id_to_reward_queue_map[arm_id]
-        mean = numpy.mean(reward_queue) if len(reward_queue) else 0
-        stdev = numpy.std(reward_queue) if len(reward_queue) else 1
-        check(stdev >= 0, "Stdev cannot be negative")
-        if stdev == 0:
-            stdev = 1
+    def mean_stdev_reward(self, arm_id: int) -> Tuple[float, float]:
+        mean, stdev = self.posterior_mean_stdev(index=arm_id)
+        return float(mean), float(stdev)
 
-        return mean, stdev
+    def sample_rewards(self, num_samples: int = None) -> numpy.ndarray:
+        size = None if num_samples is None else (num_samples, self.num_arms)
+        return self.rng.beta(self.alpha_array, self.beta_array, size=size)
 
-    def next_action(self) -> int:
-        # Choose the node with min wait time sample
-        action, max_sample = None, float("-Inf")
-        for arm_id in range(self.num_arms):
-            mean, stdev = self.mean_stdev_reward(arm_id=arm_id)
+    def observe(self, arm_id: int, reward: float):
+        self.alpha_array[arm_id] += reward
+        self.beta_array[arm_id] += 1 - reward
+        if self.quantile_index is not None:
+            self.update_quantile_index(arm_id_array=numpy.array([arm_id]))
+
+    def observe_batch(self, arm_ids: numpy.ndarray, rewards: numpy.ndarray):
+        arm_id_array, reward_array = to_arm_id_and_reward_arrays(arm_ids, rewards)
+
+        self.alpha_array += numpy.bincount(arm_id_array, weights=reward_array, minlength=self.num_arms)
+        self.beta_array += numpy.bincount(arm_id_array, weights=1 - reward_array, minlength=self.num_arms)
+        self.update_quantile_index(arm_id_array=numpy.unique(arm_id_array))
+
+
+class ThompsonSamplingAgent_normalGamma(ThompsonSamplingAgent_full):
+    # Normal-Gamma(mu_0, kappa_0, alpha_0, beta_0) posterior over the (mean, precision) of
+    # the Normal reward distribution of each arm. Posterior parameters are computed from the
+    # Welford (count, mean, M2) stats kept by `ThompsonSamplingAgent_full`, and the samples
+    # are drawn for the mean reward.
+    def __init__(
+        self,
+        name: str,
+        num_arms: int,
+        rng: numpy.random.Generator = None,
+        dtype: numpy.dtype = numpy.float64,
+        mu_0: float = 0,
+        kappa_0: float = 1,
+        alpha_0: float = 1,
+        beta_0: float = 1,
+    ):
+        super().__init__(name=name, num_arms=num_arms, rng=rng, dtype=dtype)
+
+        self.mu_0 = mu_0
+        self.kappa_0 = kappa_0
+        self.alpha_0 = alpha_0
+        self.beta_0 = beta_0
+
+    def __repr__(self):
+        return (
+            "ThompsonSamplingAgent_normalGamma( \n"
+            f"\t name= {self.name} \n"
+            f"\t num_arms= {self.num_arms} \n"
+            f"\t mu_0= {self.mu_0} \n"
+            f"\t kappa_0= {self.kappa_0} \n"
+            f"\t alpha_0= {self.alpha_0} \n"
+            f"\t beta_0= {self.beta_0} \n"
+            ")"
+        )
+
+    # Returns the posterior parameters (mu_n, kappa_n, alpha_n, beta_n).
+    def posterior_params(self, index) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        count = self.count_array[index].astype(numpy.float64)
+        mean = self.mean_array[index]
+        M2 = self.M2_array[index]
+
+        kappa_n = self.kappa_0 + count
+        mu_n = (self.kappa_0 * self.mu_0 + count * mean) / kappa_n
+        alpha_n = self.alpha_0 + count / 2
+        beta_n = self.beta_0 + M2 / 2 + self.kappa_0 * count * (mean - self.mu_0)**2 / (2 * kappa_n)
+        return mu_n, kappa_n, alpha_n, beta_n
+
+    def posterior_mean_stdev(self, index) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        mu_n, kappa_n, alpha_n, beta_n = self.posterior_params(index=index)
+        # Marginal posterior of the mean is Student-t with `2 * alpha_n` degrees of freedom.
+        # Its variance is infinite for `alpha_n <= 1`, where the stdev of the Gaussian
+        # approximation with the same scale is returned instead.
+        scale_2 = beta_n / (alpha_n * kappa_n)
+        var = numpy.where(alpha_n > 1, beta_n / (kappa_n * numpy.maximum(alpha_n - 1, 1e-12)), scale_2)
+        return mu_n, numpy.sqrt(var)
+
+    def mean_stdev_reward_arrays(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        return self.posterior_mean_stdev(index=slice(None))
+
+    def mean_stdev_reward(self, arm_id: int) -> Tuple[float, float]:
+        mean, stdev = self.posterior_mean_stdev(index=arm_id)
+        return float(mean), float(stdev)
+
+    def sample_rewards(self, num_samples: int = None) -> numpy.ndarray:
+        mu_n, kappa_n, alpha_n, beta_n = self.posterior_params(index=slice(None))
+        size = None if num_samples is None else (num_samples, self.num_arms)
+
+        precision = self.rng.gamma(shape=alpha_n, scale=1 / beta_n, size=size)
+        return self.rng.normal(loc=mu_n, scale=1 / numpy.sqrt(kappa_n * precision))
+
+
+class ThompsonSamplingAgent_gammaPoisson(ThompsonSamplingAgent):
+    # Gamma(alpha, beta) posterior over the Poisson rate of each arm, where `beta` is the rate
+    # parameter. Rewards are expected to be counts.
+    def __init__(
+        self,
+        name: str,
+        num_arms: int,
+        rng: numpy.random.Generator = None,
+        alpha_0: float = 1,
+        beta_0: float = 1,
+    ):
+        super().__init__(name=name, num_arms=num_arms, rng=rng)
+
+        self.alpha_0 = alpha_0
+        self.beta_0 = beta_0
+
+        self.alpha_array = numpy.full(num_arms, alpha_0, dtype=numpy.float64)
+        self.beta_array = numpy.full(num_arms, beta_0, dtype=numpy.float64)
+
+    def __repr__(self):
+        return (
+            "ThompsonSamplingAgent_gammaPoisson( \n"
+            f"\t name= {self.name} \n"
+            f"\t num_arms= {self.num_arms} \n"
+            f"\t alpha_0= {self.alpha_0} \n"
+            f"\t beta_0= {self.beta_0} \n"
+            ")"
+        )
+
+    def posterior_mean_stdev(self, index) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        alpha, beta = self.alpha_array[index], self.beta_array[index]
+        return alpha / beta, numpy.sqrt(alpha) / beta
+
+    def mean_stdev_reward_arrays(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        return self.posterior_mean_stdev(index=slice(None))
 
-            # s = rv.TruncatedNormal(mu=mean, sigma=stdev).sample()
-            s = rv.Normal(mu=mean, sigma=stdev).sample()
-            if s > max_sample:
-                max_sample = s
-                action = arm_id
-                # log(DEBUG, "s > max_sample", s=s, max_sample=max_sample, action=action)
+    def mean_stdev_reward(self, arm_id: int) -> Tuple[float, float]:
+        mean, stdev = self.posterior_mean_stdev(index=arm_id)
+        return float(mean), float(stdev)
 
-        return action
+    def sample_rewards(self, num_samples: int = None) -> numpy.ndarray:
+        size = None if num_samples is None else (num_samples, self.num_arms)
+        return self.rng.gamma(shape=self.alpha_array, scale=1 / self.beta_array, size=size)
+
+    def observe(self, arm_id: int, reward: float):
+        self.alpha_array[arm_id] += reward
+        self.beta_array[arm_id] += 1
+        if self.quantile_index is not None:
+            self.update_quantile_index(arm_id_array=numpy.array([arm_id]))
+
+    def observe_batch(self, arm_ids: numpy.ndarray, rewards: numpy.ndarray):
+        arm_id_array, reward_array = to_arm_id_and_reward_arrays(arm_ids, rewards)
+
+        self.alpha_array += numpy.bincount(arm_id_array, weights=reward_array, minlength=self.num_arms)
+        self.beta_array += numpy.bincount(arm_id_array, minlength=self.num_arms)
+        self.update_quantile_index(arm_id_array=numpy.unique(arm_id_array))
+
+
+class ThompsonSamplingAgent_discounted(ThompsonSamplingAgent):
+    # Handles non-stationary rewards by exponentially forgetting the past: the reward observed
+    # `k` rounds ago has weight `discount**k`. Keeps the decayed (count, mean, M2) per arm, so
+    # the memory is O(1) per arm unlike the windowed agents.
+    # Every observation is a round. Decay is applied lazily: an arm is decayed only when it is
+    # observed, by `discount**(rounds since its last observation)`. Mean and stdev are ratios of
+    # decayed sums, so they are not changed by the decay and untouched arms cost nothing.
+    def __init__(
+        self,
+        name: str,
+        num_arms: int,
+        discount: float,
+        rng: numpy.random.Generator = None,
+        tail_tolerance: float = None,
+        min_reward: float = None,
+    ):
+        super().__init__(name=name, num_arms=num_arms, rng=rng, tail_tolerance=tail_tolerance, min_reward=min_reward)
+
+        check(0 < discount <= 1, "`discount` should be in (0, 1]", discount=discount)
+        self.discount = discount
+
+        self.round_index = 0
+        self.last_round_index_array = numpy.zeros(num_arms, dtype=numpy.int64)
+        self.count_array = numpy.zeros(num_arms)
+        self.mean_array = numpy.zeros(num_arms)
+        self.M2_array = numpy.zeros(num_arms)
+        # Updated on `observe()`, so that `next_action()` does not compute it over all arms.
+        self.stdev_array = numpy.ones(num_arms)
+
+    def __repr__(self):
+        return (
+            "ThompsonSamplingAgent_discounted( \n"
+            f"\t name= {self.name} \n"
+            f"\t num_arms= {self.num_arms} \n"
+            f"\t discount= {self.discount} \n"
+            ")"
+        )
+
+    def nbytes(self) -> int:
+        return (
+            self.last_round_index_array.nbytes
+            + self.count_array.nbytes
+            + self.mean_array.nbytes
+            + self.M2_array.nbytes
+            + self.stdev_array.nbytes
+        )
+
+    # Returns the decayed counts as of the current round.
+    def effective_count_array(self) -> numpy.ndarray:
+        return self.count_array * self.discount ** (self.round_index - self.last_round_index_array)
+
+    def mean_stdev_reward_arrays(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        return self.mean_array, self.stdev_array
+
+    def observe(self, arm_id: int, reward: float):
+        self.round_index += 1
+        decay = self.discount ** (self.round_index - self.last_round_index_array[arm_id])
+        self.last_round_index_array[arm_id] = self.round_index
+
+        # Weighted Welford update with weight 1 for the new reward.
+        count = self.count_array[arm_id] * decay + 1
+        mean = self.mean_array[arm_id]
+        delta = reward - mean
+        mean += delta / count
+
+        self.count_array[arm_id] = count
+        self.mean_array[arm_id] = mean
+        M2 = self.M2_array[arm_id] * decay + delta * (reward - mean)
+        self.M2_array[arm_id] = M2
+        stdev = math.sqrt(max(M2, 0) / count)
+        self.stdev_array[arm_id] = stdev if stdev > 0 else 1
+        if self.quantile_index is not None:
+            self.update_quantile_index(arm_id_array=numpy.array([arm_id]))
+
+    def observe_batch(self, arm_ids: numpy.ndarray, rewards: numpy.ndarray):
+        arm_id_array, reward_array = to_arm_id_and_reward_arrays(arm_ids, rewards)
+        if len(arm_id_array) == 0:
+            return
+
+        round_index_array = self.round_index + 1 + numpy.arange(len(arm_id_array))
+        self.round_index = int(round_index_array[-1])
+
+        # Compute the weighted (count, mean, M2) of the batch per arm as of the last round the
+        # arm is observed in the batch, and merge them into the decayed current stats.
+        batch_last_round_index_array = self.last_round_index_array.copy()
+        numpy.maximum.at(batch_last_round_index_array, arm_id_array, round_index_array)
+        weight_array = self.discount ** (batch_last_round_index_array[arm_id_array] - round_index_array)
+
+        batch_count_array = numpy.bincount(arm_id_array, weights=weight_array, minlength=self.num_arms)
+        touched = numpy.bincount(arm_id_array, minlength=self.num_arms) > 0
+        batch_mean_array = numpy.bincount(arm_id_array, weights=weight_array * reward_array, minlength=self.num_arms)
+        batch_mean_array[touched] /= batch_count_array[touched]
+        batch_M2_array = numpy.bincount(
+            arm_id_array, weights=weight_array * (reward_array - batch_mean_array[arm_id_array])**2, minlength=self.num_arms
+        )
+
+        decay_array = self.discount ** (batch_last_round_index_array[touched] - self.last_round_index_array[touched])
+        count_array = self.count_array[touched] * decay_array
+        batch_count_array = batch_count_array[touched]
+        new_count_array = count_array + batch_count_array
+        delta_array = batch_mean_array[touched] - self.mean_array[touched]
+
+        self.mean_array[touched] += delta_array * batch_count_array / new_count_array
+        self.M2_array[touched] = (
+            self.M2_array[touched] * decay_array
+            + batch_M2_array[touched]
+            + delta_array**2 * count_array * batch_count_array / new_count_array
+        )
+        self.count_array[touched] = new_count_array
+        stdev_array = numpy.sqrt(numpy.maximum(self.M2_array[touched], 0) / new_count_array)
+        self.stdev_array[touched] = numpy.where(stdev_array > 0, stdev_array, 1)
+        self.last_round_index_array = batch_last_round_index_array
+        self.update_quantile_index(arm_id_array=numpy.flatnonzero(touched))
+
+
+class ThompsonSamplingAgent_wWin(ThompsonSamplingAgent):
+    def __init__(
+        self,
+        name: str,
+        num_arms: int,
+        win_len: int,
+        rng: numpy.random.Generator = None,
+        tail_tolerance: float = None,
+        min_reward: float = None,
+        window_backend: window_module.WindowBackend = window_module.WindowBackend.ring_buffer,
+    ):
+        super().__init__(name=name, num_arms=num_arms, rng=rng, tail_tolerance=tail_tolerance, min_reward=min_reward)
+
+        self.win_len = win_len
+        self.window_backend = window_backend
+
+        self.reward_window = window_module.get_reward_window(
+            window_backend=window_backend,
+            num_arms=num_arms,
+            win_len=win_len,
+        )
+
+        # Per-arm stats are updated only when the window of an arm changes,
+        # so that `next_action()` does not need to go over the windows.
+        self.mean_array = numpy.zeros(num_arms)
+        self.stdev_array = numpy.ones(num_arms)
+
+    def update_mean_stdev_reward(self, arm_id: int):
+        mean, stdev = 0, 1
+        mean_stdev = self.reward_window.mean_stdev_reward(arm_id=arm_id)
+        if mean_stdev is not None:
+            mean, stdev = mean_stdev
+            check(stdev >= 0, "Stdev cannot be negative")
+            if stdev == 0:
+                stdev = 1
+
+        self.mean_array[arm_id] = mean
+        self.stdev_array[arm_id] = stdev
+        if self.quantile_index is not None:
+            self.quantile_index.update(arm_id=arm_id, mean=mean, stdev=stdev)
+
+    def record_reward(self, arm_id: int, reward: float):
+        self.reward_window.append(arm_id=arm_id, reward=reward)
+        self.update_mean_stdev_reward(arm_id=arm_id)
+
+    def clear_rewards(self, arm_id: int):
+        self.reward_window.clear(arm_id=arm_id)
+        self.update_mean_stdev_reward(arm_id=arm_id)
+
+    def record_reward_batch(self, arm_id_array: numpy.ndarray, reward_array: numpy.ndarray):
+        self.reward_window.append_batch(arm_id_array=arm_id_array, reward_array=reward_array)
+
+        touched_arm_id_array = numpy.unique(arm_id_array)
+        num_rewards_array, mean_array, stdev_array = self.reward_window.mean_stdev_reward_arrays(
+            arm_id_array=touched_arm_id_array
+        )
+        stdev_array[(num_rewards_array == 0) | (stdev_array == 0)] = 1
+        self.mean_array[touched_arm_id_array] = mean_array
+        self.stdev_array[touched_arm_id_array] = stdev_array
+        self.update_quantile_index(arm_id_array=touched_arm_id_array)
+
+    def mean_stdev_reward_arrays(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        return self.mean_array, self.stdev_array
 
 
 class ThompsonSamplingAgent_slidingWin(ThompsonSamplingAgent_wWin):
-    def __init__(self, name: str, num_arms: int, win_len: int):
-        super().__init__(name=name, num_arms=num_arms, win_len=win_len)
+    def __init__(
+        self,
+        name: str,
+        num_arms: int,
+        win_len: int,
+        rng: numpy.random.Generator = None,
+        tail_tolerance: float = None,
+        min_reward: float = None,
+        window_backend: window_module.WindowBackend = window_module.WindowBackend.ring_buffer,
+    ):
+        super().__init__(
+            name=name,
+            num_arms=num_arms,
+            win_len=win_len,
+            rng=rng,
+            tail_tolerance=tail_tolerance,
+            min_reward=min_reward,
+            window_backend=window_backend,
+        )
 
     def __repr__(self):
         return (
@@ -146,42 +630,112 @@ class ThompsonSamplingAgent_slidingWin(ThompsonSamplingAgent_wWin):
         )
 
     def observe(self, arm_id: int, reward: float):
-        self.arm_id_to_reward_queue_map[arm_id].append(reward)
-        log(DEBUG, "recorded", arm_id=arm_id, reward=reward)
+        self.record_reward(arm_id=arm_id, reward=reward)
+
+    def observe_batch(self, arm_ids: numpy.ndarray, rewards: numpy.ndarray):
+        arm_id_array, reward_array = to_arm_id_and_reward_arrays(arm_ids, rewards)
+        self.record_reward_batch(arm_id_array=arm_id_array, reward_array=reward_array)
 
 
 class ThompsonSamplingAgent_resetWinOnRareEvent(ThompsonSamplingAgent_wWin):
-    def __init__(self, name: str, num_arms: int, win_len: int, tail_mass_threshold: float):
-        super().__init__(name=name, num_arms=num_arms, win_len=win_len)
+    # Clears the window of an arm once `change_detector` signals a change in its rewards.
+    # Defaults to `GaussianTailDetector(tail_mass_threshold)`.
+    def __init__(
+        self,
+        name: str,
+        num_arms: int,
+        win_len: int,
+        tail_mass_threshold: float = None,
+        rng: numpy.random.Generator = None,
+        tail_tolerance: float = None,
+        min_reward: float = None,
+        window_backend: window_module.WindowBackend = window_module.WindowBackend.ring_buffer,
+        change_detector: detector_module.ChangeDetector = None,
+        min_num_rewards_to_detect: int = 5,
+    ):
+        super().__init__(
+            name=name,
+            num_arms=num_arms,
+            win_len=win_len,
+            rng=rng,
+            tail_tolerance=tail_tolerance,
+            min_reward=min_reward,
+            window_backend=window_backend,
+        )
 
         self.tail_mass_threshold = tail_mass_threshold
+        self.min_num_rewards_to_detect = min_num_rewards_to_detect
+
+        if change_detector is None:
+            check(tail_mass_threshold is not None, "Either `tail_mass_threshold` or `change_detector` should be given")
+            change_detector = detector_module.GaussianTailDetector(
+                num_arms=num_arms,
+                tail_mass_threshold=tail_mass_threshold,
+            )
+        self.change_detector = change_detector
 
     def __repr__(self):
         return (
             "ThompsonSamplingAgent_resetWinOnRareEvent( \n"
             f"\t num_arms= {self.num_arms} \n"
             f"\t win_len= {self.win_len} \n"
+            f"\t change_detector= {self.change_detector} \n"
             ")"
         )
 
-    def observe(self, arm_id: int, reward: float):
-        def record():
-            self.arm_id_to_reward_queue_map[arm_id].append(reward)
-            log(DEBUG, "recorded", arm_id=arm_id, reward=reward)
+    def reset_window(self, arm_id: int):
+        self.clear_rewards(arm_id=arm_id)
+        self.change_detector.reset(arm_id=arm_id)
 
-        if len(self.arm_id_to_reward_queue_map[arm_id]) < 5:
-            record()
+    def observe(self, arm_id: int, reward: float):
+        if self.reward_window.num_rewards(arm_id=arm_id) < self.min_num_rewards_to_detect:
+            self.record_reward(arm_id=arm_id, reward=reward)
 
         else:
             mean, stdev = self.mean_stdev_reward(arm_id)
-            # reward_rv = rv.TruncatedNormal(mu=mean, sigma=stdev)
-            reward_rv = rv.Normal(mu=mean, sigma=stdev)
-
-            Pr_getting_larger_than_reward = reward_rv.tail_prob(reward)
-            Pr_getting_smaller_than_reward = reward_rv.cdf(reward)
-            tail_mass = min(Pr_getting_larger_than_reward, Pr_getting_smaller_than_reward)
-            if tail_mass <= self.tail_mass_threshold:
-                log(DEBUG, "Rare event detected", reward=reward, mean=mean, stdev=stdev, tail_mass=tail_mass, tail_mass_threshold=self.tail_mass_threshold)
-                self.arm_id_to_reward_queue_map[arm_id].clear()
+            if self.change_detector.observe(arm_id=arm_id, reward=reward, mean=mean, stdev=stdev):
+                log(DEBUG, "Rare event detected", reward=reward, mean=mean, stdev=stdev, change_detector=self.change_detector)
+                self.reset_window(arm_id=arm_id)
             else:
-                record()
+                self.record_reward(arm_id=arm_id, reward=reward)
+
+    def observe_batch(self, arm_ids: numpy.ndarray, rewards: numpy.ndarray):
+        arm_id_array, reward_array = to_arm_id_and_reward_arrays(arm_ids, rewards)
+
+        # Rewards of different arms do not interact, so each arm is scanned in one vectorized
+        # pass per detected change.
+        order = numpy.argsort(arm_id_array, kind="stable")
+        sorted_arm_id_array = arm_id_array[order]
+        sorted_reward_array = reward_array[order]
+        touched_arm_id_array, start_index_array = numpy.unique(sorted_arm_id_array, return_index=True)
+        end_index_array = numpy.append(start_index_array[1:], len(sorted_arm_id_array))
+
+        for arm_id, start_index, end_index in zip(touched_arm_id_array.tolist(), start_index_array.tolist(), end_index_array.tolist()):
+            arm_reward_array = sorted_reward_array[start_index:end_index]
+            while len(arm_reward_array):
+                num_rewards_array, mean_array, stdev_array = window_module.rolling_mean_stdev_reward(
+                    window_reward_array=self.reward_window.reward_array(arm_id=arm_id),
+                    reward_array=arm_reward_array,
+                    win_len=self.win_len,
+                )
+                stdev_array[stdev_array == 0] = 1
+
+                tested_index_array = numpy.flatnonzero(num_rewards_array >= self.min_num_rewards_to_detect)
+                index = self.change_detector.first_change_index(
+                    arm_id=arm_id,
+                    reward_array=arm_reward_array[tested_index_array],
+                    mean_array=mean_array[tested_index_array],
+                    stdev_array=stdev_array[tested_index_array],
+                )
+                change_index = len(arm_reward_array) if index is None else tested_index_array[index]
+
+                if change_index > 0:
+                    self.record_reward_batch(
+                        arm_id_array=numpy.full(change_index, arm_id),
+                        reward_array=arm_reward_array[:change_index],
+                    )
+                if index is None:
+                    break
+
+                self.reset_window(arm_id=arm_id)
+                arm_reward_array = arm_reward_array[change_index + 1:]
@@ -0,0 +1,134 @@
+import queue
+import threading
+import numpy
+
+from typing import Tuple
+
+from src.agent import agent as agent_module
+from src.utils.debug import *
+
+
+class ConcurrentAgent(agent_module.Agent):
+    # Thread-safe wrapper around a `ThompsonSamplingAgent` for multi-threaded serving.
+    #
+    # Observations are put on a queue and applied by a single writer thread with
+    # `observe_batch()`, so the wrapped agent is never mutated by more than one thread.
+    # After each batch, the writer publishes a copy of the per-arm (mean, stdev) arrays as
+    # the new snapshot. Decisions read the latest snapshot without taking any lock and draw
+    # with a per-thread `numpy.random.Generator`, so they scale with the number of threads
+    # as far as NumPy releases the GIL.
+    #
+    # Note: Decisions are made with the Normal(mean, stdev) draw of `ThompsonSamplingAgent`,
+    # so only the agents that sample from that posterior can be wrapped. Decisions see the
+    # observations only once the writer has applied them (see `flush()`).
+    # If applying a batch fails, the exception is kept and raised from `observe()`,
+    # `observe_batch()`, `flush()` and `close()`.
+    def __init__(
+        self,
+        agent: agent_module.ThompsonSamplingAgent,
+        max_batch_size: int = 1024,
+    ):
+        super().__init__(name=agent.name, num_arms=agent.num_arms)
+        check(
+            type(agent).sample_rewards is agent_module.ThompsonSamplingAgent.sample_rewards and agent.min_reward is None,
+            "Only agents with the Normal(mean, stdev) posterior draw and without `min_reward` can be wrapped",
+            agent=agent,
+        )
+
+        self.agent = agent
+        self.max_batch_size = max_batch_size
+
+        self.snapshot = self.take_snapshot()
+        self.rng_lock = threading.Lock()
+        self.thread_local = threading.local()
+
+        self.writer_exception = None
+        self.observation_queue = queue.Queue()
+        self.writer_thread = threading.Thread(target=self.run_writer, daemon=True)
+        self.writer_thread.start()
+
+    def __repr__(self):
+        return (
+            "ConcurrentAgent( \n"
+            f"\t agent= {self.agent} \n"
+            f"\t max_batch_size= {self.max_batch_size} \n"
+            ")"
+        )
+
+    def take_snapshot(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        mean_array, stdev_array = self.agent.mean_stdev_reward_arrays()
+        return numpy.array(mean_array, dtype=numpy.float64), numpy.array(stdev_array, dtype=numpy.float64)
+
+    def get_rng(self) -> numpy.random.Generator:
+        rng = getattr(self.thread_local, "rng", None)
+        if rng is None:
+            with self.rng_lock:
+                seed = self.agent.rng.integers(2**63)
+            rng = numpy.random.default_rng(seed)
+            self.thread_local.rng = rng
+
+        return rng
+
+    def next_action(self) -> int:
+        mean_array, stdev_array = self.snapshot
+        return int(numpy.argmax(self.get_rng().normal(loc=mean_array, scale=stdev_array)))
+
+    def next_actions(self, num_actions: int) -> numpy.ndarray:
+        mean_array, stdev_array = self.snapshot
+        sample_matrix = self.get_rng().normal(loc=mean_array, scale=stdev_array, size=(num_actions, self.num_arms))
+        return numpy.argmax(sample_matrix, axis=1)
+
+    def raise_writer_exception(self):
+        if self.writer_exception is not None:
+            raise self.writer_exception
+
+    def observe(self, arm_id: int, reward: float):
+        self.raise_writer_exception()
+        self.observation_queue.put((numpy.array([arm_id]), numpy.array([reward], dtype=float)))
+
+    def observe_batch(self, arm_ids: numpy.ndarray, rewards: numpy.ndarray):
+        self.raise_writer_exception()
+        arm_id_array, reward_array = agent_module.to_arm_id_and_reward_arrays(arm_ids, rewards)
+        self.observation_queue.put((arm_id_array, reward_array))
+
+    def run_writer(self):
+        while True:
+            item_list = [self.observation_queue.get()]
+            num_observations = len(item_list[0][0]) if item_list[0] is not None else 0
+            while num_observations < self.max_batch_size and item_list[-1] is not None:
+                try:
+                    item = self.observation_queue.get_nowait()
+                except queue.Empty:
+                    break
+                item_list.append(item)
+                num_observations += len(item[0]) if item is not None else 0
+
+            observation_list = [item for item in item_list if item is not None]
+            try:
+                if observation_list and self.writer_exception is None:
+                    self.agent.observe_batch(
+                        arm_ids=numpy.concatenate([arm_id_array for arm_id_array, _ in observation_list]),
+                        rewards=numpy.concatenate([reward_array for _, reward_array in observation_list]),
+                    )
+                    self.snapshot = self.take_snapshot()
+
+            except Exception as e:
+                log(ERROR, "Failed to apply observations", e=e)
+                self.writer_exception = e
+
+            finally:
+                for _ in item_list:
+                    self.observation_queue.task_done()
+
+            if item_list[-1] is None:
+                return
+
+    # Blocks until all the observations made so far are applied.
+    def flush(self):
+        self.observation_queue.join()
+        self.raise_writer_exception()
+
+    def close(self):
+        self.observation_queue.put(None)
+        self.writer_thread.join()
+        self.raise_writer_exception()
@@ -0,0 +1,206 @@
+import abc
+import math
+import numpy
+import statistics
+
+from typing import Optional
+
+from src.utils.debug import *
+
+
+# Returns the standardized residuals `(reward - mean) / stdev`.
+def standardize(reward, mean, stdev):
+    return (reward - mean) / stdev
+
+
+# Returns the values of the recursion `g_t = max(0, g_{t-1} + x_t)` for all t, starting at `g_0`.
+def reflected_cumsum(x_array: numpy.ndarray, g_0: float) -> numpy.ndarray:
+    cumsum_array = numpy.cumsum(x_array)
+    return cumsum_array - numpy.minimum(numpy.minimum.accumulate(cumsum_array), -g_0)
+
+
+class ChangeDetector(abc.ABC):
+    # Detects the rewards of an arm that signal a change in its reward distribution.
+    # Rewards are tested against the (mean, stdev) of the rewards observed before them.
+    def __init__(self, num_arms: int):
+        self.num_arms = num_arms
+
+    # Returns True if `reward` signals a change. Costs O(1).
+    @abc.abstractmethod
+    def observe(self, arm_id: int, reward: float, mean: float, stdev: float) -> bool:
+        pass
+
+    # Batch version of `observe()`, i.e., the i-th reward is tested against `mean_array[i]`
+    # and `stdev_array[i]`. Returns the index of the first reward that signals a change, or
+    # None if there is no such reward. The detector state is advanced up to that reward.
+    @abc.abstractmethod
+    def first_change_index(
+        self,
+        arm_id: int,
+        reward_array: numpy.ndarray,
+        mean_array: numpy.ndarray,
+        stdev_array: numpy.ndarray,
+    ) -> Optional[int]:
+        pass
+
+    # Should be called once the change signalled for `arm_id` is handled.
+    def reset(self, arm_id: int):
+        pass
+
+
+def get_first_index(condition_array: numpy.ndarray) -> Optional[int]:
+    index_array = numpy.flatnonzero(condition_array)
+    return int(index_array[0]) if len(index_array) else None
+
+
+class GaussianTailDetector(ChangeDetector):
+    # Signals a change if the mass of the Normal(mean, stdev) tail beyond `reward` is
+    # at most `tail_mass_threshold`, i.e., if `min(Pr{X > reward}, Pr{X < reward}) <= threshold`.
+    # The test is done on the standardized reward against a precomputed quantile.
+    def __init__(self, num_arms: int, tail_mass_threshold: float):
+        super().__init__(num_arms=num_arms)
+
+        self.tail_mass_threshold = tail_mass_threshold
+        if tail_mass_threshold <= 0:
+            self.z_threshold = math.inf
+        elif tail_mass_threshold >= 1:
+            self.z_threshold = -math.inf
+        else:
+            self.z_threshold = statistics.NormalDist().inv_cdf(1 - tail_mass_threshold)
+
+    def __repr__(self):
+        return f"GaussianTailDetector(tail_mass_threshold= {self.tail_mass_threshold})"
+
+    def observe(self, arm_id: int, reward: float, mean: float, stdev: float) -> bool:
+        return abs(standardize(reward, mean, stdev)) >= self.z_threshold
+
+    def first_change_index(
+        self,
+        arm_id: int,
+        reward_array: numpy.ndarray,
+        mean_array: numpy.ndarray,
+        stdev_array: numpy.ndarray,
+    ) -> Optional[int]:
+        return get_first_index(numpy.abs(standardize(reward_array, mean_array, stdev_array)) >= self.z_threshold)
+
+
+class CusumDetector(ChangeDetector):
+    # Two-sided CUSUM over the standardized rewards:
+    # `g+ = max(0, g+ + z - drift)`, `g- = max(0, g- - z - drift)`,
+    # and signals a change once `g+` or `g-` exceeds `threshold`.
+    def __init__(self, num_arms: int, drift: float = 0.5, threshold: float = 5):
+        super().__init__(num_arms=num_arms)
+
+        check(drift >= 0, "`drift` should be non-negative", drift=drift)
+        check(threshold > 0, "`threshold` should be positive", threshold=threshold)
+        self.drift = drift
+        self.threshold = threshold
+
+        self.g_pos_array = numpy.zeros(num_arms)
+        self.g_neg_array = numpy.zeros(num_arms)
+
+    def __repr__(self):
+        return f"CusumDetector(drift= {self.drift}, threshold= {self.threshold})"
+
+    def observe(self, arm_id: int, reward: float, mean: float, stdev: float) -> bool:
+        z = standardize(reward, mean, stdev)
+        g_pos = max(0, self.g_pos_array[arm_id] + z - self.drift)
+        g_neg = max(0, self.g_neg_array[arm_id] - z - self.drift)
+        self.g_pos_array[arm_id] = g_pos
+        self.g_neg_array[arm_id] = g_neg
+
+        return g_pos > self.threshold or g_neg > self.threshold
+
+    def first_change_index(
+        self,
+        arm_id: int,
+        reward_array: numpy.ndarray,
+        mean_array: numpy.ndarray,
+        stdev_array: numpy.ndarray,
+    ) -> Optional[int]:
+        if len(reward_array) == 0:
+            return None
+
+        z_array = standardize(reward_array, mean_array, stdev_array)
+        g_pos_array = reflected_cumsum(z_array - self.drift, g_0=self.g_pos_array[arm_id])
+        g_neg_array = reflected_cumsum(-z_array - self.drift, g_0=self.g_neg_array[arm_id])
+
+        index = get_first_index((g_pos_array > self.threshold) | (g_neg_array > self.threshold))
+        last_index = len(z_array) - 1 if index is None else index
+        self.g_pos_array[arm_id] = g_pos_array[last_index]
+        self.g_neg_array[arm_id] = g_neg_array[last_index]
+
+        return index
+
+    def reset(self, arm_id: int):
+        self.g_pos_array[arm_id] = 0
+        self.g_neg_array[arm_id] = 0
+
+
+class PageHinkleyDetector(ChangeDetector):
+    # Two-sided Page-Hinkley test over the standardized rewards: keeps `m = sum(z - delta)`
+    # and its running min `M`, and signals a change once `m - M` exceeds `threshold`.
+    # The same is done over `-z` to detect decreases.
+    def __init__(self, num_arms: int, delta: float = 0.05, threshold: float = 10):
+        super().__init__(num_arms=num_arms)
+
+        check(delta >= 0, "`delta` should be non-negative", delta=delta)
+        check(threshold > 0, "`threshold` should be positive", threshold=threshold)
+        self.delta = delta
+        self.threshold = threshold
+
+        self.m_up_array = numpy.zeros(num_arms)
+        self.min_m_up_array = numpy.zeros(num_arms)
+        self.m_down_array = numpy.zeros(num_arms)
+        self.min_m_down_array = numpy.zeros(num_arms)
+
+    def __repr__(self):
+        return f"PageHinkleyDetector(delta= {self.delta}, threshold= {self.threshold})"
+
+    def observe(self, arm_id: int, reward: float, mean: float, stdev: float) -> bool:
+        z = standardize(reward, mean, stdev)
+
+        m_up = self.m_up_array[arm_id] + z - self.delta
+        min_m_up = min(self.min_m_up_array[arm_id], m_up)
+        m_down = self.m_down_array[arm_id] - z - self.delta
+        min_m_down = min(self.min_m_down_array[arm_id], m_down)
+
+        self.m_up_array[arm_id] = m_up
+        self.min_m_up_array[arm_id] = min_m_up
+        self.m_down_array[arm_id] = m_down
+        self.min_m_down_array[arm_id] = min_m_down
+
+        return m_up - min_m_up > self.threshold or m_down - min_m_down > self.threshold
+
+    def first_change_index(
+        self,
+        arm_id: int,
+        reward_array: numpy.ndarray,
+        mean_array: numpy.ndarray,
+        stdev_array: numpy.ndarray,
+    ) -> Optional[int]:
+        if len(reward_array) == 0:
+            return None
+
+        z_array = standardize(reward_array, mean_array, stdev_array)
+        m_up_array = self.m_up_array[arm_id] + numpy.cumsum(z_array - self.delta)
+        min_m_up_array = numpy.minimum(numpy.minimum.accumulate(m_up_array), self.min_m_up_array[arm_id])
+        m_down_array = self.m_down_array[arm_id] + numpy.cumsum(-z_array - self.delta)
+        min_m_down_array = numpy.minimum(numpy.minimum.accumulate(m_down_array), self.min_m_down_array[arm_id])
+
+        index = get_first_index(
+            (m_up_array - min_m_up_array > self.threshold) | (m_down_array - min_m_down_array > self.threshold)
+        )
+        last_index = len(z_array) - 1 if index is None else index
+        self.m_up_array[arm_id] = m_up_array[last_index]
+        self.min_m_up_array[arm_id] = min_m_up_array[last_index]
+        self.m_down_array[arm_id] = m_down_array[last_index]
+        self.min_m_down_array[arm_id] = min_m_down_array[last_index]
+
+        return index
+
+    def reset(self, arm_id: int):
+        self.m_up_array[arm_id] = 0
+        self.min_m_up_array[arm_id] = 0
+        self.m_down_array[arm_id] = 0
+        self.min_m_down_array[arm_id] = 0
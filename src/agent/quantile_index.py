@@ -0,0 +1,92 @@
+import heapq
+import math
+import numpy
+import statistics
+
+from src.utils.debug import *
+
+
+class UpperQuantileIndex:
+    # Max-heap over the per-arm upper quantiles `mean + z * stdev`, where
+    # `Pr{N(mean, stdev) > mean + z * stdev} = tail_tolerance / num_arms`.
+    #
+    # A Thompson draw visits the arms in decreasing order of their upper quantile, and
+    # stops at the first arm whose upper quantile is below the max sample drawn so far.
+    # Each skipped arm could have won the draw with probability at most
+    # `tail_tolerance / num_arms`, so by the union bound, the chosen action differs from an
+    # exact Thompson draw with probability at most `tail_tolerance`.
+    #
+    # If a draw would visit more than about `sqrt(num_arms)` arms, e.g., on a cold start where
+    # all the arms have the same stats, it falls back to an exact vectorized draw over all arms.
+    #
+    # Heap entries are invalidated lazily: updating an arm bumps its version and pushes a
+    # new entry, and stale entries are dropped when popped. The heap is rebuilt once the
+    # stale entries outnumber the arms.
+    def __init__(
+        self,
+        mean_array: numpy.ndarray,
+        stdev_array: numpy.ndarray,
+        tail_tolerance: float,
+    ):
+        check(0 < tail_tolerance < 0.5, "`tail_tolerance` should be in (0, 0.5)", tail_tolerance=tail_tolerance)
+
+        self.num_arms = len(mean_array)
+        self.tail_tolerance = tail_tolerance
+        self.z = statistics.NormalDist().inv_cdf(1 - tail_tolerance / self.num_arms)
+        self.max_num_visited_arms = max(16, math.isqrt(self.num_arms))
+
+        self.mean_array = numpy.array(mean_array, dtype=numpy.float64)
+        self.stdev_array = numpy.array(stdev_array, dtype=numpy.float64)
+        self.version_array = numpy.zeros(self.num_arms, dtype=numpy.int64)
+        self.rebuild()
+
+    def __repr__(self):
+        return (
+            "UpperQuantileIndex( \n"
+            f"\t num_arms= {self.num_arms} \n"
+            f"\t tail_tolerance= {self.tail_tolerance} \n"
+            ")"
+        )
+
+    def rebuild(self):
+        upper_array = self.mean_array + self.z * self.stdev_array
+        self.heap = list(zip((-upper_array).tolist(), self.version_array.tolist(), range(self.num_arms)))
+        heapq.heapify(self.heap)
+
+    def update(self, arm_id: int, mean: float, stdev: float):
+        self.mean_array[arm_id] = mean
+        self.stdev_array[arm_id] = stdev
+        self.version_array[arm_id] += 1
+        heapq.heappush(self.heap, (-(mean + self.z * stdev), int(self.version_array[arm_id]), arm_id))
+
+        if len(self.heap) > 2 * self.num_arms + 1024:
+            self.rebuild()
+
+    def next_action(self, rng: numpy.random.Generator) -> int:
+        action, max_sample = None, float("-Inf")
+        popped_entry_list = []
+
+        while self.heap:
+            entry = self.heap[0]
+            neg_upper, version, arm_id = entry
+            if version != self.version_array[arm_id]:
+                heapq.heappop(self.heap)
+                continue
+
+            if -neg_upper < max_sample:
+                break
+
+            if len(popped_entry_list) == self.max_num_visited_arms:
+                action = int(numpy.argmax(rng.normal(loc=self.mean_array, scale=self.stdev_array)))
+                break
+
+            popped_entry_list.append(heapq.heappop(self.heap))
+            s = rng.normal(loc=self.mean_array[arm_id], scale=self.stdev_array[arm_id])
+            if s > max_sample:
+                max_sample = s
+                action = arm_id
+
+        for entry in popped_entry_list:
+            heapq.heappush(self.heap, entry)
+
+        return action
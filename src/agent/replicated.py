@@ -0,0 +1,106 @@
+import numpy
+
+from typing import Tuple
+
+from src.agent import agent as agent_module
+from src.prob import rv
+from src.utils.debug import *
+
+
+class ReplicatedThompsonSamplingAgent_full:
+    # Holds `num_replicas` independent copies of a `ThompsonSamplingAgent_full`, e.g., one per
+    # sim run, with the (count, mean, M2) stats in (num_replicas, num_arms) arrays.
+    # `next_actions()` draws one action per replica with a single Normal(mean, stdev) draw over
+    # all replicas, and `observe()` applies one Welford update per replica.
+    #
+    # Note: Each replica follows the same posterior as `ThompsonSamplingAgent_full`, but the
+    # samples are drawn from a single `rng` stream shared by the replicas.
+    def __init__(
+        self,
+        name: str,
+        num_arms: int,
+        num_replicas: int,
+        rng: numpy.random.Generator = None,
+        min_reward: float = None,
+        dtype: numpy.dtype = numpy.float64,
+    ):
+        self.name = name
+        self.num_arms = num_arms
+        self.num_replicas = num_replicas
+        self.rng = rng if rng is not None else numpy.random.default_rng()
+        self.min_reward = min_reward
+
+        self.dtype = numpy.dtype(dtype)
+        check(self.dtype in (numpy.float32, numpy.float64), "`dtype` should be float32 or float64", dtype=dtype)
+        count_dtype = numpy.int32 if self.dtype == numpy.float32 else numpy.int64
+
+        shape = (num_replicas, num_arms)
+        self.count_matrix = numpy.zeros(shape, dtype=count_dtype)
+        self.mean_matrix = numpy.zeros(shape, dtype=self.dtype)
+        self.M2_matrix = numpy.zeros(shape, dtype=self.dtype)
+
+        self.replica_id_array = numpy.arange(num_replicas)
+
+    def __repr__(self):
+        return (
+            "ReplicatedThompsonSamplingAgent_full( \n"
+            f"\t name= {self.name} \n"
+            f"\t num_arms= {self.num_arms} \n"
+            f"\t num_replicas= {self.num_replicas} \n"
+            ")"
+        )
+
+    @classmethod
+    def from_agent(
+        cls,
+        agent: agent_module.ThompsonSamplingAgent_full,
+        num_replicas: int,
+        rng: numpy.random.Generator = None,
+    ) -> "ReplicatedThompsonSamplingAgent_full":
+        # Subclasses such as `ThompsonSamplingAgent_normalGamma` keep other posteriors.
+        check(
+            type(agent) is agent_module.ThompsonSamplingAgent_full and agent.tail_tolerance is None,
+            "Only `ThompsonSamplingAgent_full` without `tail_tolerance` can be replicated",
+            agent=agent,
+        )
+
+        return cls(
+            name=agent.name,
+            num_arms=agent.num_arms,
+            num_replicas=num_replicas,
+            rng=rng,
+            min_reward=agent.min_reward,
+            dtype=agent.dtype,
+        )
+
+    # Returns the per-replica, per-arm (mean, stdev) matrices of shape (num_replicas, num_arms).
+    def mean_stdev_reward_matrices(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        stdev_matrix = numpy.sqrt(self.M2_matrix / numpy.maximum(self.count_matrix, 1))
+        stdev_matrix[stdev_matrix == 0] = 1
+
+        return self.mean_matrix, stdev_matrix
+
+    # Returns one action per replica as an int array of shape (num_replicas,).
+    def next_actions(self) -> numpy.ndarray:
+        mean_matrix, stdev_matrix = self.mean_stdev_reward_matrices()
+        if self.min_reward is not None:
+            reward_sample_matrix = rv.sample_truncated_normal(
+                rng=self.rng, mu=mean_matrix, sigma=stdev_matrix, lower=self.min_reward, upper=numpy.inf
+            )
+        else:
+            reward_sample_matrix = self.rng.normal(loc=mean_matrix, scale=stdev_matrix)
+
+        return numpy.argmax(reward_sample_matrix, axis=1)
+
+    # Observes `reward_array[r]` for `arm_id_array[r]` in each replica `r`.
+    def observe(self, arm_id_array: numpy.ndarray, reward_array: numpy.ndarray):
+        index = (self.replica_id_array, arm_id_array)
+
+        count_array = self.count_matrix[index] + 1
+        mean_array = self.mean_matrix[index]
+        delta_array = reward_array - mean_array
+        mean_array = mean_array + delta_array / count_array
+
+        self.count_matrix[index] = count_array
+        self.mean_matrix[index] = mean_array
+        self.M2_matrix[index] += delta_array * (reward_array - mean_array)
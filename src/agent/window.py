@@ -0,0 +1,277 @@
+import abc
+import collections
+import enum
+import numpy
+
+from typing import Tuple
+
+from src.utils.debug import *
+
+
+class WindowBackend(enum.Enum):
+    ring_buffer = "ring_buffer"
+    # Reference implementation, kept for equivalence tests.
+    deque = "deque"
+
+
+class RewardWindow(abc.ABC):
+    # Keeps the last `win_len` rewards observed for each arm.
+    def __init__(self, num_arms: int, win_len: int):
+        self.num_arms = num_arms
+        self.win_len = win_len
+
+    @abc.abstractmethod
+    def append(self, arm_id: int, reward: float):
+        pass
+
+    @abc.abstractmethod
+    def clear(self, arm_id: int):
+        pass
+
+    @abc.abstractmethod
+    def num_rewards(self, arm_id: int) -> int:
+        pass
+
+    # Returns the rewards in the window of `arm_id`, ordered from the oldest to the newest.
+    @abc.abstractmethod
+    def reward_array(self, arm_id: int) -> numpy.ndarray:
+        pass
+
+    # Returns the (mean, stdev) of the rewards in the window of `arm_id`, or None if the window is empty.
+    @abc.abstractmethod
+    def mean_stdev_reward(self, arm_id: int) -> Tuple[float, float]:
+        pass
+
+    # Appends the rewards in order, i.e., the same as calling `append()` for each pair.
+    def append_batch(self, arm_id_array: numpy.ndarray, reward_array: numpy.ndarray):
+        for arm_id, reward in zip(arm_id_array.tolist(), reward_array.tolist()):
+            self.append(arm_id=arm_id, reward=reward)
+
+    # Returns the (num_rewards, mean, stdev) arrays for the arms in `arm_id_array`.
+    # Mean and stdev are set to 0 for the arms with an empty window.
+    def mean_stdev_reward_arrays(self, arm_id_array: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        num_rewards_array = numpy.zeros(len(arm_id_array), dtype=numpy.int64)
+        mean_array = numpy.zeros(len(arm_id_array))
+        stdev_array = numpy.zeros(len(arm_id_array))
+        for i, arm_id in enumerate(arm_id_array.tolist()):
+            num_rewards_array[i] = self.num_rewards(arm_id=arm_id)
+            mean_stdev = self.mean_stdev_reward(arm_id=arm_id)
+            if mean_stdev is not None:
+                mean_array[i], stdev_array[i] = mean_stdev
+
+        return num_rewards_array, mean_array, stdev_array
+
+
+class DequeRewardWindow(RewardWindow):
+    def __init__(self, num_arms: int, win_len: int):
+        super().__init__(num_arms=num_arms, win_len=win_len)
+
+        self.arm_id_to_reward_queue_map = {
+            arm_id: collections.deque(maxlen=win_len) for arm_id in range(num_arms)
+        }
+
+    def __repr__(self):
+        return f"DequeRewardWindow(num_arms= {self.num_arms}, win_len= {self.win_len})"
+
+    def append(self, arm_id: int, reward: float):
+        self.arm_id_to_reward_queue_map[arm_id].append(reward)
+
+    def clear(self, arm_id: int):
+        self.arm_id_to_reward_queue_map[arm_id].clear()
+
+    def num_rewards(self, arm_id: int) -> int:
+        return len(self.arm_id_to_reward_queue_map[arm_id])
+
+    def reward_array(self, arm_id: int) -> numpy.ndarray:
+        return numpy.array(self.arm_id_to_reward_queue_map[arm_id], dtype=float)
+
+    def mean_stdev_reward(self, arm_id: int) -> Tuple[float, float]:
+        reward_queue = self.arm_id_to_reward_queue_map[arm_id]
+        if len(reward_queue) == 0:
+            return None
+
+        return numpy.mean(reward_queue), numpy.std(reward_queue)
+
+
+class RingBufferRewardWindow(RewardWindow):
+    # Keeps a running sum and sum of squares per arm, so that the window stats cost O(1).
+    # Sums are kept over the rewards shifted by a per-arm reference value, which avoids
+    # the cancellation in `E[X^2] - E[X]^2` when the mean is large relative to the stdev.
+    # Sums are recomputed from the buffer every `resum_period` appends to stop the
+    # rounding error from accumulating.
+    def __init__(self, num_arms: int, win_len: int, resum_period: int = None):
+        super().__init__(num_arms=num_arms, win_len=win_len)
+
+        self.resum_period = resum_period if resum_period is not None else win_len
+        check(self.resum_period > 0, "`resum_period` should be positive", resum_period=self.resum_period)
+
+        self.buffer = numpy.zeros((num_arms, win_len))
+        # Index in `buffer` to write the next reward to.
+        self.head_array = numpy.zeros(num_arms, dtype=numpy.int64)
+        self.len_array = numpy.zeros(num_arms, dtype=numpy.int64)
+
+        self.shift_array = numpy.zeros(num_arms)
+        self.sum_array = numpy.zeros(num_arms)
+        self.sum_2_array = numpy.zeros(num_arms)
+        self.num_appends_since_resum_array = numpy.zeros(num_arms, dtype=numpy.int64)
+
+    def __repr__(self):
+        return (
+            "RingBufferRewardWindow( \n"
+            f"\t num_arms= {self.num_arms} \n"
+            f"\t win_len= {self.win_len} \n"
+            f"\t resum_period= {self.resum_period} \n"
+            ")"
+        )
+
+    def append(self, arm_id: int, reward: float):
+        head = self.head_array[arm_id]
+        length = self.len_array[arm_id]
+
+        if length == 0:
+            self.shift_array[arm_id] = reward
+
+        shift = self.shift_array[arm_id]
+        if length == self.win_len:
+            dropped = self.buffer[arm_id, head] - shift
+            self.sum_array[arm_id] -= dropped
+            self.sum_2_array[arm_id] -= dropped**2
+        else:
+            self.len_array[arm_id] = length + 1
+
+        self.buffer[arm_id, head] = reward
+        self.head_array[arm_id] = (head + 1) % self.win_len
+
+        shifted = reward - shift
+        self.sum_array[arm_id] += shifted
+        self.sum_2_array[arm_id] += shifted**2
+
+        self.num_appends_since_resum_array[arm_id] += 1
+        if self.num_appends_since_resum_array[arm_id] >= self.resum_period:
+            self.resum(arm_id=arm_id)
+
+    def resum(self, arm_id: int):
+        reward_array = self.reward_array(arm_id=arm_id)
+        shift = numpy.mean(reward_array) if len(reward_array) else 0
+        shifted_array = reward_array - shift
+
+        self.shift_array[arm_id] = shift
+        self.sum_array[arm_id] = numpy.sum(shifted_array)
+        self.sum_2_array[arm_id] = numpy.sum(shifted_array**2)
+        self.num_appends_since_resum_array[arm_id] = 0
+
+    def append_batch(self, arm_id_array: numpy.ndarray, reward_array: numpy.ndarray):
+        if len(arm_id_array) == 0:
+            return
+
+        # Group the rewards by arm, keeping the arrival order within each arm.
+        order = numpy.argsort(arm_id_array, kind="stable")
+        sorted_arm_id_array = arm_id_array[order]
+        sorted_reward_array = reward_array[order]
+        touched_arm_id_array, start_index_array, count_array = numpy.unique(
+            sorted_arm_id_array, return_index=True, return_counts=True
+        )
+        rank_array = numpy.arange(len(sorted_arm_id_array)) - numpy.repeat(start_index_array, count_array)
+
+        # Only the last `win_len` rewards of each arm make it into the window.
+        keep = rank_array >= numpy.repeat(count_array, count_array) - self.win_len
+        kept_arm_id_array = sorted_arm_id_array[keep]
+        position_array = (self.head_array[kept_arm_id_array] + rank_array[keep]) % self.win_len
+        self.buffer[kept_arm_id_array, position_array] = sorted_reward_array[keep]
+
+        self.head_array[touched_arm_id_array] = (self.head_array[touched_arm_id_array] + count_array) % self.win_len
+        self.len_array[touched_arm_id_array] = numpy.minimum(self.len_array[touched_arm_id_array] + count_array, self.win_len)
+        self.resum_batch(arm_id_array=touched_arm_id_array)
+
+    def resum_batch(self, arm_id_array: numpy.ndarray):
+        length_array = self.len_array[arm_id_array]
+        start_array = (self.head_array[arm_id_array] - length_array) % self.win_len
+        offset_array = numpy.arange(self.win_len)
+        reward_matrix = self.buffer[arm_id_array[:, None], (start_array[:, None] + offset_array) % self.win_len]
+        mask = offset_array < length_array[:, None]
+
+        shift_array = numpy.where(mask, reward_matrix, 0).sum(axis=1) / numpy.maximum(length_array, 1)
+        shifted_matrix = numpy.where(mask, reward_matrix - shift_array[:, None], 0)
+
+        self.shift_array[arm_id_array] = shift_array
+        self.sum_array[arm_id_array] = shifted_matrix.sum(axis=1)
+        self.sum_2_array[arm_id_array] = (shifted_matrix**2).sum(axis=1)
+        self.num_appends_since_resum_array[arm_id_array] = 0
+
+    def clear(self, arm_id: int):
+        self.head_array[arm_id] = 0
+        self.len_array[arm_id] = 0
+        self.sum_array[arm_id] = 0
+        self.sum_2_array[arm_id] = 0
+        self.num_appends_since_resum_array[arm_id] = 0
+
+    def num_rewards(self, arm_id: int) -> int:
+        return int(self.len_array[arm_id])
+
+    def reward_array(self, arm_id: int) -> numpy.ndarray:
+        length = self.len_array[arm_id]
+        start = (self.head_array[arm_id] - length) % self.win_len
+        return self.buffer[arm_id, (start + numpy.arange(length)) % self.win_len]
+
+    def mean_stdev_reward(self, arm_id: int) -> Tuple[float, float]:
+        length = self.len_array[arm_id]
+        if length == 0:
+            return None
+
+        shifted_mean = self.sum_array[arm_id] / length
+        var = self.sum_2_array[arm_id] / length - shifted_mean**2
+        return self.shift_array[arm_id] + shifted_mean, numpy.sqrt(max(var, 0))
+
+    def mean_stdev_reward_arrays(self, arm_id_array: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        num_rewards_array = self.len_array[arm_id_array]
+        length_array = numpy.maximum(num_rewards_array, 1)
+        shifted_mean_array = self.sum_array[arm_id_array] / length_array
+        var_array = self.sum_2_array[arm_id_array] / length_array - shifted_mean_array**2
+
+        mean_array = numpy.where(num_rewards_array > 0, self.shift_array[arm_id_array] + shifted_mean_array, 0)
+        stdev_array = numpy.sqrt(numpy.maximum(var_array, 0))
+        return num_rewards_array, mean_array, stdev_array
+
+
+# Returns the (num_rewards, mean, stdev) arrays of the window right before each reward in
+# `reward_array`, given that the rewards are appended in order to a window of length `win_len`
+# that initially holds `window_reward_array`. Mean and stdev are set to 0 for the empty windows.
+def rolling_mean_stdev_reward(
+    window_reward_array: numpy.ndarray,
+    reward_array: numpy.ndarray,
+    win_len: int,
+) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    concat_array = numpy.concatenate((window_reward_array, reward_array))
+    if len(concat_array) == 0:
+        return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0), numpy.zeros(0)
+
+    # Shift by the first reward to reduce the cancellation in `E[X^2] - E[X]^2`.
+    shift = concat_array[0]
+    shifted_array = concat_array - shift
+    cumsum_array = numpy.concatenate(([0], numpy.cumsum(shifted_array)))
+    cumsum_2_array = numpy.concatenate(([0], numpy.cumsum(shifted_array**2)))
+
+    end_array = len(window_reward_array) + numpy.arange(len(reward_array))
+    num_rewards_array = numpy.minimum(end_array, win_len)
+    start_array = end_array - num_rewards_array
+
+    length_array = numpy.maximum(num_rewards_array, 1)
+    shifted_mean_array = (cumsum_array[end_array] - cumsum_array[start_array]) / length_array
+    var_array = (cumsum_2_array[end_array] - cumsum_2_array[start_array]) / length_array - shifted_mean_array**2
+
+    mean_array = numpy.where(num_rewards_array > 0, shift + shifted_mean_array, 0)
+    stdev_array = numpy.sqrt(numpy.maximum(var_array, 0))
+    return num_rewards_array, mean_array, stdev_array
+
+
+def get_reward_window(
+    window_backend: WindowBackend,
+    num_arms: int,
+    win_len: int,
+) -> RewardWindow:
+    if window_backend == WindowBackend.ring_buffer:
+        return RingBufferRewardWindow(num_arms=num_arms, win_len=win_len)
+    elif window_backend == WindowBackend.deque:
+        return DequeRewardWindow(num_arms=num_arms, win_len=win_len)
+
+    assert_("Unexpected window backend", window_backend=window_backend)
@@ -1,7 +1,9 @@
 import abc
 import enum
+import numpy
 
 from src.prob import rv
+from src.utils.debug import *
 
 
 class Arm:
@@ -35,13 +37,62 @@ class ArmState(enum.Enum):
     low = "low"
 
 
+class PhaseTimeline:
+    # Sorted rounds at which the state of an arm switches between high and low: `b_0 = 0` and
+    # `b_k = b_{k-1} + d_k + 1`, where `d_k` is the k-th sample of `phase_duration_rv`. The arm
+    # starts in the high state and switches at `b_0`, so it is in the low state at round `t` if
+    # the number of boundaries `<= t` is odd.
+    # Boundaries are drawn in chunks of `chunk_size` phases, once a round beyond them is asked for.
+    def __init__(self, phase_duration_rv: rv.RandomVariable, chunk_size: int = 1024):
+        self.phase_duration_rv = phase_duration_rv
+        self.chunk_size = chunk_size
+
+        # Capacity is doubled as needed, and only `boundary_array[:num_boundaries]` is valid.
+        self.boundary_array = numpy.zeros(chunk_size + 1, dtype=numpy.int64)
+        self.num_boundaries = 1
+
+    def __repr__(self):
+        return (
+            "PhaseTimeline( \n"
+            f"\t phase_duration_rv= {self.phase_duration_rv} \n"
+            f"\t num_boundaries= {self.num_boundaries} \n"
+            ")"
+        )
+
+    def extend(self, round_index: int):
+        while self.boundary_array[self.num_boundaries - 1] <= round_index:
+            phase_duration_array = numpy.asarray(self.phase_duration_rv.sample(size=self.chunk_size)).astype(numpy.int64)
+            new_boundary_array = self.boundary_array[self.num_boundaries - 1] + numpy.cumsum(phase_duration_array + 1)
+
+            if self.num_boundaries + self.chunk_size > len(self.boundary_array):
+                boundary_array = numpy.empty(2 * (self.num_boundaries + self.chunk_size), dtype=numpy.int64)
+                boundary_array[: self.num_boundaries] = self.boundary_array[: self.num_boundaries]
+                self.boundary_array = boundary_array
+
+            self.boundary_array[self.num_boundaries : self.num_boundaries + self.chunk_size] = new_boundary_array
+            self.num_boundaries += self.chunk_size
+
+    # Returns True for the rounds in `round_index` at which the arm is in the high state.
+    # Costs O(log P) per round for P phases.
+    def is_high(self, round_index):
+        self.extend(round_index=int(numpy.max(round_index)))
+        num_switches = numpy.searchsorted(self.boundary_array[: self.num_boundaries], round_index, side="right")
+        return num_switches % 2 == 0
+
+
 class NonStationaryArm_wHighLowReward(Arm):
+    # If `precompute_phases` is set, the phases are drawn ahead into a `PhaseTimeline`, and the
+    # state at a round is looked up in it rather than counted down pull by pull. Then the rewards
+    # for a block of rounds can be drawn at once with `pull_many()`, and `reset()` rewinds the arm
+    # to replay the same phases, e.g., to evaluate another agent.
     def __init__(
         self,
         name: str,
         high_reward_rv: rv.RandomVariable,
         low_reward_rv: rv.RandomVariable,
         phase_duration_rv: rv.RandomVariable,
+        precompute_phases: bool = False,
+        chunk_size: int = 1024,
     ):
         super().__init__(name=name)
 
@@ -52,6 +103,11 @@ class NonStationaryArm_wHighLowReward(Arm):
         self.state = ArmState.high
         self.phase_duration = 0
 
+        self.phase_timeline = (
+            PhaseTimeline(phase_duration_rv=phase_duration_rv, chunk_size=chunk_size) if precompute_phases else None
+        )
+        self.round_index = 0
+
     def __repr__(self):
         return (
             "NonStationaryArm_wHighLowReward( \n"
@@ -74,10 +130,37 @@ class NonStationaryArm_wHighLowReward(Arm):
             self.state = ArmState.high
 
     def pull(self) -> float:
-        if self.phase_duration == 0:
+        if self.phase_timeline is not None:
+            self.state = ArmState.high if self.phase_timeline.is_high(round_index=self.round_index) else ArmState.low
+            self.round_index += 1
+
+        elif self.phase_duration == 0:
             self.phase_duration = int(self.phase_duration_rv.sample())
             self.switch_state()
         else:
             self.phase_duration -= 1
 
         return self.sample_reward()
+
+    # Returns the rewards for the next `num_rounds` pulls. Requires `precompute_phases`.
+    def pull_many(self, num_rounds: int) -> numpy.ndarray:
+        check(self.phase_timeline is not None, "Requires `precompute_phases`")
+
+        reward_array = numpy.empty(num_rounds)
+        if num_rounds == 0:
+            return reward_array
+
+        is_high_array = self.phase_timeline.is_high(round_index=numpy.arange(self.round_index, self.round_index + num_rounds))
+        num_high = int(numpy.count_nonzero(is_high_array))
+        reward_array[is_high_array] = self.high_reward_rv.sample(size=num_high)
+        reward_array[~is_high_array] = self.low_reward_rv.sample(size=num_rounds - num_high)
+
+        self.round_index += num_rounds
+        self.state = ArmState.high if is_high_array[-1] else ArmState.low
+        return reward_array
+
+    # Rewinds the arm to the first round. With `precompute_phases`, the same phases are replayed.
+    def reset(self):
+        self.state = ArmState.high
+        self.phase_duration = 0
+        self.round_index = 0
@@ -1,7 +1,9 @@
 import abc
+import enum
+import numpy
 
 from src.env import arm as arm_module
-from src.prob import rv
+from src.prob import family as family_module, rv
 from src.utils.debug import *
 
 
@@ -77,6 +79,7 @@ class StationaryBandit(Bandit):
 
 
 class NonStationaryBandit(Bandit):
+    # See `NonStationaryArm_wHighLowReward` for `precompute_phases`.
     def __init__(
         self,
         num_arms: int,
@@ -86,7 +89,9 @@ class NonStationaryBandit(Bandit):
         medium_reward_rv: rv.RandomVariable,
         low_reward_rv: rv.RandomVariable,
         phase_duration_rv: rv.RandomVariable,
+        precompute_phases: bool = False,
     ):
+        self.num_arms = num_arms
         self.num_arms_w_high_reward = num_arms_w_high_reward
         self.num_arms_w_medium_reward = num_arms_w_medium_reward
         self.high_reward_rv = high_reward_rv
@@ -103,6 +108,7 @@ class NonStationaryBandit(Bandit):
                 high_reward_rv=self.high_reward_rv,
                 low_reward_rv=self.low_reward_rv,
                 phase_duration_rv=self.phase_duration_rv,
+                precompute_phases=precompute_phases,
             )
             for i in range(self.num_arms_w_high_reward)
         ]
@@ -115,7 +121,7 @@ class NonStationaryBandit(Bandit):
                 )
             )
 
-        for i in range(self.num_arms_w_medium_reward):
+        for i in range(self.num_arms_w_low_reward):
             self.arm_list.append(
                 arm_module.StationaryArm(
                     name=f"low_reward_arm_{i}",
@@ -146,3 +152,284 @@ class NonStationaryBandit(Bandit):
 
     def mean_high_reward(self):
         return self.high_reward_rv.mean()
+
+    # Rewinds the non-stationary arms to their first round. With `precompute_phases`, they replay
+    # the same phases, while the rewards are still drawn anew.
+    def reset(self):
+        for arm in self.arm_list:
+            if isinstance(arm, arm_module.NonStationaryArm_wHighLowReward):
+                arm.reset()
+
+
+class VectorizedBandit(Bandit):
+    # Keeps the reward RVs of stationary arms as parameter arrays grouped by family, so that
+    # `pull_many(arm_ids)` draws the rewards of many pulls with one NumPy call per family rather
+    # than one Python call per pull.
+    # Rewards are drawn with `rng` rather than with the `rng` of each RV, except for the RVs
+    # without a family (see `family.group_into_families()`), which are sampled as they are.
+    # If `high_reward_rv` is not given, the arm with the highest mean reward is the high reward arm.
+    def __init__(
+        self,
+        reward_rv_list: list[rv.RandomVariable],
+        high_reward_rv: rv.RandomVariable = None,
+        rng: numpy.random.Generator = None,
+    ):
+        super().__init__(num_arms=len(reward_rv_list))
+
+        self.high_reward_rv = high_reward_rv
+        self.rng = rng if rng is not None else numpy.random.default_rng()
+
+        self.family_list, self.family_id_array, self.index_in_family_array = family_module.group_into_families(
+            rv_list=reward_rv_list
+        )
+        self.mean_reward_array = numpy.empty(self.num_arms)
+        for family_id, family in enumerate(self.family_list):
+            is_in_family = self.family_id_array == family_id
+            self.mean_reward_array[is_in_family] = family.mean_array()[self.index_in_family_array[is_in_family]]
+        self.high_reward_arm_id = int(numpy.argmax(self.mean_reward_array))
+
+        log(DEBUG, "Constructed", family_list=self.family_list)
+
+    def __repr__(self):
+        return (
+            "VectorizedBandit( \n"
+            f"\t num_arms= {self.num_arms} \n"
+            f"\t family_list= {self.family_list} \n"
+            f"\t high_reward_rv= {self.high_reward_rv} \n"
+            ")"
+        )
+
+    @classmethod
+    def from_stationary_bandit(cls, bandit: StationaryBandit, rng: numpy.random.Generator = None) -> "VectorizedBandit":
+        return cls(
+            reward_rv_list=[arm.reward_rv for arm in bandit.arm_list],
+            high_reward_rv=bandit.high_reward_rv,
+            rng=rng,
+        )
+
+    # Returns the rewards for the pulls of the arms in `arm_ids`, in an array of the same shape.
+    def pull_many(self, arm_ids: numpy.ndarray) -> numpy.ndarray:
+        arm_id_array = numpy.asarray(arm_ids, dtype=numpy.int64)
+        family_id_array = self.family_id_array[arm_id_array]
+        index_in_family_array = self.index_in_family_array[arm_id_array]
+        if len(self.family_list) == 1:
+            return self.family_list[0].sample(rng=self.rng, index_array=index_in_family_array).astype(float)
+
+        reward_array = numpy.empty(arm_id_array.shape)
+        for family_id, family in enumerate(self.family_list):
+            is_in_family = family_id_array == family_id
+            if is_in_family.any():
+                reward_array[is_in_family] = family.sample(rng=self.rng, index_array=index_in_family_array[is_in_family])
+
+        return reward_array
+
+    def pull(self, arm_id: int) -> float:
+        return float(self.pull_many(arm_ids=numpy.array([arm_id]))[0])
+
+    def pull_high_reward(self) -> float:
+        if self.high_reward_rv is not None:
+            return self.high_reward_rv.sample()
+
+        return self.pull(arm_id=self.high_reward_arm_id)
+
+    def mean_high_reward(self) -> float:
+        if self.high_reward_rv is not None:
+            return self.high_reward_rv.mean()
+
+        return float(self.mean_reward_array[self.high_reward_arm_id])
+
+
+class ReplayBandit(Bandit):
+    # Replays the logged rewards in `reward_matrix` of shape (num_rounds, num_arms), where
+    # `reward_matrix[t, i]` is the reward of arm `i` at round `t`. Pulls within a round read the
+    # same row, and `pull_high_reward()` closes the round, as in `sim.sim_single_run()`.
+    # The high reward arm is the arm with the highest mean reward over the log, unless
+    # `high_reward_arm_id` is given.
+    #
+    # Rows are read as views of `reward_matrix`, so a matrix memory-mapped from disk with
+    # `from_npy()` is read zero-copy, and only the pages of the rounds replayed are loaded.
+    # Rounds are read in chunks of `num_rounds_per_chunk` rows, which keeps the access sequential.
+    def __init__(
+        self,
+        reward_matrix: numpy.ndarray,
+        high_reward_arm_id: int = None,
+        num_rounds_per_chunk: int = 4096,
+    ):
+        check(numpy.ndim(reward_matrix) == 2, "`reward_matrix` should be 2D", shape=numpy.shape(reward_matrix))
+        super().__init__(num_arms=numpy.shape(reward_matrix)[1])
+
+        # Plain ndarray view of a `numpy.memmap`, as indexing a memmap costs more per access.
+        self.reward_matrix = numpy.asarray(reward_matrix)
+        self.num_rounds = self.reward_matrix.shape[0]
+        self.num_rounds_per_chunk = num_rounds_per_chunk
+
+        self.mean_reward_array = None
+        if high_reward_arm_id is None:
+            self.mean_reward_array = self.get_mean_reward_array()
+            high_reward_arm_id = int(numpy.argmax(self.mean_reward_array))
+        self.high_reward_arm_id = high_reward_arm_id
+
+        self.reset()
+
+    def __repr__(self):
+        return (
+            "ReplayBandit( \n"
+            f"\t num_rounds= {self.num_rounds} \n"
+            f"\t num_arms= {self.num_arms} \n"
+            f"\t high_reward_arm_id= {self.high_reward_arm_id} \n"
+            ")"
+        )
+
+    # Memory-maps the reward matrix saved with `numpy.save()` at `path`.
+    @classmethod
+    def from_npy(cls, path: str, **kwargs) -> "ReplayBandit":
+        return cls(reward_matrix=numpy.load(path, mmap_mode="r"), **kwargs)
+
+    # Yields `(first_round_index, reward_chunk)` over the rounds in `[start_round_index, num_rounds)`,
+    # where `reward_chunk` is a view of the next `num_rounds_per_chunk` rows.
+    def iter_chunks(self, start_round_index: int = 0, num_rounds_per_chunk: int = None):
+        num_rounds_per_chunk = num_rounds_per_chunk or self.num_rounds_per_chunk
+        for first_round_index in range(start_round_index, self.num_rounds, num_rounds_per_chunk):
+            yield first_round_index, self.reward_matrix[first_round_index : first_round_index + num_rounds_per_chunk]
+
+    # Computes the mean reward of each arm with a single pass over the chunks.
+    def get_mean_reward_array(self) -> numpy.ndarray:
+        sum_array = numpy.zeros(self.num_arms)
+        for _, reward_chunk in self.iter_chunks():
+            sum_array += reward_chunk.sum(axis=0, dtype=numpy.float64)
+
+        return sum_array / max(self.num_rounds, 1)
+
+    def reset(self):
+        self.round_index = 0
+        self.chunk_first_round_index = 0
+        self.reward_chunk = self.reward_matrix[: self.num_rounds_per_chunk]
+
+    def reward_row(self) -> numpy.ndarray:
+        check(self.round_index < self.num_rounds, "Ran out of logged rounds", num_rounds=self.num_rounds)
+
+        offset = self.round_index - self.chunk_first_round_index
+        if offset >= len(self.reward_chunk):
+            self.chunk_first_round_index = self.round_index
+            self.reward_chunk = self.reward_matrix[self.round_index : self.round_index + self.num_rounds_per_chunk]
+            offset = 0
+
+        return self.reward_chunk[offset]
+
+    def pull(self, arm_id: int) -> float:
+        return float(self.reward_row()[arm_id])
+
+    # Returns the rewards of the arms in `arm_ids` at the current round.
+    def pull_many(self, arm_ids: numpy.ndarray) -> numpy.ndarray:
+        return self.reward_row()[numpy.asarray(arm_ids, dtype=numpy.int64)].astype(float)
+
+    # Returns the reward of the high reward arm, and advances to the next round.
+    def pull_high_reward(self) -> float:
+        reward = self.pull(arm_id=self.high_reward_arm_id)
+        self.round_index += 1
+        return reward
+
+    def mean_high_reward(self) -> float:
+        if self.mean_reward_array is None:
+            self.mean_reward_array = self.get_mean_reward_array()
+
+        return float(self.mean_reward_array[self.high_reward_arm_id])
+
+
+class RewardClass(enum.IntEnum):
+    high = 0
+    medium = 1
+    low = 2
+
+
+class ReplicatedBandit:
+    # Holds `num_replicas` independent copies of a `StationaryBandit` or `NonStationaryBandit`.
+    # The state of the non-stationary arms is kept in arrays with a leading replica dimension,
+    # and `pull(arm_id_array)` pulls `arm_id_array[r]` in replica `r` for all replicas at once.
+    # Each pull is mapped to the reward class (high, medium or low) of the arm in its replica,
+    # and the rewards are drawn with one `VectorizedBandit.pull_many()` over the classes.
+    # Non-stationary arms follow the countdown of `NonStationaryArm_wHighLowReward`.
+    def __init__(
+        self,
+        bandit: Bandit,
+        num_replicas: int,
+        rng: numpy.random.Generator = None,
+    ):
+        check(
+            isinstance(bandit, (StationaryBandit, NonStationaryBandit)),
+            "Only `StationaryBandit` and `NonStationaryBandit` can be replicated",
+            bandit=bandit,
+        )
+
+        self.bandit = bandit
+        self.num_replicas = num_replicas
+        self.num_arms = bandit.num_arms
+        self.rng = rng if rng is not None else numpy.random.default_rng()
+
+        medium_reward_rv = getattr(bandit, "medium_reward_rv", bandit.low_reward_rv)
+        self.reward_class_bandit = VectorizedBandit(
+            reward_rv_list=[bandit.high_reward_rv, medium_reward_rv, bandit.low_reward_rv],
+            high_reward_rv=bandit.high_reward_rv,
+            rng=self.rng,
+        )
+
+        # Reward class of each arm, where non-stationary arms are given as high.
+        self.reward_class_array = numpy.full(self.num_arms, RewardClass.low, dtype=numpy.int64)
+        self.reward_class_array[: bandit.num_arms_w_high_reward] = RewardClass.high
+
+        self.num_non_stationary_arms = 0
+        if isinstance(bandit, NonStationaryBandit):
+            self.num_non_stationary_arms = bandit.num_arms_w_high_reward
+            num_arms_w_high_or_medium_reward = bandit.num_arms_w_high_reward + bandit.num_arms_w_medium_reward
+            self.reward_class_array[bandit.num_arms_w_high_reward : num_arms_w_high_or_medium_reward] = RewardClass.medium
+
+            (self.phase_duration_family,), _, _ = family_module.group_into_families(rv_list=[bandit.phase_duration_rv])
+
+        shape = (num_replicas, self.num_non_stationary_arms)
+        self.is_low_matrix = numpy.zeros(shape, dtype=bool)
+        self.phase_duration_matrix = numpy.zeros(shape, dtype=numpy.int64)
+
+    def __repr__(self):
+        return (
+            "ReplicatedBandit( \n"
+            f"\t bandit= {self.bandit} \n"
+            f"\t num_replicas= {self.num_replicas} \n"
+            ")"
+        )
+
+    # Returns the rewards of pulling `arm_id_array[r]` in each replica `r`.
+    def pull(self, arm_id_array: numpy.ndarray) -> numpy.ndarray:
+        arm_id_array = numpy.asarray(arm_id_array, dtype=numpy.int64)
+        check(arm_id_array.shape == (self.num_replicas,), "Should pull one arm per replica", shape=arm_id_array.shape)
+
+        reward_class_array = self.reward_class_array[arm_id_array]
+        replica_id_array = numpy.flatnonzero(arm_id_array < self.num_non_stationary_arms)
+        if len(replica_id_array):
+            arm_id_array = arm_id_array[replica_id_array]
+            phase_duration_array = self.phase_duration_matrix[replica_id_array, arm_id_array]
+
+            is_switching = phase_duration_array == 0
+            num_switching = int(numpy.count_nonzero(is_switching))
+            phase_duration_array -= 1
+            phase_duration_array[is_switching] = self.phase_duration_family.sample(
+                rng=self.rng, index_array=numpy.zeros(num_switching, dtype=numpy.int64)
+            ).astype(numpy.int64)
+            self.phase_duration_matrix[replica_id_array, arm_id_array] = phase_duration_array
+
+            is_low_array = self.is_low_matrix[replica_id_array, arm_id_array] ^ is_switching
+            self.is_low_matrix[replica_id_array, arm_id_array] = is_low_array
+            reward_class_array[replica_id_array] = numpy.where(is_low_array, RewardClass.low, RewardClass.high)
+
+        return self.reward_class_bandit.pull_many(arm_ids=reward_class_array)
+
+    def pull_high_reward(self) -> numpy.ndarray:
+        return self.reward_class_bandit.pull_many(arm_ids=numpy.full(self.num_replicas, RewardClass.high))
+
+    def mean_high_reward(self) -> float:
+        return self.bandit.mean_high_reward()
+
+    # Resets the replicas in `replica_ids`, or all replicas if not given, to their initial state.
+    def reset(self, replica_ids: numpy.ndarray = None):
+        replica_ids = slice(None) if replica_ids is None else replica_ids
+        self.is_low_matrix[replica_ids] = False
+        self.phase_duration_matrix[replica_ids] = 0
@@ -0,0 +1,75 @@
+import numpy
+
+from src.utils.debug import *
+
+
+class AliasTable:
+    # Walker/Vose alias table for O(1) sampling from a discrete distribution over
+    # `[0, len(prob_array))`. Slot `i` returns `i` with probability `threshold_array[i]`,
+    # and `alias_array[i]` otherwise.
+    #
+    # The table is built without a Python loop. The deficits `1 - n * p_i` of the small
+    # entries and the surpluses `n * p_j - 1` of the large entries are laid out on the same
+    # line with cumulative sums. Each small entry is aliased to the large entry whose
+    # surplus interval contains the start of its deficit interval. Each large entry whose
+    # surplus runs out is aliased to the next large entry, for the part of the deficit
+    # interval that straddles the end of its surplus interval.
+    #
+    # A sample takes a single uniform draw: its integer part picks the slot, and its
+    # fractional part is the biased coin. So drawing `n` samples at once consumes the
+    # `rng` stream exactly like drawing them one at a time.
+    def __init__(self, prob_array: numpy.ndarray):
+        prob_array = numpy.asarray(prob_array, dtype=numpy.float64)
+        check(len(prob_array) > 0 and numpy.all(prob_array >= 0), "Invalid `prob_array`")
+        prob_array = prob_array / prob_array.sum()
+
+        self.num_values = len(prob_array)
+        scaled_prob_array = prob_array * self.num_values
+
+        self.threshold_array = numpy.ones(self.num_values)
+        self.alias_array = numpy.arange(self.num_values)
+
+        small_index_array = numpy.flatnonzero(scaled_prob_array < 1)
+        large_index_array = numpy.flatnonzero(scaled_prob_array >= 1)
+        if len(small_index_array) > 0:
+            deficit_cumsum_array = numpy.cumsum(1 - scaled_prob_array[small_index_array])
+            surplus_cumsum_array = numpy.cumsum(scaled_prob_array[large_index_array] - 1)
+
+            deficit_start_array = numpy.concatenate(([0], deficit_cumsum_array[:-1]))
+            large_position_array = numpy.searchsorted(surplus_cumsum_array, deficit_start_array, side="right")
+            large_position_array = numpy.minimum(large_position_array, len(large_index_array) - 1)
+            self.threshold_array[small_index_array] = scaled_prob_array[small_index_array]
+            self.alias_array[small_index_array] = large_index_array[large_position_array]
+
+            # The last large entry absorbs the rounding error, and keeps its threshold at 1.
+            surplus_end_array = surplus_cumsum_array[:-1]
+            covering_small_position_array = numpy.searchsorted(deficit_cumsum_array, surplus_end_array, side="right")
+            covering_small_position_array = numpy.minimum(covering_small_position_array, len(deficit_cumsum_array) - 1)
+            deficit_array = numpy.clip(deficit_cumsum_array[covering_small_position_array] - surplus_end_array, 0, 1)
+            self.threshold_array[large_index_array[:-1]] = 1 - deficit_array
+            self.alias_array[large_index_array[:-1]] = large_index_array[1:]
+
+        self.cdf_array = numpy.cumsum(prob_array)
+        self.cdf_array[-1] = 1
+
+    def __repr__(self):
+        return f"AliasTable(num_values= {self.num_values})"
+
+    # Returns the probability of each index as encoded by the table.
+    def table_prob_array(self) -> numpy.ndarray:
+        prob_array = self.threshold_array.copy()
+        numpy.add.at(prob_array, self.alias_array, 1 - self.threshold_array)
+        return prob_array / self.num_values
+
+    def index_from_uniform(self, uniform):
+        scaled = numpy.asarray(uniform) * self.num_values
+        slot = numpy.minimum(scaled.astype(numpy.int64), self.num_values - 1)
+        return numpy.where(scaled - slot < self.threshold_array[slot], slot, self.alias_array[slot])
+
+    def sample_index(self, rng: numpy.random.Generator, size: int = None):
+        index = self.index_from_uniform(rng.random(size=size))
+        return int(index) if size is None else index
+
+    # Returns the index `i` such that `cdf_array[i - 1] < prob <= cdf_array[i]`.
+    def inverse_cdf_index(self, prob):
+        return numpy.minimum(numpy.searchsorted(self.cdf_array, prob, side="left"), self.num_values - 1)
@@ -0,0 +1,169 @@
+import abc
+import numpy
+
+from typing import Tuple
+
+from src.prob import rv, special
+from src.utils.debug import *
+
+
+class RVFamily(abc.ABC):
+    # Keeps the parameters of a group of RVs of the same family in arrays, so that samples for
+    # many of them are drawn with one NumPy call. RVs are referred to by their index in `rv_list`.
+    def __init__(self, rv_list: list[rv.RandomVariable]):
+        self.num_rvs = len(rv_list)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(num_rvs= {self.num_rvs})"
+
+    # Returns one sample for each index in `index_array`, drawn with `rng`.
+    @abc.abstractmethod
+    def sample(self, rng: numpy.random.Generator, index_array: numpy.ndarray) -> numpy.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def mean_array(self) -> numpy.ndarray:
+        pass
+
+
+class NormalFamily(RVFamily):
+    def __init__(self, rv_list: list[rv.Normal]):
+        super().__init__(rv_list=rv_list)
+
+        self.mu_array = numpy.array([random_variable.mu for random_variable in rv_list], dtype=float)
+        self.sigma_array = numpy.array([random_variable.sigma for random_variable in rv_list], dtype=float)
+
+    def sample(self, rng: numpy.random.Generator, index_array: numpy.ndarray) -> numpy.ndarray:
+        return rng.normal(loc=self.mu_array[index_array], scale=self.sigma_array[index_array])
+
+    def mean_array(self) -> numpy.ndarray:
+        return self.mu_array
+
+
+class TruncatedNormalFamily(RVFamily):
+    def __init__(self, rv_list: list[rv.TruncatedNormal]):
+        super().__init__(rv_list=rv_list)
+
+        self.mu_array = numpy.array([random_variable.mu for random_variable in rv_list], dtype=float)
+        self.sigma_array = numpy.array([random_variable.sigma for random_variable in rv_list], dtype=float)
+        self.lower_array = numpy.array([random_variable.lower for random_variable in rv_list], dtype=float)
+        self.upper_array = numpy.array([random_variable.upper for random_variable in rv_list], dtype=float)
+
+    def sample(self, rng: numpy.random.Generator, index_array: numpy.ndarray) -> numpy.ndarray:
+        return rv.sample_truncated_normal(
+            rng=rng,
+            mu=self.mu_array[index_array],
+            sigma=self.sigma_array[index_array],
+            lower=self.lower_array[index_array],
+            upper=self.upper_array[index_array],
+        )
+
+    def mean_array(self) -> numpy.ndarray:
+        mean_array, _ = special.truncated_norm_mean_std(
+            mu=self.mu_array, sigma=self.sigma_array, lower=self.lower_array, upper=self.upper_array
+        )
+        return mean_array
+
+
+class ExponentialFamily(RVFamily):
+    def __init__(self, rv_list: list[rv.Exponential]):
+        super().__init__(rv_list=rv_list)
+
+        self.mu_array = numpy.array([random_variable.mu for random_variable in rv_list], dtype=float)
+        self.D_array = numpy.array([random_variable.D for random_variable in rv_list], dtype=float)
+
+    def sample(self, rng: numpy.random.Generator, index_array: numpy.ndarray) -> numpy.ndarray:
+        return self.D_array[index_array] + rng.exponential(scale=1 / self.mu_array[index_array])
+
+    def mean_array(self) -> numpy.ndarray:
+        return self.D_array + 1 / self.mu_array
+
+
+class UniformFamily(RVFamily):
+    def __init__(self, rv_list: list[rv.Uniform]):
+        super().__init__(rv_list=rv_list)
+
+        self.min_value_array = numpy.array([random_variable.min_value for random_variable in rv_list], dtype=float)
+        self.max_value_array = numpy.array([random_variable.max_value for random_variable in rv_list], dtype=float)
+
+    def sample(self, rng: numpy.random.Generator, index_array: numpy.ndarray) -> numpy.ndarray:
+        return rng.uniform(low=self.min_value_array[index_array], high=self.max_value_array[index_array])
+
+    def mean_array(self) -> numpy.ndarray:
+        return (self.min_value_array + self.max_value_array) / 2
+
+
+class DiscreteUniformFamily(RVFamily):
+    def __init__(self, rv_list: list[rv.DiscreteUniform]):
+        super().__init__(rv_list=rv_list)
+
+        self.min_value_array = numpy.array([random_variable.min_value for random_variable in rv_list], dtype=numpy.int64)
+        self.max_value_array = numpy.array([random_variable.max_value for random_variable in rv_list], dtype=numpy.int64)
+
+    def sample(self, rng: numpy.random.Generator, index_array: numpy.ndarray) -> numpy.ndarray:
+        return rng.integers(
+            low=self.min_value_array[index_array], high=self.max_value_array[index_array], endpoint=True
+        )
+
+    def mean_array(self) -> numpy.ndarray:
+        return (self.min_value_array + self.max_value_array) / 2
+
+
+class SingleRVFamily(RVFamily):
+    # Fallback for the RVs without a family, e.g., `TabulatedDiscrete`. Holds a single RV,
+    # which is sampled with its own `sample(size=...)` and `rng`.
+    def __init__(self, rv_list: list[rv.RandomVariable]):
+        super().__init__(rv_list=rv_list)
+        check(len(rv_list) == 1, "Should hold a single RV", num_rvs=len(rv_list))
+
+        self.random_variable = rv_list[0]
+
+    def __repr__(self):
+        return f"SingleRVFamily({self.random_variable})"
+
+    def sample(self, rng: numpy.random.Generator, index_array: numpy.ndarray) -> numpy.ndarray:
+        return numpy.asarray(self.random_variable.sample(size=index_array.size)).reshape(index_array.shape)
+
+    def mean_array(self) -> numpy.ndarray:
+        mean = self.random_variable.mean() if hasattr(self.random_variable, "mean") else numpy.nan
+        return numpy.array([mean], dtype=float)
+
+
+RV_TYPE_TO_FAMILY_TYPE_MAP = {
+    rv.Normal: NormalFamily,
+    rv.TruncatedNormal: TruncatedNormalFamily,
+    rv.Exponential: ExponentialFamily,
+    rv.Uniform: UniformFamily,
+    rv.DiscreteUniform: DiscreteUniformFamily,
+}
+
+
+# Groups `rv_list` into families. RVs of the types in `RV_TYPE_TO_FAMILY_TYPE_MAP` are grouped by
+# type, and every other distinct RV object gets a `SingleRVFamily`.
+# Returns `(family_list, family_id_array, index_in_family_array)`, where the i-th RV is at
+# `index_in_family_array[i]` in `family_list[family_id_array[i]]`.
+def group_into_families(rv_list: list[rv.RandomVariable]) -> Tuple[list[RVFamily], numpy.ndarray, numpy.ndarray]:
+    key_to_family_id_map = {}
+    family_type_list, family_rv_list_list = [], []
+    family_id_array = numpy.empty(len(rv_list), dtype=numpy.int64)
+    index_in_family_array = numpy.zeros(len(rv_list), dtype=numpy.int64)
+    for i, random_variable in enumerate(rv_list):
+        family_type = RV_TYPE_TO_FAMILY_TYPE_MAP.get(type(random_variable), SingleRVFamily)
+        key = type(random_variable) if family_type is not SingleRVFamily else id(random_variable)
+        if key not in key_to_family_id_map:
+            key_to_family_id_map[key] = len(family_type_list)
+            family_type_list.append(family_type)
+            family_rv_list_list.append([])
+
+        family_id = key_to_family_id_map[key]
+        family_id_array[i] = family_id
+        if family_type is not SingleRVFamily:
+            index_in_family_array[i] = len(family_rv_list_list[family_id])
+            family_rv_list_list[family_id].append(random_variable)
+        elif not family_rv_list_list[family_id]:
+            family_rv_list_list[family_id].append(random_variable)
+
+    family_list = [
+        family_type(rv_list=family_rv_list) for family_type, family_rv_list in zip(family_type_list, family_rv_list_list)
+    ]
+    return family_list, family_id_array, index_in_family_array
@@ -1,26 +1,29 @@
+import functools
 import math
-import random
 
 import numpy
-import scipy
-import scipy.stats
+
+from src.prob import alias, special
+from src.utils.debug import *
 
 
 class RandomVariable:
-    def __init__(self, min_value: float, max_value: float):
+    # `sample(size=None)` returns a single value, or an array of `size` values if `size` is given.
+    # Samples are drawn with `rng`, which can be injected for reproducibility.
+    def __init__(self, min_value: float, max_value: float, rng: numpy.random.Generator = None):
         self.min_value = min_value
         self.max_value = max_value
+        self.rng = rng if rng is not None else numpy.random.default_rng()
 
 
 class Normal(RandomVariable):
-    def __init__(self, mu: float, sigma: float):
-        super().__init__(min_value=-numpy.inf, max_value=numpy.inf)
+    # `cdf()` and `tail_prob()` are in closed form with `math.erfc`, and accept scalars or arrays.
+    def __init__(self, mu: float, sigma: float, rng: numpy.random.Generator = None):
+        super().__init__(min_value=-numpy.inf, max_value=numpy.inf, rng=rng)
 
         self.mu = mu
         self.sigma = sigma
 
-        self.dist = scipy.stats.norm(mu, sigma)
-
     def __repr__(self):
         return f"Normal(mu= {self.mu}, sigma= {self.sigma})"
 
@@ -28,30 +31,33 @@ class Normal(RandomVariable):
         return r"N({}, {})".format(self.mu, self.sigma)
 
     def cdf(self, x: float) -> float:
-        return self.dist.cdf(x)
+        return special.norm_cdf(special.standardize(x, mu=self.mu, sigma=self.sigma))
 
     def tail_prob(self, x: float) -> float:
-        return 1 - self.cdf(x)
+        return special.norm_sf(special.standardize(x, mu=self.mu, sigma=self.sigma))
 
     def mean(self) -> float:
         return self.mu
 
-    def sample(self) -> float:
-        return self.dist.rvs(size=1)[0]
+    def std(self) -> float:
+        return self.sigma
+
+    def sample(self, size: int = None):
+        return self.rng.normal(loc=self.mu, scale=self.sigma, size=size)
 
 
 class TruncatedNormal(RandomVariable):
-    def __init__(self, mu: float, sigma: float):
-        super().__init__(min_value=0, max_value=numpy.inf)
+    # `cdf()`, `tail_prob()`, `mean()` and `std()` are in closed form, and the first two accept
+    # scalars or arrays.
+    def __init__(self, mu: float, sigma: float, rng: numpy.random.Generator = None):
+        super().__init__(min_value=0, max_value=numpy.inf, rng=rng)
 
         self.mu = mu
         self.sigma = sigma
 
         lower, upper = 0, mu + 10 * sigma
+        self.lower, self.upper = lower, upper
         self.max_value = upper
-        self.dist = scipy.stats.truncnorm(
-            a=(lower - mu) / sigma, b=(upper - mu) / sigma, loc=mu, scale=sigma
-        )
 
     def __repr__(self):
         return f"TruncatedNormal(mu= {self.mu}, sigma= {self.sigma})"
@@ -59,25 +65,140 @@ class TruncatedNormal(RandomVariable):
     def to_latex(self) -> str:
         return r"N^+({}, {})".format(self.mu, self.sigma)
 
+    @functools.cached_property
+    def mean_std(self) -> tuple[float, float]:
+        return special.truncated_norm_mean_std(mu=self.mu, sigma=self.sigma, lower=self.lower, upper=self.upper)
+
     def cdf(self, x: float) -> float:
-        return self.dist.cdf(x)
+        return special.truncated_norm_cdf(x, mu=self.mu, sigma=self.sigma, lower=self.lower, upper=self.upper)
 
     def tail_prob(self, x: float) -> float:
-        return 1 - self.cdf(x)
+        return special.truncated_norm_sf(x, mu=self.mu, sigma=self.sigma, lower=self.lower, upper=self.upper)
 
     def mean(self) -> float:
-        return self.dist.mean()
+        return self.mean_std[0]
 
     def std(self) -> float:
-        return self.dist.std()
+        return self.mean_std[1]
+
+    def sample(self, size: int = None):
+        return sample_truncated_normal(
+            rng=self.rng, mu=self.mu, sigma=self.sigma, lower=self.lower, upper=self.upper, size=size
+        )
+
+
+# Thresholds on the standardized truncation region to pick the strategy in `sample_truncated_normal()`.
+TRUNCATED_NORMAL_REJECTION_MIN_MASS = 0.5
+# Regions that contain [-z, z] for this `z` hold at least half of the mass.
+TRUNCATED_NORMAL_REJECTION_MAX_ALPHA = -0.6744897501960817
+TRUNCATED_NORMAL_EXP_REJECTION_MIN_ALPHA = 30
+
+
+# Draws samples from Normal(mu, sigma) truncated to [lower, upper]. The parameters are scalars or
+# arrays that broadcast together, and with `size` if given. The strategy is picked per element
+# over the standardized region [alpha, beta], which is mirrored around 0 so that most of it is
+# on the upper side:
+# - Rejection from Normal(0, 1) if the region holds at least half of the mass.
+# - Rejection from `alpha + Exponential(lambda)` (Robert, 1995) if `alpha` is so far in the tail
+#   that the mass of the region cannot be represented.
+# - Inverse-CDF over the upper tail otherwise, which takes a single uniform per sample.
+# The strategy is picked before the parameters are broadcast to `size`, and the mass is computed
+# only for the regions that do not contain [-0.67, 0.67], as `erfc` is the costly part.
+def sample_truncated_normal(rng: numpy.random.Generator, mu, sigma, lower, upper, size=None):
+    if size is None and not any(special.is_array(param) for param in (mu, sigma, lower, upper)):
+        z = sample_truncated_standard_normal(rng=rng, alpha=(lower - mu) / sigma, beta=(upper - mu) / sigma)
+        return float(mu + sigma * z)
+
+    mu, sigma, lower, upper = numpy.broadcast_arrays(
+        *(numpy.asarray(param, dtype=numpy.float64) for param in (mu, sigma, lower, upper))
+    )
+    if size is None:
+        shape = mu.shape
+    else:
+        shape = (size,) if isinstance(size, (int, numpy.integer)) else tuple(size)
+
+    alpha, beta = (lower - mu) / sigma, (upper - mu) / sigma
+    is_mirrored = alpha + beta < 0
+    alpha, beta = numpy.where(is_mirrored, -beta, alpha), numpy.where(is_mirrored, -alpha, beta)
+
+    # The upper tail masses are computed only for the inverse-CDF candidates, and reused.
+    strategy_array = numpy.where(alpha <= TRUNCATED_NORMAL_REJECTION_MAX_ALPHA, 0, 1)
+    strategy_array[alpha >= TRUNCATED_NORMAL_EXP_REJECTION_MIN_ALPHA] = 2
+    sf_alpha_array, sf_beta_array = numpy.zeros(alpha.shape), numpy.zeros(alpha.shape)
+    index_array = numpy.flatnonzero(strategy_array == 1)
+    sf_alpha_array.ravel()[index_array] = special.norm_sf(alpha.ravel()[index_array])
+    sf_beta_array.ravel()[index_array] = special.norm_sf(beta.ravel()[index_array])
+    is_wide = sf_alpha_array.ravel()[index_array] - sf_beta_array.ravel()[index_array] >= TRUNCATED_NORMAL_REJECTION_MIN_MASS
+    strategy_array.ravel()[index_array[is_wide]] = 0
+
+    mu, sigma, alpha, beta, is_mirrored, strategy_array, sf_alpha_array, sf_beta_array = (
+        numpy.broadcast_to(array, shape).ravel()
+        for array in (mu, sigma, alpha, beta, is_mirrored, strategy_array, sf_alpha_array, sf_beta_array)
+    )
+    z_array = numpy.empty(len(mu))
+
+    index_array = numpy.flatnonzero(strategy_array == 0)
+    while len(index_array):
+        candidate_array = rng.standard_normal(len(index_array))
+        is_accepted = (candidate_array >= alpha[index_array]) & (candidate_array <= beta[index_array])
+        z_array[index_array[is_accepted]] = candidate_array[is_accepted]
+        index_array = index_array[~is_accepted]
+
+    index_array = numpy.flatnonzero(strategy_array == 1)
+    if len(index_array):
+        sf_alpha_array, sf_beta_array = sf_alpha_array[index_array], sf_beta_array[index_array]
+        sf_array = sf_alpha_array - rng.random(len(index_array)) * (sf_alpha_array - sf_beta_array)
+        z_array[index_array] = numpy.clip(-special.norm_ppf(sf_array), alpha[index_array], beta[index_array])
+
+    index_array = numpy.flatnonzero(strategy_array == 2)
+    while len(index_array):
+        alpha_array = alpha[index_array]
+        lambda_array = (alpha_array + numpy.sqrt(alpha_array**2 + 4)) / 2
+        candidate_array = alpha_array + rng.exponential(scale=1 / lambda_array)
+        is_accepted = (
+            (rng.random(len(index_array)) <= numpy.exp(-((candidate_array - lambda_array) ** 2) / 2))
+            & (candidate_array <= beta[index_array])
+        )
+        z_array[index_array[is_accepted]] = candidate_array[is_accepted]
+        index_array = index_array[~is_accepted]
+
+    sample_array = mu + sigma * numpy.where(is_mirrored, -z_array, z_array)
+    return float(sample_array[0]) if shape == () else sample_array.reshape(shape)
+
+
+# Scalar version of `sample_truncated_normal()` for Normal(0, 1) truncated to [alpha, beta].
+# Consumes `rng` like `sample_truncated_normal()` does for a single element.
+def sample_truncated_standard_normal(rng: numpy.random.Generator, alpha: float, beta: float) -> float:
+    is_mirrored = alpha + beta < 0
+    if is_mirrored:
+        alpha, beta = -beta, -alpha
+
+    if alpha >= TRUNCATED_NORMAL_EXP_REJECTION_MIN_ALPHA:
+        lambda_ = (alpha + math.sqrt(alpha**2 + 4)) / 2
+        while True:
+            z = alpha + rng.exponential(scale=1 / lambda_)
+            if rng.random() <= math.exp(-((z - lambda_) ** 2) / 2) and z <= beta:
+                break
+
+    else:
+        sf_alpha = sf_beta = None
+        if alpha > TRUNCATED_NORMAL_REJECTION_MAX_ALPHA:
+            sf_alpha, sf_beta = special.norm_sf(alpha), special.norm_sf(beta)
 
-    def sample(self) -> float:
-        return self.dist.rvs(size=1)[0]
+        if sf_alpha is None or sf_alpha - sf_beta >= TRUNCATED_NORMAL_REJECTION_MIN_MASS:
+            while True:
+                z = rng.standard_normal()
+                if alpha <= z <= beta:
+                    break
+        else:
+            z = min(max(-special.norm_ppf(sf_alpha - rng.random() * (sf_alpha - sf_beta)), alpha), beta)
+
+    return -z if is_mirrored else z
 
 
 class Exponential(RandomVariable):
-    def __init__(self, mu: float, D: float = 0):
-        super().__init__(min_value=D, max_value=numpy.inf)
+    def __init__(self, mu: float, D: float = 0, rng: numpy.random.Generator = None):
+        super().__init__(min_value=D, max_value=numpy.inf, rng=rng)
         self.D = D
         self.mu = mu
 
@@ -122,33 +243,31 @@ class Exponential(RandomVariable):
 
         return self.mu / (s + self.mu)
 
-    def sample(self) -> float:
-        return self.D + random.expovariate(self.mu)
+    def sample(self, size: int = None):
+        return self.D + self.rng.exponential(scale=1 / self.mu, size=size)
 
 
 class Uniform(RandomVariable):
-    def __init__(self, min_value: float, max_value: float):
-        super().__init__(min_value=min_value, max_value=max_value)
-
-        self.dist = scipy.stats.uniform(loc=min_value, scale=max_value - min_value)
+    def __init__(self, min_value: float, max_value: float, rng: numpy.random.Generator = None):
+        super().__init__(min_value=min_value, max_value=max_value, rng=rng)
 
     def __repr__(self):
         return f"Uniform({self.min_value}, {self.max_value})"
 
-    def sample(self) -> float:
-        return self.dist.rvs()
+    def mean(self) -> float:
+        return (self.min_value + self.max_value) / 2
+
+    def sample(self, size: int = None):
+        return self.rng.uniform(low=self.min_value, high=self.max_value, size=size)
 
 
 class DiscreteUniform(RandomVariable):
-    def __init__(self, min_value: float, max_value: float):
-        super().__init__(min_value=min_value, max_value=max_value)
-
-        self.value_list = numpy.arange(self.min_value, self.max_value + 1)
-        weight_list = [1 for _ in self.value_list]
-        self.prob_list = [weight / sum(weight_list) for weight in weight_list]
-        self.dist = scipy.stats.rv_discrete(
-            name="duniform", values=(self.value_list, self.prob_list)
-        )
+    # Uniform over the integers in [min_value, max_value]. All methods are in closed form,
+    # so nothing is tabulated over the support.
+    def __init__(self, min_value: float, max_value: float, rng: numpy.random.Generator = None):
+        super().__init__(min_value=min_value, max_value=max_value, rng=rng)
+
+        self.num_values = int(self.max_value - self.min_value + 1)
 
     def __repr__(self):
         return f"DiscreteUniform({self.min_value}, {self.max_value})"
@@ -160,35 +279,160 @@ class DiscreteUniform(RandomVariable):
         return (self.max_value + self.min_value) / 2
 
     def pdf(self, x: float) -> float:
-        return self.dist.pmf(x)
+        if x < self.min_value or x > self.max_value or x != math.floor(x):
+            return 0
+
+        return 1 / self.num_values
 
     def cdf(self, x: float) -> float:
         if x < self.min_value:
             return 0
         elif x > self.max_value:
             return 1
-        return self.dist.cdf(math.floor(x))
+        return (math.floor(x) - self.min_value + 1) / self.num_values
 
     def tail_prob(self, x: float) -> float:
         return 1 - self.cdf(x)
 
     def moment(self, i: int) -> float:
-        return self.dist.moment(i)
+        return float(numpy.mean(numpy.arange(self.min_value, self.max_value + 1, dtype=float)**i))
 
-    def sample(self) -> float:
-        return self.dist.rvs()  # [0]
+    def sample(self, size: int = None):
+        return self.rng.integers(low=self.min_value, high=self.max_value, endpoint=True, size=size)
 
 
-class CustomDiscrete(RandomVariable):
-    def __init__(self, value_list: list[float], prob_weight_list: list[float]):
-        super().__init__(min_value=min(value_list), max_value=max(value_list))
-        self.value_list = value_list
-        self.prob_weight_list = prob_weight_list
+class TabulatedDiscrete(RandomVariable):
+    # Discrete RV over `value_array` with the probabilities in `prob_array`.
+    # Sampling is O(1) per draw with an alias table, and `cdf()` / `inverse_cdf()` are
+    # binary searches over the cached CDF array. All methods accept scalars or arrays.
+    def __init__(
+        self,
+        value_array: numpy.ndarray,
+        prob_array: numpy.ndarray,
+        rng: numpy.random.Generator = None,
+    ):
+        value_array = numpy.asarray(value_array)
+        order = numpy.argsort(value_array, kind="stable")
+        self.value_array = value_array[order]
+        self.prob_array = numpy.asarray(prob_array, dtype=float)[order]
+        self.prob_array /= self.prob_array.sum()
+
+        super().__init__(min_value=self.value_array[0], max_value=self.value_array[-1], rng=rng)
+
+        self.alias_table = alias.AliasTable(prob_array=self.prob_array)
+
+    def pdf(self, x):
+        index = numpy.minimum(numpy.searchsorted(self.value_array, x), len(self.value_array) - 1)
+        return to_scalar_if_scalar(x, numpy.where(self.value_array[index] == x, self.prob_array[index], 0))
+
+    def cdf(self, x):
+        index = numpy.searchsorted(self.value_array, x, side="right") - 1
+        return to_scalar_if_scalar(x, numpy.where(index >= 0, self.alias_table.cdf_array[index], 0))
+
+    def inverse_cdf(self, prob):
+        return to_scalar_if_scalar(prob, self.value_array[self.alias_table.inverse_cdf_index(prob)])
+
+    def tail_prob(self, x):
+        return 1 - self.cdf(x)
 
-        self.prob_list = [weight / sum(prob_weight_list) for weight in prob_weight_list]
-        self.dist = scipy.stats.rv_discrete(
-            name="custom_discrete", values=(self.value_list, self.prob_list)
+    def mean(self) -> float:
+        return float(numpy.dot(self.value_array, self.prob_array))
+
+    def moment(self, i: int) -> float:
+        return float(numpy.dot(self.value_array.astype(float)**i, self.prob_array))
+
+    def sample(self, size: int = None):
+        index = self.alias_table.sample_index(rng=self.rng, size=size)
+        return self.value_array[index]
+
+
+def to_scalar_if_scalar(x, value):
+    return value.item() if numpy.ndim(x) == 0 else value
+
+
+class BufferedRandomVariable(RandomVariable):
+    # Wraps `random_variable` to hand out its samples from blocks of `block_size` samples,
+    # drawn with one `random_variable.sample(size=block_size)` call. A block is drawn only
+    # once the previous one runs out. All the other attributes are delegated.
+    #
+    # The samples are the same as without buffering, which requires that drawing `n` samples at
+    # once consumes the `rng` stream like drawing them one at a time. This holds for all the RVs
+    # here but `TruncatedNormal`, whose rejection sampling redraws the rejected samples after the
+    # whole batch, so it cannot be buffered.
+    # Note: The blocks are drawn ahead, so `rng` should not be shared with another RV if the
+    # samples should not depend on buffering.
+    def __init__(self, random_variable: RandomVariable, block_size: int = 4096):
+        check(
+            not isinstance(random_variable, TruncatedNormal),
+            "`TruncatedNormal` cannot be buffered, as its batched samples differ from the one-at-a-time ones",
+            random_variable=random_variable,
         )
+        super().__init__(
+            min_value=random_variable.min_value,
+            max_value=random_variable.max_value,
+            rng=random_variable.rng,
+        )
+
+        check(block_size > 0, "`block_size` should be positive", block_size=block_size)
+        self.random_variable = random_variable
+        self.block_size = block_size
+
+        self.buffer = numpy.empty(0)
+        self.index = 0
+
+    def __repr__(self):
+        return f"BufferedRandomVariable({self.random_variable}, block_size= {self.block_size})"
+
+    def __getattr__(self, name: str):
+        # Called only for the attributes not found on `self`. The guard avoids recursion
+        # when `random_variable` is not set yet, e.g., while unpickling.
+        if name == "random_variable":
+            raise AttributeError(name)
+
+        return getattr(self.random_variable, name)
+
+    def num_buffered_samples(self) -> int:
+        return len(self.buffer) - self.index
+
+    def refill(self):
+        self.buffer = self.random_variable.sample(size=self.block_size)
+        self.index = 0
+
+    def sample(self, size: int = None):
+        if size is None:
+            if self.index == len(self.buffer):
+                self.refill()
+
+            self.index += 1
+            return self.buffer[self.index - 1]
+
+        sample_array_list = []
+        num_remaining = size
+        while num_remaining > 0:
+            if self.index == len(self.buffer):
+                self.refill()
+
+            num_taken = min(num_remaining, len(self.buffer) - self.index)
+            sample_array_list.append(self.buffer[self.index : self.index + num_taken])
+            self.index += num_taken
+            num_remaining -= num_taken
+
+        if not sample_array_list:
+            return self.random_variable.sample(size=0)
+
+        return numpy.concatenate(sample_array_list)
+
+
+class CustomDiscrete(TabulatedDiscrete):
+    def __init__(
+        self,
+        value_list: list[float],
+        prob_weight_list: list[float],
+        rng: numpy.random.Generator = None,
+    ):
+        super().__init__(value_array=value_list, prob_array=prob_weight_list, rng=rng)
+        self.value_list = value_list
+        self.prob_weight_list = prob_weight_list
 
     def __repr__(self):
         return (
@@ -198,43 +442,12 @@ class CustomDiscrete(RandomVariable):
             ")"
         )
 
-    def sample(self) -> float:
-        return self.dist.rvs()
-
 
-class BoundedZipf(RandomVariable):
-    def __init__(self, min_value, max_value, a=1):
-        super().__init__(min_value=min_value, max_value=max_value)
+class BoundedZipf(TabulatedDiscrete):
+    def __init__(self, min_value, max_value, a=1, rng: numpy.random.Generator = None):
+        value_array = numpy.arange(min_value, max_value + 1)
+        super().__init__(value_array=value_array, prob_array=value_array.astype(float) ** (-a), rng=rng)
         self.a = a
 
-        self.value_list = numpy.arange(self.min_value, self.max_value + 1)
-        weight_list = [float(value) ** (-a) for value in self.value_list]
-        self.prob_list = [weight / sum(weight_l) for weight in weight_list]
-        self.dist = scipy.stats.rv_discrete(
-            name="bounded_zipf", values=(self.value_list, self.prob_list)
-        )
-
     def __repr__(self):
         return f"BoundedZipf([{self.min_value}, {self.max_value}], a= {self.a})"
-
-    def pdf(self, x: float) -> float:
-        return self.dist.pmf(x)
-
-    def cdf(self, x: float) -> float:
-        # if x < self.min_value: return 0
-        # elif x >= self.max_value: return 1
-        # else:
-        #   return sum(self.prob_list[:(x-self.min_value+1)])
-        return self.dist.cdf(x)
-
-    def inverse_cdf(self, pob: float) -> float:
-        return self.dist.ppf(prob)
-
-    def tail_prob(self, x: float) -> float:
-        return 1 - self.cfd(x)
-
-    def mean(self) -> float:
-        return self.dist.mean()
-
-    def sample(self) -> float:
-        return self.dist.rvs(size=1)[0]
@@ -0,0 +1,214 @@
+import asyncio
+import collections
+import dataclasses
+import enum
+import numpy
+import time
+
+from typing import Tuple
+
+from src.agent import agent as agent_module
+from src.utils.debug import *
+
+
+class RequestType(enum.Enum):
+    decision = "decision"
+    feedback = "feedback"
+
+
+@dataclasses.dataclass
+class Request:
+    request_type: RequestType
+    future: asyncio.Future
+    enqueue_time: float
+    arm_id: int = None
+    reward: float = None
+
+
+class DecisionServer:
+    # Asyncio front-end that serves concurrent `decide()` and `feedback()` calls with an agent.
+    #
+    # Requests are queued, and coalesced into micro-batches of at most `max_batch_size` requests,
+    # waiting at most `max_wait` secs after the first request of a batch. Within a batch, the
+    # feedback is applied first with one `observe_batch()` call, and then the decisions are made
+    # with one `next_actions()` call.
+    def __init__(
+        self,
+        agent: agent_module.Agent,
+        max_batch_size: int = 64,
+        max_wait: float = 0.001,
+        num_latency_samples: int = 100_000,
+    ):
+        self.agent = agent
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self.request_queue = None
+        # Set when a request is queued, so that `get_batch()` never loses a dequeued request to a timeout.
+        self.request_event = None
+        # Requests dequeued into the batch being built or served, to be failed on `stop()`.
+        self.batch_request_list = []
+        self.batch_loop_task = None
+
+        self.num_batches = 0
+        self.request_type_to_latency_queue_map = {
+            request_type: collections.deque(maxlen=num_latency_samples) for request_type in RequestType
+        }
+
+    def __repr__(self):
+        return (
+            "DecisionServer( \n"
+            f"\t agent= {self.agent} \n"
+            f"\t max_batch_size= {self.max_batch_size} \n"
+            f"\t max_wait= {self.max_wait} \n"
+            ")"
+        )
+
+    async def start(self):
+        self.request_queue = asyncio.Queue()
+        self.request_event = asyncio.Event()
+        self.batch_request_list = []
+        self.batch_loop_task = asyncio.create_task(self.run_batch_loop())
+
+    # Fails the requests that are not served yet, including those in the batch being built.
+    async def stop(self):
+        self.batch_loop_task.cancel()
+        try:
+            await self.batch_loop_task
+        except asyncio.CancelledError:
+            pass
+
+        request_list = self.batch_request_list
+        self.batch_request_list = []
+        while not self.request_queue.empty():
+            request_list.append(self.request_queue.get_nowait())
+
+        for request in request_list:
+            if not request.future.done():
+                request.future.set_exception(RuntimeError("DecisionServer is stopped"))
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+    async def submit(self, request_type: RequestType, arm_id: int = None, reward: float = None):
+        if self.batch_loop_task is None or self.batch_loop_task.done():
+            raise RuntimeError("DecisionServer is stopped")
+
+        loop = asyncio.get_running_loop()
+        request = Request(
+            request_type=request_type,
+            future=loop.create_future(),
+            enqueue_time=time.perf_counter(),
+            arm_id=arm_id,
+            reward=reward,
+        )
+        self.request_queue.put_nowait(request)
+        self.request_event.set()
+        return await request.future
+
+    async def decide(self) -> int:
+        return await self.submit(request_type=RequestType.decision)
+
+    # Returns once the feedback is applied to the agent.
+    async def feedback(self, arm_id: int, reward: float):
+        await self.submit(request_type=RequestType.feedback, arm_id=arm_id, reward=reward)
+
+    # Returns True once the queue is not empty, or False if `deadline` passes first.
+    async def wait_for_request(self, deadline: float = None) -> bool:
+        while self.request_queue.empty():
+            self.request_event.clear()
+            timeout = None if deadline is None else deadline - time.perf_counter()
+            if timeout is not None and timeout <= 0:
+                return False
+
+            try:
+                await asyncio.wait_for(self.request_event.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return False
+
+        return True
+
+    # Requests are only taken with `get_nowait()`, so a timeout can never drop a dequeued request.
+    async def get_batch(self) -> list[Request]:
+        await self.wait_for_request()
+        request_list = self.batch_request_list = [self.request_queue.get_nowait()]
+
+        deadline = time.perf_counter() + self.max_wait
+        while len(request_list) < self.max_batch_size:
+            if not await self.wait_for_request(deadline=deadline):
+                break
+
+            request_list.append(self.request_queue.get_nowait())
+
+        return request_list
+
+    async def run_batch_loop(self):
+        while True:
+            request_list = await self.get_batch()
+            self.num_batches += 1
+
+            try:
+                self.serve_batch(request_list=request_list)
+            except Exception as e:
+                log(ERROR, "Failed to serve batch", e=e)
+                for request in request_list:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+            self.batch_request_list = []
+
+    def serve_batch(self, request_list: list[Request]):
+        feedback_request_list = [request for request in request_list if request.request_type == RequestType.feedback]
+        decision_request_list = [request for request in request_list if request.request_type == RequestType.decision]
+
+        if feedback_request_list:
+            self.agent.observe_batch(
+                arm_ids=numpy.array([request.arm_id for request in feedback_request_list]),
+                rewards=numpy.array([request.reward for request in feedback_request_list], dtype=float),
+            )
+            self.complete(request_list=feedback_request_list, result_list=[None] * len(feedback_request_list))
+
+        if decision_request_list:
+            arm_id_array = self.agent.next_actions(num_actions=len(decision_request_list))
+            self.complete(request_list=decision_request_list, result_list=arm_id_array.tolist())
+
+    def complete(self, request_list: list[Request], result_list: list):
+        now = time.perf_counter()
+        for request, result in zip(request_list, result_list):
+            self.request_type_to_latency_queue_map[request.request_type].append(now - request.enqueue_time)
+            if not request.future.cancelled():
+                request.future.set_result(result)
+
+    # Returns the latency percentiles in secs as `{percentile: latency}`.
+    def latency_percentiles(
+        self,
+        request_type: RequestType = RequestType.decision,
+        percentile_list: Tuple[float, ...] = (50, 90, 99),
+    ) -> dict[float, float]:
+        latency_queue = self.request_type_to_latency_queue_map[request_type]
+        if len(latency_queue) == 0:
+            return {}
+
+        return dict(zip(percentile_list, numpy.percentile(latency_queue, percentile_list).tolist()))
+
+
+class LocalClient:
+    # In-process client for `DecisionServer`, e.g., for tests and benchmarks without network.
+    def __init__(self, server: DecisionServer):
+        self.server = server
+
+    async def decide(self) -> int:
+        return await self.server.decide()
+
+    async def feedback(self, arm_id: int, reward: float):
+        await self.server.feedback(arm_id=arm_id, reward=reward)
+
+    # Decides and reports the reward given by `reward_func(arm_id)`.
+    async def decide_and_feedback(self, reward_func) -> int:
+        arm_id = await self.decide()
+        await self.feedback(arm_id=arm_id, reward=reward_func(arm_id))
+        return arm_id
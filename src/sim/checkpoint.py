@@ -0,0 +1,139 @@
+import dataclasses
+import os
+import pickle
+import threading
+
+from src.agent import agent as agent_module
+from src.env import bandit as bandit_module
+from src.sim import result as result_module
+from src.utils.debug import *
+
+
+@dataclasses.dataclass
+class Checkpoint:
+    # State of `sim.sim()` after `round_index` rounds of run `run_index`, where the runs before
+    # `run_index` are already added to `mean_sim_result`. `sim_result` is None once all runs are
+    # done. The bandit and agents carry their RNGs, so a resumed sim draws the same samples as an
+    # uninterrupted one.
+    bandit: bandit_module.Bandit
+    agent_list: list[agent_module.Agent]
+    sim_result: result_module.SimResult
+    mean_sim_result: result_module.MeanSimResult
+    run_index: int
+    round_index: int
+    num_rounds: int
+    num_sim_runs: int
+
+
+def load_checkpoint(path: str) -> Checkpoint:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+# Restores the state in `checkpoint` into `bandit` and `agent_list` in place, and re-keys the
+# results with `agent_list`, so that the sim continues with the objects of the caller.
+# Fails if the checkpoint is of another experiment, i.e., if `num_rounds`, `num_sim_runs`, the
+# bandit type and number of arms, or the agent types and names do not match.
+def restore_checkpoint(
+    checkpoint: Checkpoint,
+    bandit: bandit_module.Bandit,
+    agent_list: list[agent_module.Agent],
+    num_rounds: int,
+    num_sim_runs: int,
+):
+    check(
+        (checkpoint.num_rounds, checkpoint.num_sim_runs) == (num_rounds, num_sim_runs),
+        "`num_rounds` and `num_sim_runs` should match the checkpoint",
+        num_rounds=num_rounds,
+        num_sim_runs=num_sim_runs,
+        checkpoint_num_rounds=checkpoint.num_rounds,
+        checkpoint_num_sim_runs=checkpoint.num_sim_runs,
+    )
+    check(
+        type(bandit) is type(checkpoint.bandit) and bandit.num_arms == checkpoint.bandit.num_arms,
+        "Bandit should match the checkpoint",
+        bandit=bandit,
+        checkpoint_bandit=checkpoint.bandit,
+    )
+    check(
+        [(type(agent), agent.name) for agent in agent_list]
+        == [(type(agent), agent.name) for agent in checkpoint.agent_list],
+        "Agents should match the checkpoint",
+        agent_list=agent_list,
+        checkpoint_agent_list=checkpoint.agent_list,
+    )
+
+    vars(bandit).update(vars(checkpoint.bandit))
+    for agent, checkpoint_agent in zip(agent_list, checkpoint.agent_list):
+        vars(agent).update(vars(checkpoint_agent))
+
+    if checkpoint.sim_result is not None:
+        checkpoint.sim_result.replace_agents(agent_list=agent_list)
+    checkpoint.mean_sim_result.replace_agents(agent_list=agent_list)
+    checkpoint.bandit, checkpoint.agent_list = bandit, agent_list
+
+
+class CheckpointWriter:
+    # Writes checkpoints to `path` without blocking the sim loop for the write.
+    #
+    # `write()` pickles the checkpoint in the calling thread, which takes a consistent snapshot
+    # in time linear in the size of the state, and hands the bytes to a writer thread. The writer
+    # thread writes them to a temporary file and moves it over `path` with `os.replace()`, so
+    # `path` always holds a complete checkpoint. If the previous write is still in progress,
+    # `write()` skips the checkpoint rather than waiting for it.
+    def __init__(self, path: str):
+        self.path = path
+
+        self.num_written = 0
+        self.num_skipped = 0
+        self.write_exception = None
+        self.write_thread = None
+
+    def __repr__(self):
+        return f"CheckpointWriter(path= {self.path})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def is_writing(self) -> bool:
+        return self.write_thread is not None and self.write_thread.is_alive()
+
+    # Returns True if the checkpoint is handed to the writer thread, and False if it is skipped.
+    def write(self, checkpoint: Checkpoint) -> bool:
+        if self.write_exception is not None:
+            raise self.write_exception
+
+        if self.is_writing():
+            self.num_skipped += 1
+            return False
+
+        checkpoint_bytes = pickle.dumps(checkpoint, protocol=pickle.HIGHEST_PROTOCOL)
+        self.write_thread = threading.Thread(target=self.write_bytes, args=(checkpoint_bytes,), daemon=True)
+        self.write_thread.start()
+        return True
+
+    def write_bytes(self, checkpoint_bytes: bytes):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(checkpoint_bytes)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(tmp_path, self.path)
+            self.num_written += 1
+
+        except Exception as e:
+            log(ERROR, "Failed to write checkpoint", path=self.path, e=e)
+            self.write_exception = e
+
+    # Waits for the pending write to finish.
+    def close(self):
+        if self.write_thread is not None:
+            self.write_thread.join()
+
+        if self.write_exception is not None:
+            raise self.write_exception
@@ -1,60 +1,227 @@
-import collections
 import dataclasses
+import numpy
+
+from typing import Tuple
 
 from src.agent import agent as agent_module
+from src.prob import special
+from src.utils.debug import *
+
+
+@dataclasses.dataclass(frozen=True)
+class AgentKey:
+    # Stands in for an agent in the results by its position and name, e.g., for the results sent
+    # back from worker processes. Keys with the same (index, name) are equal across processes.
+    index: int
+    name: str
 
 
-@dataclasses.dataclass
 class SimResult:
-    agent_to_reward_samples_map: dict[agent_module.Agent, list] = dataclasses.field(
-        default_factory=lambda: collections.defaultdict(list)
-    )
-    high_reward_sample_list: list = dataclasses.field(
-        default_factory=list
-    )
+    # Keeps the rewards of a run in preallocated (num_agents, num_rounds) arrays of `dtype`,
+    # together with the chosen arm ids and the high rewards, rather than in lists of boxed floats.
+    # Arrays start with room for `num_rounds` rounds and double in capacity when a run goes
+    # beyond. Agents not given in `agent_list` are added on their first reward.
+    # `reward_array()`, `arm_id_array()` and `high_reward_array()` return zero-copy views of the
+    # recorded rounds. `agent_to_reward_samples_map` and `high_reward_sample_list` return lists as
+    # before, for compatibility.
+    def __init__(
+        self,
+        agent_list: list[agent_module.Agent] = None,
+        num_rounds: int = 0,
+        dtype: numpy.dtype = numpy.float64,
+    ):
+        self.dtype = numpy.dtype(dtype)
+        check(self.dtype in (numpy.float32, numpy.float64), "`dtype` should be float32 or float64", dtype=dtype)
+
+        self.agent_list = []
+        self.agent_to_index_map = {}
+        self.reward_matrix = numpy.empty((0, num_rounds), dtype=self.dtype)
+        self.arm_id_matrix = numpy.empty((0, num_rounds), dtype=numpy.int64)
+        self.num_rewards_array = numpy.zeros(0, dtype=numpy.int64)
+
+        self.high_reward_buffer = numpy.empty(num_rounds, dtype=self.dtype)
+        self.num_high_rewards = 0
+
+        for agent in agent_list or []:
+            self.add_agent(agent=agent)
+
+    def __repr__(self):
+        return (
+            "SimResult( \n"
+            f"\t num_agents= {len(self.agent_list)} \n"
+            f"\t num_rewards_array= {self.num_rewards_array} \n"
+            f"\t num_high_rewards= {self.num_high_rewards} \n"
+            ")"
+        )
+
+    def nbytes(self) -> int:
+        return self.reward_matrix.nbytes + self.arm_id_matrix.nbytes + self.high_reward_buffer.nbytes
+
+    def add_agent(self, agent: agent_module.Agent) -> int:
+        check(agent not in self.agent_to_index_map, "Agent is already added", agent=agent)
+
+        agent_index = len(self.agent_list)
+        self.agent_to_index_map[agent] = agent_index
+        self.agent_list.append(agent)
+
+        capacity = self.reward_matrix.shape[1]
+        self.reward_matrix = numpy.vstack([self.reward_matrix, numpy.empty((1, capacity), dtype=self.dtype)])
+        self.arm_id_matrix = numpy.vstack([self.arm_id_matrix, numpy.full((1, capacity), -1, dtype=numpy.int64)])
+        self.num_rewards_array = numpy.append(self.num_rewards_array, 0)
+        return agent_index
 
-    def append_reward_sample(self, agent: agent_module.Agent, reward: float):
-        self.agent_to_reward_samples_map[agent].append(reward)
+    # Pickles only the recorded rounds rather than the whole capacity, e.g., for checkpoints and
+    # for sending the result of a run across processes. The capacity is restored on load.
+    def __getstate__(self) -> dict:
+        num_filled = max(self.num_high_rewards, int(self.num_rewards_array.max(initial=0)))
+
+        state = dict(vars(self))
+        state["reward_matrix"] = self.reward_matrix[:, :num_filled]
+        state["arm_id_matrix"] = self.arm_id_matrix[:, :num_filled]
+        state["high_reward_buffer"] = self.high_reward_buffer[:num_filled]
+        state["capacity"] = self.reward_matrix.shape[1]
+        return state
+
+    def __setstate__(self, state: dict):
+        capacity = state.pop("capacity")
+        vars(self).update(state)
+        self.set_capacity(capacity=capacity)
+
+    def grow(self, min_capacity: int):
+        self.set_capacity(capacity=max(min_capacity, 2 * self.reward_matrix.shape[1], 16))
+
+    def set_capacity(self, capacity: int):
+        num_agents = len(self.agent_list)
+
+        reward_matrix = numpy.empty((num_agents, capacity), dtype=self.dtype)
+        reward_matrix[:, : self.reward_matrix.shape[1]] = self.reward_matrix
+        self.reward_matrix = reward_matrix
+
+        arm_id_matrix = numpy.full((num_agents, capacity), -1, dtype=numpy.int64)
+        arm_id_matrix[:, : self.arm_id_matrix.shape[1]] = self.arm_id_matrix
+        self.arm_id_matrix = arm_id_matrix
+
+        high_reward_buffer = numpy.empty(capacity, dtype=self.dtype)
+        high_reward_buffer[: len(self.high_reward_buffer)] = self.high_reward_buffer
+        self.high_reward_buffer = high_reward_buffer
+
+    # `arm_id` is recorded as -1 if not given.
+    def append_reward_sample(self, agent: agent_module.Agent, reward: float, arm_id: int = -1):
+        agent_index = self.agent_to_index_map.get(agent)
+        if agent_index is None:
+            agent_index = self.add_agent(agent=agent)
+
+        num_rewards = self.num_rewards_array[agent_index]
+        if num_rewards == self.reward_matrix.shape[1]:
+            self.grow(min_capacity=num_rewards + 1)
+
+        self.reward_matrix[agent_index, num_rewards] = reward
+        self.arm_id_matrix[agent_index, num_rewards] = arm_id
+        self.num_rewards_array[agent_index] = num_rewards + 1
 
     def append_high_reward_sample(self, reward: float):
-        self.high_reward_sample_list.append(reward)
+        if self.num_high_rewards == len(self.high_reward_buffer):
+            self.grow(min_capacity=self.num_high_rewards + 1)
 
+        self.high_reward_buffer[self.num_high_rewards] = reward
+        self.num_high_rewards += 1
 
-class MeanSimResult:
-    def __init__(self, sim_result_list: list[SimResult]):
-        # Construct `agent_to_reward_samples_list_map`
-        agent_to_reward_samples_list_map = collections.defaultdict(list)
-        for sim_result in sim_result_list:
-            for agent, reward_list in sim_result.agent_to_reward_samples_map.items():
-                agent_to_reward_samples_list_map[agent].append(reward_list)
-
-        self.agent_to_mean_rewards_map = {
-            agent: self.get_mean_rewards(reward_samples_list=reward_samples_list)
-            for agent, reward_samples_list in agent_to_reward_samples_list_map.items()
-        }
+    def reward_array(self, agent: agent_module.Agent) -> numpy.ndarray:
+        agent_index = self.agent_to_index_map[agent]
+        return self.reward_matrix[agent_index, : self.num_rewards_array[agent_index]]
+
+    def arm_id_array(self, agent: agent_module.Agent) -> numpy.ndarray:
+        agent_index = self.agent_to_index_map[agent]
+        return self.arm_id_matrix[agent_index, : self.num_rewards_array[agent_index]]
+
+    def high_reward_array(self) -> numpy.ndarray:
+        return self.high_reward_buffer[: self.num_high_rewards]
 
-        # Construct `mean_high_reward_list`
-        self.mean_high_reward_list = self.get_mean_rewards(
-            reward_samples_list=[sim_result.high_reward_sample_list for sim_result in sim_result_list]
+    # Re-keys the rows with `agent_list` by position, e.g., with the agents of another process.
+    def replace_agents(self, agent_list: list[agent_module.Agent]):
+        check(
+            len(agent_list) == len(self.agent_list),
+            "Number of agents in the result should match `agent_list`",
+            num_agents_in_result=len(self.agent_list),
+            num_agents=len(agent_list),
         )
 
-        # # Construct `agent_to_mean_regrets_map`
-        # self.agent_to_mean_regret_list_map = {}
-        # for agent, mean_reward_list in self.agent_to_mean_rewards_map.items():
-        #     self.agent_to_mean_regret_list_map[agent] = [
-        #         mean_high_reward - mean_reward
-        #         for mean_reward, mean_high_reward in zip(mean_reward_list, self.mean_high_reward_list)
-        #     ]
+        self.agent_list = list(agent_list)
+        self.agent_to_index_map = {agent: agent_index for agent_index, agent in enumerate(agent_list)}
 
-        # Construct `aagent_to_mean_regrets_map`
-        self.agent_to_cum_mean_regret_list_map = {}
-        for agent, mean_reward_list in self.agent_to_mean_rewards_map.items():
-            cum_mean_regret_list = []
-            for mean_reward, mean_high_reward in zip(mean_reward_list, self.mean_high_reward_list):
-                cum_mean_regret = cum_mean_regret_list[-1] if cum_mean_regret_list else 0
-                cum_mean_regret_list.append(cum_mean_regret + mean_high_reward - mean_reward)
+    @property
+    def agent_to_reward_samples_map(self) -> dict[agent_module.Agent, list]:
+        return {agent: self.reward_array(agent=agent).tolist() for agent in self.agent_list}
 
-            self.agent_to_cum_mean_regret_list_map[agent] = cum_mean_regret_list
+    @property
+    def high_reward_sample_list(self) -> list:
+        return self.high_reward_array().tolist()
+
+
+class RunningStats:
+    # Per-round (count, mean, M2) arrays over the sim runs, updated with Welford's algorithm as
+    # each run is added, where M2 is the sum of squared deviations from the mean.
+    # The arrays are allocated on the first `add()`, with the number of rounds of that run.
+    def __init__(self):
+        self.count = 0
+        self.mean_array = None
+        self.M2_array = None
+
+    def __repr__(self):
+        num_values = None if self.mean_array is None else len(self.mean_array)
+        return f"RunningStats(count= {self.count}, num_values= {num_values})"
+
+    @classmethod
+    def from_moment_arrays(cls, count: int, mean_array: numpy.ndarray, M2_array: numpy.ndarray) -> "RunningStats":
+        running_stats = cls()
+        running_stats.count = count
+        running_stats.mean_array = numpy.asarray(mean_array, dtype=float)
+        running_stats.M2_array = numpy.asarray(M2_array, dtype=float)
+        return running_stats
+
+    def add(self, value_array: numpy.ndarray):
+        value_array = numpy.asarray(value_array, dtype=float)
+        if self.mean_array is None:
+            self.mean_array = numpy.zeros(len(value_array))
+            self.M2_array = numpy.zeros(len(value_array))
+        check(
+            value_array.shape == self.mean_array.shape,
+            "All runs should have the same number of rounds",
+            num_values=len(value_array),
+            expected_num_values=len(self.mean_array),
+        )
+
+        self.count += 1
+        delta_array = value_array - self.mean_array
+        self.mean_array += delta_array / self.count
+        self.M2_array += delta_array * (value_array - self.mean_array)
+
+    # Returns the sample variance, which is NaN with fewer than 2 runs.
+    def var_array(self) -> numpy.ndarray:
+        if self.count < 2:
+            return numpy.full(len(self.mean_array), numpy.nan)
+
+        return self.M2_array / (self.count - 1)
+
+    # Returns the (lower, upper) arrays of the normal-approximation confidence interval of the mean.
+    def confidence_interval_arrays(self, confidence: float = 0.95) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        z = special.norm_ppf(0.5 + confidence / 2)
+        half_width_array = z * numpy.sqrt(self.var_array() / self.count)
+        return self.mean_array - half_width_array, self.mean_array + half_width_array
+
+
+class MeanSimResult:
+    # Aggregates the results of the sim runs as they finish with `add_sim_result()`. For each agent,
+    # keeps the `RunningStats` of the per-round reward and of the per-round cumulative regret of a
+    # run, and the `RunningStats` of the per-round high reward, so memory is O(rounds x agents)
+    # regardless of the number of runs.
+    def __init__(self, sim_result_list: list[SimResult] = None):
+        self.agent_to_reward_stats_map = {}
+        self.agent_to_cum_regret_stats_map = {}
+        self.high_reward_stats = RunningStats()
+
+        for sim_result in sim_result_list or []:
+            self.add_sim_result(sim_result=sim_result)
 
     def __repr__(self):
         return (
@@ -64,20 +231,80 @@ class MeanSimResult:
             ")"
         )
 
-    def get_mean_rewards(self, reward_samples_list: list[list[float]]) -> list[float]:
-        if len(reward_samples_list) == 0:
-            return []
+    @classmethod
+    def from_running_stats(
+        cls,
+        agent_to_reward_stats_map: dict[agent_module.Agent, RunningStats],
+        agent_to_cum_regret_stats_map: dict[agent_module.Agent, RunningStats],
+        high_reward_stats: RunningStats,
+    ) -> "MeanSimResult":
+        mean_sim_result = cls()
+        mean_sim_result.agent_to_reward_stats_map = agent_to_reward_stats_map
+        mean_sim_result.agent_to_cum_regret_stats_map = agent_to_cum_regret_stats_map
+        mean_sim_result.high_reward_stats = high_reward_stats
+        return mean_sim_result
+
+    @property
+    def num_sim_runs(self) -> int:
+        return self.high_reward_stats.count
+
+    def add_sim_result(self, sim_result: SimResult):
+        high_reward_array = sim_result.high_reward_array()
+        self.high_reward_stats.add(high_reward_array)
+
+        for agent in sim_result.agent_list:
+            reward_array = sim_result.reward_array(agent=agent)
+            if agent not in self.agent_to_reward_stats_map:
+                self.agent_to_reward_stats_map[agent] = RunningStats()
+                self.agent_to_cum_regret_stats_map[agent] = RunningStats()
+
+            self.agent_to_reward_stats_map[agent].add(reward_array)
+            self.agent_to_cum_regret_stats_map[agent].add(numpy.cumsum(high_reward_array - reward_array))
+
+    # Re-keys the stats with `agent_list` by position, as in `SimResult.replace_agents()`.
+    def replace_agents(self, agent_list: list[agent_module.Agent]):
+        if not self.agent_to_reward_stats_map:
+            return
 
-        mean_reward_list = reward_samples_list[0][:]
-        count = 1
+        check(
+            len(agent_list) == len(self.agent_to_reward_stats_map),
+            "Number of agents in the result should match `agent_list`",
+            num_agents_in_result=len(self.agent_to_reward_stats_map),
+            num_agents=len(agent_list),
+        )
+
+        self.agent_to_reward_stats_map = dict(zip(agent_list, self.agent_to_reward_stats_map.values()))
+        self.agent_to_cum_regret_stats_map = dict(zip(agent_list, self.agent_to_cum_regret_stats_map.values()))
 
-        for i, reward_list in enumerate(reward_samples_list):
-            if i == 0:
-                continue
+    @property
+    def agent_to_mean_rewards_map(self) -> dict[agent_module.Agent, list[float]]:
+        return {
+            agent: reward_stats.mean_array.tolist()
+            for agent, reward_stats in self.agent_to_reward_stats_map.items()
+        }
 
-            for j, reward in enumerate(reward_list):
-                mean_reward_list[j] = mean_reward_list[j]*count / (count + 1) + reward / (count + 1)
+    @property
+    def mean_high_reward_list(self) -> list[float]:
+        if self.high_reward_stats.mean_array is None:
+            return []
+
+        return self.high_reward_stats.mean_array.tolist()
+
+    @property
+    def agent_to_cum_mean_regret_list_map(self) -> dict[agent_module.Agent, list[float]]:
+        return {
+            agent: numpy.cumsum(self.high_reward_stats.mean_array - reward_stats.mean_array).tolist()
+            for agent, reward_stats in self.agent_to_reward_stats_map.items()
+        }
 
-            count += 1
+    # Returns the (lower, upper) arrays of the per-round confidence interval of the mean reward.
+    def mean_reward_confidence_interval_arrays(
+        self, agent: agent_module.Agent, confidence: float = 0.95
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        return self.agent_to_reward_stats_map[agent].confidence_interval_arrays(confidence=confidence)
 
-        return mean_reward_list
+    # Returns the (lower, upper) arrays of the per-round confidence interval of the mean cumulative regret.
+    def cum_regret_confidence_interval_arrays(
+        self, agent: agent_module.Agent, confidence: float = 0.95
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        return self.agent_to_cum_regret_stats_map[agent].confidence_interval_arrays(confidence=confidence)
@@ -1,17 +1,30 @@
-from src.agent import agent as agent_module
+import concurrent.futures
+import functools
+import numpy
+import os
+
+from typing import Callable, Tuple
+
+from src.agent import agent as agent_module, replicated
 from src.env import bandit as bandit_module
-from src.sim import result as result_module
+from src.sim import checkpoint as checkpoint_module, result as result_module
 from src.utils.debug import *
 
 
+# `sim_result` and `start_round_index` continue a run from a checkpoint. `on_round_end(round_index,
+# sim_result)` is called after each round.
 def sim_single_run(
     bandit: bandit_module.Bandit,
     agent_list: list[agent_module.Agent],
     num_rounds: int,
+    sim_result: result_module.SimResult = None,
+    start_round_index: int = 0,
+    on_round_end: Callable[[int, result_module.SimResult], None] = None,
 ) -> result_module.SimResult:
-    sim_result = result_module.SimResult()
+    if sim_result is None:
+        sim_result = result_module.SimResult(agent_list=agent_list, num_rounds=num_rounds)
 
-    for i in range(num_rounds):
+    for i in range(start_round_index, num_rounds):
         log(INFO, f">> i= {i}")
 
         for agent in agent_list:
@@ -19,7 +32,7 @@ def sim_single_run(
             reward_sample = bandit.pull(arm_id=arm_id)
             log(DEBUG, "", arm_id=arm_id, reward_sample=reward_sample)
 
-            sim_result.append_reward_sample(agent=agent, reward=reward_sample)
+            sim_result.append_reward_sample(agent=agent, reward=reward_sample, arm_id=arm_id)
             agent.observe(arm_id=arm_id, reward=reward_sample)
 
         sample_from_high_reward = bandit.pull_high_reward()
@@ -27,26 +40,255 @@ def sim_single_run(
 
         sim_result.append_high_reward_sample(reward=sample_from_high_reward)
 
+        if on_round_end is not None:
+            on_round_end(i, sim_result)
+
     return sim_result
 
 
+# If `checkpoint_path` is given, the state of the sim is written to it every
+# `num_rounds_per_checkpoint` rounds with a `CheckpointWriter`, and the sim resumes from it if it
+# exists. On resume, the state in the checkpoint is restored into `bandit` and `agent_list`, and
+# the sim fails if the checkpoint is of another experiment (see `restore_checkpoint()`).
 def sim(
     bandit: bandit_module.Bandit,
     agent_list: list[agent_module.Agent],
     num_rounds: int,
     num_sim_runs: int = 1,
+    checkpoint_path: str = None,
+    num_rounds_per_checkpoint: int = 1000,
 ) -> result_module.MeanSimResult:
     log(INFO, "Started", bandit=bandit, agent_list=agent_list, num_rounds=num_rounds, num_sim_runs=num_sim_runs)
 
-    sim_result_list = []
-    for i in range(num_sim_runs):
+    mean_sim_result = result_module.MeanSimResult()
+    start_run_index, start_round_index, sim_result = 0, 0, None
+    if checkpoint_path is not None and os.path.exists(checkpoint_path):
+        checkpoint = checkpoint_module.load_checkpoint(path=checkpoint_path)
+        checkpoint_module.restore_checkpoint(
+            checkpoint=checkpoint,
+            bandit=bandit,
+            agent_list=agent_list,
+            num_rounds=num_rounds,
+            num_sim_runs=num_sim_runs,
+        )
+        log(INFO, "Resuming", run_index=checkpoint.run_index, round_index=checkpoint.round_index)
+
+        mean_sim_result = checkpoint.mean_sim_result
+        start_run_index, start_round_index, sim_result = checkpoint.run_index, checkpoint.round_index, checkpoint.sim_result
+
+    checkpoint_writer = checkpoint_module.CheckpointWriter(path=checkpoint_path) if checkpoint_path is not None else None
+
+    def write_checkpoint(run_index: int, round_index: int, sim_result: result_module.SimResult):
+        checkpoint_writer.write(
+            checkpoint=checkpoint_module.Checkpoint(
+                bandit=bandit,
+                agent_list=agent_list,
+                sim_result=sim_result,
+                mean_sim_result=mean_sim_result,
+                run_index=run_index,
+                round_index=round_index,
+                num_rounds=num_rounds,
+                num_sim_runs=num_sim_runs,
+            )
+        )
+
+    def write_checkpoint_on_round_end(run_index: int, round_index: int, sim_result: result_module.SimResult):
+        if (round_index + 1) % num_rounds_per_checkpoint == 0:
+            write_checkpoint(run_index=run_index, round_index=round_index + 1, sim_result=sim_result)
+
+    for run_index in range(start_run_index, num_sim_runs):
+        is_resumed_run = run_index == start_run_index
         sim_result = sim_single_run(
             bandit=bandit,
             agent_list=agent_list,
             num_rounds=num_rounds,
+            sim_result=sim_result if is_resumed_run else None,
+            start_round_index=start_round_index if is_resumed_run else 0,
+            on_round_end=(
+                functools.partial(write_checkpoint_on_round_end, run_index)
+                if checkpoint_writer is not None
+                else None
+            ),
+        )
+        mean_sim_result.add_sim_result(sim_result=sim_result)
+
+    if checkpoint_writer is not None:
+        # The final checkpoint is written after the pending one, so it is never skipped, and a
+        # rerun returns the result right away.
+        checkpoint_writer.close()
+        write_checkpoint(run_index=num_sim_runs, round_index=0, sim_result=None)
+        checkpoint_writer.close()
+        log(INFO, "Checkpoints", num_written=checkpoint_writer.num_written, num_skipped=checkpoint_writer.num_skipped)
+
+    log(INFO, "Done")
+    return mean_sim_result
+
+
+# Factories take an `rng` and return a fresh bandit or agent list for a single run, so that no
+# state is shared across runs. They need to be picklable, e.g., module-level functions or
+# `functools.partial` of them, to be sent to the worker processes.
+BanditFactory = Callable[[numpy.random.Generator], bandit_module.Bandit]
+AgentListFactory = Callable[[numpy.random.Generator], list[agent_module.Agent]]
+
+
+# The agents in the returned `SimResult` are replaced with `AgentKey`s, so that the agents are not
+# sent back from the worker processes.
+def sim_single_run_w_factories(
+    bandit_factory: BanditFactory,
+    agent_list_factory: AgentListFactory,
+    num_rounds: int,
+    seed_sequence: numpy.random.SeedSequence,
+) -> result_module.SimResult:
+    bandit_seed_sequence, agent_seed_sequence = seed_sequence.spawn(2)
+    agent_list = agent_list_factory(numpy.random.default_rng(agent_seed_sequence))
+    sim_result = sim_single_run(
+        bandit=bandit_factory(numpy.random.default_rng(bandit_seed_sequence)),
+        agent_list=agent_list,
+        num_rounds=num_rounds,
+    )
+
+    sim_result.replace_agents(
+        agent_list=[result_module.AgentKey(index=index, name=agent.name) for index, agent in enumerate(agent_list)]
+    )
+    return sim_result
+
+
+# Runs `num_sim_runs` independent runs, each with the bandit and agents returned by the factories.
+# Run `i` draws from the `i`-th child of `SeedSequence(seed)`, and the results are merged in the
+# run order, so the returned `MeanSimResult` does not depend on `num_workers`. Runs are spread over
+# a `ProcessPoolExecutor` with `num_workers` processes, or run in this process if `num_workers` is 1.
+# The result is keyed by an `AgentKey` per agent, which carries the agent name.
+def sim_parallel(
+    bandit_factory: BanditFactory,
+    agent_list_factory: AgentListFactory,
+    num_rounds: int,
+    num_sim_runs: int = 1,
+    num_workers: int = None,
+    seed: int = None,
+) -> result_module.MeanSimResult:
+    log(INFO, "Started", num_rounds=num_rounds, num_sim_runs=num_sim_runs, num_workers=num_workers, seed=seed)
+
+    seed_sequence_list = numpy.random.SeedSequence(seed).spawn(num_sim_runs)
+
+    mean_sim_result = result_module.MeanSimResult()
+    # Results that completed ahead of an earlier run, keyed by run index.
+    run_index_to_sim_result_map = {}
+
+    def merge(run_index: int, sim_result: result_module.SimResult):
+        run_index_to_sim_result_map[run_index] = sim_result
+        while mean_sim_result.num_sim_runs in run_index_to_sim_result_map:
+            sim_result = run_index_to_sim_result_map.pop(mean_sim_result.num_sim_runs)
+            mean_sim_result.add_sim_result(sim_result=sim_result)
+
+    if num_workers == 1:
+        for run_index, seed_sequence in enumerate(seed_sequence_list):
+            sim_result = sim_single_run_w_factories(
+                bandit_factory=bandit_factory,
+                agent_list_factory=agent_list_factory,
+                num_rounds=num_rounds,
+                seed_sequence=seed_sequence,
+            )
+            merge(run_index=run_index, sim_result=sim_result)
+
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
+            future_to_run_index_map = {
+                executor.submit(
+                    sim_single_run_w_factories,
+                    bandit_factory,
+                    agent_list_factory,
+                    num_rounds,
+                    seed_sequence,
+                ): run_index
+                for run_index, seed_sequence in enumerate(seed_sequence_list)
+            }
+
+            for future in concurrent.futures.as_completed(future_to_run_index_map):
+                merge(run_index=future_to_run_index_map[future], sim_result=future.result())
+
+    log(INFO, "Done")
+    return mean_sim_result
+
+
+# Runs `num_sim_runs` runs at once, keeping the bandit and agents of all runs in arrays with a
+# leading run dimension: `ReplicatedBandit` and `ReplicatedThompsonSamplingAgent_full`. Each round
+# advances all runs with one batched Thompson draw and argmax, one reward draw and one stats
+# update per agent. Rather than keeping the rewards of every run, only the per-round mean and M2
+# over the runs are kept, besides the cumulative regret of each run, so memory is
+# O(rounds x agents + runs x agents).
+# Each agent in `agent_list` should be a `ThompsonSamplingAgent_full` without `tail_tolerance`,
+# and is replicated with its parameters into fresh agents. The result is keyed by the agents in
+# `agent_list`.
+def sim_vectorized(
+    bandit: bandit_module.Bandit,
+    agent_list: list[agent_module.Agent],
+    num_rounds: int,
+    num_sim_runs: int = 1,
+    seed: int = None,
+) -> result_module.MeanSimResult:
+    log(INFO, "Started", bandit=bandit, agent_list=agent_list, num_rounds=num_rounds, num_sim_runs=num_sim_runs)
+
+    unsupported_agent_list = [
+        agent
+        for agent in agent_list
+        if type(agent) is not agent_module.ThompsonSamplingAgent_full or agent.tail_tolerance is not None
+    ]
+    check(
+        not unsupported_agent_list,
+        "`sim_vectorized()` supports only `ThompsonSamplingAgent_full` without `tail_tolerance`, use `sim_parallel()`",
+        unsupported_agent_list=unsupported_agent_list,
+    )
+
+    bandit_seed_sequence, *agent_seed_sequence_list = numpy.random.SeedSequence(seed).spawn(1 + len(agent_list))
+    replicated_bandit = bandit_module.ReplicatedBandit(
+        bandit=bandit, num_replicas=num_sim_runs, rng=numpy.random.default_rng(bandit_seed_sequence)
+    )
+    replicated_agent_list = [
+        replicated.ReplicatedThompsonSamplingAgent_full.from_agent(
+            agent=agent, num_replicas=num_sim_runs, rng=numpy.random.default_rng(agent_seed_sequence)
         )
-        sim_result_list.append(sim_result)
+        for agent, agent_seed_sequence in zip(agent_list, agent_seed_sequence_list)
+    ]
+
+    num_agents = len(agent_list)
+    reward_moment_tensor = numpy.empty((2, num_agents, num_rounds))
+    cum_regret_moment_tensor = numpy.empty((2, num_agents, num_rounds))
+    high_reward_moment_matrix = numpy.empty((2, num_rounds))
+    reward_matrix = numpy.empty((num_agents, num_sim_runs))
+    cum_regret_matrix = numpy.zeros((num_agents, num_sim_runs))
+
+    # Returns the (mean, M2) over the last axis.
+    def get_moments(value_array: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        mean = value_array.mean(axis=-1)
+        return mean, ((value_array - mean[..., None]) ** 2).sum(axis=-1)
+
+    for i in range(num_rounds):
+        for agent_index, replicated_agent in enumerate(replicated_agent_list):
+            arm_id_array = replicated_agent.next_actions()
+            reward_matrix[agent_index] = replicated_bandit.pull(arm_id_array=arm_id_array)
+            replicated_agent.observe(arm_id_array=arm_id_array, reward_array=reward_matrix[agent_index])
+
+        high_reward_array = replicated_bandit.pull_high_reward()
+        cum_regret_matrix += high_reward_array - reward_matrix
+
+        reward_moment_tensor[:, :, i] = get_moments(reward_matrix)
+        cum_regret_moment_tensor[:, :, i] = get_moments(cum_regret_matrix)
+        high_reward_moment_matrix[:, i] = get_moments(high_reward_array)
+
+    def to_agent_to_running_stats_map(moment_tensor: numpy.ndarray) -> dict:
+        return {
+            agent: result_module.RunningStats.from_moment_arrays(
+                count=num_sim_runs, mean_array=moment_tensor[0, agent_index], M2_array=moment_tensor[1, agent_index]
+            )
+            for agent_index, agent in enumerate(agent_list)
+        }
 
-    mean_sim_result = result_module.MeanSimResult(sim_result_list=sim_result_list)
+    mean_sim_result = result_module.MeanSimResult.from_running_stats(
+        agent_to_reward_stats_map=to_agent_to_running_stats_map(reward_moment_tensor),
+        agent_to_cum_regret_stats_map=to_agent_to_running_stats_map(cum_regret_moment_tensor),
+        high_reward_stats=result_module.RunningStats.from_moment_arrays(
+            count=num_sim_runs, mean_array=high_reward_moment_matrix[0], M2_array=high_reward_moment_matrix[1]
+        ),
+    )
     log(INFO, "Done")
     return mean_sim_result
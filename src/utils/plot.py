@@ -1,18 +1,26 @@
-import matplotlib
-# matplotlib.rcParams["pdf.fonttype"] = 42
-# matplotlib.rcParams["ps.fonttype"] = 42
-# matplotlib.use("Agg")
-import matplotlib.pyplot as plot
-plot.rcParams.update(
-  {
-    "text.usetex": True
-  }
-)
+import functools
 import itertools
 
 from src.utils.debug import *
 
 
+# Returns `matplotlib.pyplot`, which is imported and configured on the first call,
+# so that importing this module does not load matplotlib.
+@functools.cache
+def get_plot():
+  import matplotlib
+  # matplotlib.rcParams["pdf.fonttype"] = 42
+  # matplotlib.rcParams["ps.fonttype"] = 42
+  # matplotlib.use("Agg")
+  matplotlib.rcParams.update(
+    {
+      "text.usetex": True
+    }
+  )
+  import matplotlib.pyplot as plot
+  return plot
+
+
 NICE_BLUE = "#66b3ff"
 NICE_RED = "#ff9999"
 NICE_GREEN = "#99ff99"
@@ -30,6 +38,7 @@ mew, ms = 1, 2 # 3, 5
 
 
 def prettify(ax):
+  plot = get_plot()
   # plot.tick_params(top="off", right="off", which="both")
   plot.tick_params(top=False, right=False, which="both")
   ax.patch.set_alpha(0.2)
@@ -38,6 +47,7 @@ def prettify(ax):
 
 
 def plot_points(x_y_l, fname):
+  plot = get_plot()
   x_l, y_l = [], []
   for x_y in x_y_l:
     x_l.append(x_y[0] )
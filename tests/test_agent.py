@@ -0,0 +1,216 @@
+import numpy
+import pytest
+
+from src.agent import agent as agent_module, window as window_module
+from src.utils.debug import *
+
+
+NUM_ARMS = 5
+
+
+@pytest.fixture(
+    params=[
+        "full",
+        "slidingWin",
+        "resetWinOnRareEvent",
+    ]
+)
+def agent(request) -> agent_module.ThompsonSamplingAgent:
+    rng = numpy.random.default_rng(seed=0)
+
+    if request.param == "full":
+        return agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=NUM_ARMS, rng=rng)
+    elif request.param == "slidingWin":
+        return agent_module.ThompsonSamplingAgent_slidingWin(name="TS-SlidingWin", num_arms=NUM_ARMS, win_len=20, rng=rng)
+    elif request.param == "resetWinOnRareEvent":
+        return agent_module.ThompsonSamplingAgent_resetWinOnRareEvent(
+            name="TS-ResetWin", num_arms=NUM_ARMS, win_len=20, tail_mass_threshold=0.001, rng=rng
+        )
+
+
+def test_mean_stdev_reward_arrays(agent: agent_module.ThompsonSamplingAgent):
+    rng = numpy.random.default_rng(seed=1)
+    for _ in range(10):
+        for arm_id in range(NUM_ARMS):
+            agent.observe(arm_id=arm_id, reward=rng.normal(loc=arm_id, scale=0.1))
+
+    mean_array, stdev_array = agent.mean_stdev_reward_arrays()
+    check(mean_array.shape == (NUM_ARMS,), "", mean_array=mean_array)
+    check(stdev_array.shape == (NUM_ARMS,), "", stdev_array=stdev_array)
+    check(numpy.all(stdev_array > 0), "", stdev_array=stdev_array)
+
+    for arm_id in range(NUM_ARMS):
+        mean, stdev = agent.mean_stdev_reward(arm_id=arm_id)
+        check(mean == mean_array[arm_id] and stdev == stdev_array[arm_id], "", arm_id=arm_id)
+
+
+def test_next_action_chooses_high_reward_arm(agent: agent_module.ThompsonSamplingAgent):
+    high_reward_arm_id = 2
+    for _ in range(10):
+        for arm_id in range(NUM_ARMS):
+            reward = 100 if arm_id == high_reward_arm_id else 0
+            agent.observe(arm_id=arm_id, reward=reward)
+
+    action_list = [agent.next_action() for _ in range(100)]
+    check(all(isinstance(action, int) for action in action_list), "")
+
+    num_high = sum(action == high_reward_arm_id for action in action_list)
+    check(num_high >= 90, "", num_high=num_high)
+
+
+def test_next_actions(agent: agent_module.ThompsonSamplingAgent):
+    action_array = agent.next_actions(num_actions=100)
+    check(action_array.shape == (100,), "", shape=action_array.shape)
+    check(numpy.issubdtype(action_array.dtype, numpy.integer), "", dtype=action_array.dtype)
+    check(numpy.all((action_array >= 0) & (action_array < NUM_ARMS)), "")
+
+
+@pytest.mark.parametrize("window_backend", list(window_module.WindowBackend))
+def test_observe_batch_vs_observe(window_backend: window_module.WindowBackend):
+    win_len = 8
+    agent_pair_list = [
+        (
+            agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=NUM_ARMS),
+            agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=NUM_ARMS),
+        ),
+        (
+            agent_module.ThompsonSamplingAgent_slidingWin(name="TS-SlidingWin", num_arms=NUM_ARMS, win_len=win_len, window_backend=window_backend),
+            agent_module.ThompsonSamplingAgent_slidingWin(name="TS-SlidingWin", num_arms=NUM_ARMS, win_len=win_len, window_backend=window_backend),
+        ),
+        (
+            agent_module.ThompsonSamplingAgent_resetWinOnRareEvent(name="TS-ResetWin", num_arms=NUM_ARMS, win_len=win_len, tail_mass_threshold=0.05, window_backend=window_backend),
+            agent_module.ThompsonSamplingAgent_resetWinOnRareEvent(name="TS-ResetWin", num_arms=NUM_ARMS, win_len=win_len, tail_mass_threshold=0.05, window_backend=window_backend),
+        ),
+    ]
+
+    rng = numpy.random.default_rng(seed=0)
+    for batch_size in (1, 3, 50, 0, 17):
+        arm_id_array = rng.integers(NUM_ARMS, size=batch_size)
+        reward_array = rng.normal(loc=arm_id_array, scale=1)
+        for agent, agent_w_batch in agent_pair_list:
+            for arm_id, reward in zip(arm_id_array.tolist(), reward_array.tolist()):
+                agent.observe(arm_id=arm_id, reward=reward)
+            agent_w_batch.observe_batch(arm_ids=arm_id_array, rewards=reward_array)
+
+    for agent, agent_w_batch in agent_pair_list:
+        mean_array, stdev_array = agent.mean_stdev_reward_arrays()
+        mean_array_w_batch, stdev_array_w_batch = agent_w_batch.mean_stdev_reward_arrays()
+        numpy.testing.assert_allclose(mean_array_w_batch, mean_array, rtol=1e-9)
+        numpy.testing.assert_allclose(stdev_array_w_batch, stdev_array, rtol=1e-6)
+
+
+@pytest.mark.parametrize("dtype, rtol", [(numpy.float64, 1e-9), (numpy.float32, 1e-3)])
+def test_full_agent_welford(dtype: numpy.dtype, rtol: float):
+    num_arms = 3
+    agent = agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=num_arms, dtype=dtype)
+    agent_w_batch = agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=num_arms, dtype=dtype)
+
+    # Large mean relative to the stdev is where `E[X^2] - E[X]^2` breaks down.
+    rng = numpy.random.default_rng(seed=0)
+    arm_id_array = rng.integers(num_arms, size=3000)
+    reward_array = rng.normal(loc=1e4 * (arm_id_array + 1), scale=arm_id_array + 1)
+
+    for arm_id, reward in zip(arm_id_array.tolist(), reward_array.tolist()):
+        agent.observe(arm_id=arm_id, reward=reward)
+    for batch_index in range(3):
+        agent_w_batch.observe_batch(
+            arm_ids=arm_id_array[batch_index * 1000 : (batch_index + 1) * 1000],
+            rewards=reward_array[batch_index * 1000 : (batch_index + 1) * 1000],
+        )
+
+    mean_array_ref = numpy.array([numpy.mean(reward_array[arm_id_array == arm_id]) for arm_id in range(num_arms)])
+    stdev_array_ref = numpy.array([numpy.std(reward_array[arm_id_array == arm_id]) for arm_id in range(num_arms)])
+    for _agent in (agent, agent_w_batch):
+        mean_array, stdev_array = _agent.mean_stdev_reward_arrays()
+        check(mean_array.dtype == dtype, "", dtype=mean_array.dtype)
+        numpy.testing.assert_allclose(mean_array, mean_array_ref, rtol=rtol)
+        numpy.testing.assert_allclose(stdev_array, stdev_array_ref, rtol=rtol * 100 if dtype == numpy.float32 else rtol)
+
+
+def test_full_agent_w_million_arms():
+    num_arms = 1_000_000
+    agent = agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=num_arms, dtype=numpy.float32)
+    nbytes = agent.nbytes()
+    log(INFO, "", nbytes=nbytes)
+    check(nbytes <= 12 * num_arms, "", nbytes=nbytes)
+
+    rng = numpy.random.default_rng(seed=0)
+    arm_id_array = rng.integers(num_arms, size=100_000)
+    agent.observe_batch(arm_ids=arm_id_array, rewards=numpy.ones(len(arm_id_array)))
+    check(agent.count_array.sum() == len(arm_id_array), "")
+
+
+def test_full_agent_w_min_reward():
+    agent = agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=NUM_ARMS, rng=numpy.random.default_rng(seed=0), min_reward=0)
+    for arm_id in range(NUM_ARMS):
+        agent.observe_batch(arm_ids=[arm_id] * 3, rewards=[arm_id - 2, arm_id, arm_id + 2])
+
+    sample_matrix = agent.sample_rewards(num_samples=10_000)
+    check(sample_matrix.shape == (10_000, NUM_ARMS) and numpy.all(sample_matrix >= 0), "")
+    check(isinstance(agent.next_action(), int), "")
+
+    with pytest.raises(Exception):
+        agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=NUM_ARMS, tail_tolerance=1e-6, min_reward=0)
+
+
+@pytest.mark.parametrize(
+    "agent_name, reward_sampler",
+    [
+        ("betaBernoulli", lambda rng, p, size: rng.binomial(n=1, p=p, size=size)),
+        ("normalGamma", lambda rng, p, size: rng.normal(loc=10 * p, scale=2, size=size)),
+        ("gammaPoisson", lambda rng, p, size: rng.poisson(lam=10 * p, size=size)),
+    ]
+)
+def test_conjugate_agent(agent_name: str, reward_sampler):
+    def get_agent():
+        if agent_name == "betaBernoulli":
+            return agent_module.ThompsonSamplingAgent_betaBernoulli(name="TS-BetaBernoulli", num_arms=NUM_ARMS, rng=numpy.random.default_rng(seed=0))
+        elif agent_name == "normalGamma":
+            return agent_module.ThompsonSamplingAgent_normalGamma(name="TS-NormalGamma", num_arms=NUM_ARMS, rng=numpy.random.default_rng(seed=0))
+        elif agent_name == "gammaPoisson":
+            return agent_module.ThompsonSamplingAgent_gammaPoisson(name="TS-GammaPoisson", num_arms=NUM_ARMS, rng=numpy.random.default_rng(seed=0))
+
+    agent, agent_w_batch = get_agent(), get_agent()
+
+    # Before any observation, uncertainty should come from the prior, not from a fallback.
+    _, stdev_array = agent.mean_stdev_reward_arrays()
+    check(numpy.all(numpy.isfinite(stdev_array) & (stdev_array > 0)), "", stdev_array=stdev_array)
+
+    rng = numpy.random.default_rng(seed=1)
+    p_array = numpy.linspace(0.1, 0.9, NUM_ARMS)
+    arm_id_array = numpy.repeat(numpy.arange(NUM_ARMS), 200)
+    reward_array = reward_sampler(rng, p_array[arm_id_array], len(arm_id_array)).astype(float)
+
+    for arm_id, reward in zip(arm_id_array.tolist(), reward_array.tolist()):
+        agent.observe(arm_id=arm_id, reward=reward)
+    agent_w_batch.observe_batch(arm_ids=arm_id_array, rewards=reward_array)
+
+    mean_array, stdev_array = agent.mean_stdev_reward_arrays()
+    mean_array_w_batch, stdev_array_w_batch = agent_w_batch.mean_stdev_reward_arrays()
+    numpy.testing.assert_allclose(mean_array_w_batch, mean_array, rtol=1e-9)
+    numpy.testing.assert_allclose(stdev_array_w_batch, stdev_array, rtol=1e-6)
+    check(numpy.all(numpy.diff(mean_array) > 0), "", mean_array=mean_array)
+
+    sample_matrix = agent.sample_rewards(num_samples=1000)
+    check(sample_matrix.shape == (1000, NUM_ARMS), "", shape=sample_matrix.shape)
+    numpy.testing.assert_allclose(sample_matrix.mean(axis=0), mean_array, rtol=0.05, atol=0.01)
+
+    action_array = agent.next_actions(num_actions=100)
+    check(numpy.mean(action_array == NUM_ARMS - 1) >= 0.9, "", action_array=action_array)
+
+
+def test_tail_tolerance_w_non_normal_posterior():
+    class ThompsonSamplingAgent_studentT(agent_module.ThompsonSamplingAgent_full):
+        def sample_rewards(self, num_samples: int = None) -> numpy.ndarray:
+            return self.rng.standard_t(df=3, size=self.num_arms)
+
+    with pytest.raises(AssertionError):
+        ThompsonSamplingAgent_studentT(name="TS-StudentT", num_arms=NUM_ARMS, tail_tolerance=1e-6)
+
+    for agent_type in (
+        agent_module.ThompsonSamplingAgent_betaBernoulli,
+        agent_module.ThompsonSamplingAgent_normalGamma,
+        agent_module.ThompsonSamplingAgent_gammaPoisson,
+    ):
+        with pytest.raises(TypeError):
+            agent_type(name="TS", num_arms=NUM_ARMS, tail_tolerance=1e-6)
@@ -0,0 +1,75 @@
+import numpy
+import pytest
+import scipy.stats
+import time
+
+from src.prob import alias, rv
+from src.utils.debug import *
+
+
+@pytest.mark.parametrize(
+    "prob_array",
+    [
+        numpy.array([1.0]),
+        numpy.array([0.5, 0.5]),
+        numpy.array([0.1, 0.2, 0.7]),
+        numpy.array([0.0, 0.9, 0.0, 0.1]),
+        numpy.random.default_rng(seed=0).random(1000) ** 4,
+        numpy.arange(1, 10_001, dtype=float) ** -1.2,
+    ]
+)
+def test_alias_table_encodes_prob(prob_array: numpy.ndarray):
+    alias_table = alias.AliasTable(prob_array=prob_array)
+    check(numpy.all((alias_table.threshold_array >= 0) & (alias_table.threshold_array <= 1)), "")
+    numpy.testing.assert_allclose(alias_table.table_prob_array(), prob_array / prob_array.sum(), atol=1e-12)
+
+
+def test_alias_table_sample():
+    prob_array = numpy.array([0.1, 0.2, 0.3, 0.4])
+    alias_table = alias.AliasTable(prob_array=prob_array)
+
+    index_array = alias_table.sample_index(rng=numpy.random.default_rng(seed=0), size=200_000)
+    numpy.testing.assert_allclose(numpy.bincount(index_array, minlength=4) / len(index_array), prob_array, atol=0.005)
+
+    # Drawing one at a time should consume the stream the same way as drawing in a batch.
+    rng = numpy.random.default_rng(seed=0)
+    index_list = [alias_table.sample_index(rng=rng) for _ in range(100)]
+    numpy.testing.assert_array_equal(index_list, index_array[:100])
+
+
+def test_bounded_zipf_vs_scipy():
+    min_value, max_value, a = 1, 100, 1.3
+    bounded_zipf = rv.BoundedZipf(min_value=min_value, max_value=max_value, a=a)
+
+    value_array = numpy.arange(min_value, max_value + 1)
+    weight_array = value_array.astype(float) ** -a
+    dist = scipy.stats.rv_discrete(values=(value_array, weight_array / weight_array.sum()))
+
+    x_array = numpy.linspace(-5, 110, 500)
+    numpy.testing.assert_allclose(bounded_zipf.cdf(x_array), dist.cdf(x_array), atol=1e-12)
+    numpy.testing.assert_allclose(bounded_zipf.pdf(value_array), dist.pmf(value_array), atol=1e-12)
+    numpy.testing.assert_allclose(bounded_zipf.mean(), dist.mean())
+
+    prob_array = numpy.linspace(0.001, 0.999, 500)
+    numpy.testing.assert_array_equal(bounded_zipf.inverse_cdf(prob_array), dist.ppf(prob_array))
+    check(isinstance(bounded_zipf.cdf(10), float), "")
+
+
+def test_custom_discrete_vs_scipy():
+    custom_discrete = rv.CustomDiscrete(value_list=[30, 10, 20], prob_weight_list=[3, 1, 2])
+    dist = scipy.stats.rv_discrete(values=([10, 20, 30], [1 / 6, 2 / 6, 3 / 6]))
+    for x in (5, 10, 15, 20, 30, 31):
+        numpy.testing.assert_allclose(custom_discrete.cdf(x), dist.cdf(x))
+
+
+def test_bounded_zipf_w_large_support():
+    start_time = time.perf_counter()
+    bounded_zipf = rv.BoundedZipf(min_value=1, max_value=10**6, a=1, rng=numpy.random.default_rng(seed=0))
+    build_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    sample_array = bounded_zipf.sample(size=10**6)
+    sample_time = time.perf_counter() - start_time
+    log(INFO, "", build_time=build_time, sample_time=sample_time)
+
+    numpy.testing.assert_allclose(numpy.mean(sample_array == 1), bounded_zipf.pdf(1), rtol=0.02)
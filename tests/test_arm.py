@@ -0,0 +1,67 @@
+import numpy
+
+from src.env import arm as arm_module, bandit as bandit_module
+from src.prob import rv
+from src.utils.debug import *
+
+
+def get_arm(precompute_phases: bool, chunk_size: int = 16) -> arm_module.NonStationaryArm_wHighLowReward:
+    return arm_module.NonStationaryArm_wHighLowReward(
+        name="arm",
+        high_reward_rv=rv.Normal(mu=10, sigma=1, rng=numpy.random.default_rng(seed=1)),
+        low_reward_rv=rv.Normal(mu=0, sigma=1, rng=numpy.random.default_rng(seed=2)),
+        phase_duration_rv=rv.DiscreteUniform(min_value=0, max_value=20, rng=numpy.random.default_rng(seed=3)),
+        precompute_phases=precompute_phases,
+        chunk_size=chunk_size,
+    )
+
+
+def test_phase_timeline():
+    phase_timeline = arm_module.PhaseTimeline(
+        phase_duration_rv=rv.CustomDiscrete(value_list=[2], prob_weight_list=[1]), chunk_size=4
+    )
+    # Switches at rounds 0, 3, 6, ... so the arm is low in [0, 3), high in [3, 6), ...
+    is_high_array = phase_timeline.is_high(round_index=numpy.arange(100))
+    numpy.testing.assert_array_equal(is_high_array, (numpy.arange(100) // 3) % 2 == 1)
+    check(phase_timeline.num_boundaries > 100 // 3, "", phase_timeline=phase_timeline)
+    check(numpy.all(numpy.diff(phase_timeline.boundary_array[: phase_timeline.num_boundaries]) == 3), "")
+
+
+def test_precomputed_phases_vs_countdown():
+    arm = get_arm(precompute_phases=False)
+    arm_w_timeline = get_arm(precompute_phases=True)
+
+    num_rounds = 5_000
+    state_list, state_list_w_timeline = [], []
+    reward_list, reward_list_w_timeline = [], []
+    for _ in range(num_rounds):
+        reward_list.append(arm.pull())
+        state_list.append(arm.state)
+        reward_list_w_timeline.append(arm_w_timeline.pull())
+        state_list_w_timeline.append(arm_w_timeline.state)
+
+    check(state_list == state_list_w_timeline, "")
+    check(reward_list == reward_list_w_timeline, "")
+
+    # Should replay the same phases after reset.
+    arm_w_timeline.reset()
+    reward_array = numpy.concatenate([arm_w_timeline.pull_many(num_rounds=n) for n in (1, 999, 0, 4_000)])
+    numpy.testing.assert_array_equal(reward_array > 5, numpy.array(state_list) == arm_module.ArmState.high)
+    check(arm_w_timeline.state == state_list[-1], "")
+
+
+def test_non_stationary_bandit_reset():
+    bandit = bandit_module.NonStationaryBandit(
+        num_arms=3,
+        num_arms_w_high_reward=1,
+        num_arms_w_medium_reward=1,
+        high_reward_rv=rv.Normal(mu=10, sigma=1),
+        medium_reward_rv=rv.Normal(mu=5, sigma=1),
+        low_reward_rv=rv.Normal(mu=0, sigma=1),
+        phase_duration_rv=rv.DiscreteUniform(min_value=0, max_value=20),
+        precompute_phases=True,
+    )
+    reward_array = numpy.array([bandit.pull(arm_id=0) for _ in range(1000)])
+    bandit.reset()
+    reward_array_after_reset = numpy.array([bandit.pull(arm_id=0) for _ in range(1000)])
+    numpy.testing.assert_array_equal(reward_array > 5, reward_array_after_reset > 5)
@@ -0,0 +1,173 @@
+import numpy
+import os
+import pickle
+import pytest
+import threading
+
+from src.agent import agent as agent_module
+from src.env import bandit as bandit_module
+from src.prob import rv
+from src.sim import checkpoint as checkpoint_module, sim
+from src.utils.debug import *
+
+
+NUM_ARMS = 3
+NUM_PULLS_BEFORE_CRASH = None
+
+
+class CrashingBandit(bandit_module.NonStationaryBandit):
+    # Raises on the pull after `NUM_PULLS_BEFORE_CRASH` pulls, which is kept outside of the
+    # bandit so that it is not in the checkpoints.
+    def pull(self, arm_id: int) -> float:
+        global NUM_PULLS_BEFORE_CRASH
+        if NUM_PULLS_BEFORE_CRASH is not None:
+            if NUM_PULLS_BEFORE_CRASH == 0:
+                raise RuntimeError("Crash")
+            NUM_PULLS_BEFORE_CRASH -= 1
+
+        return super().pull(arm_id=arm_id)
+
+
+def get_bandit_and_agent_list(seed: int = 0):
+    rng = numpy.random.default_rng(seed=seed)
+    bandit = CrashingBandit(
+        num_arms=NUM_ARMS,
+        num_arms_w_high_reward=1,
+        num_arms_w_medium_reward=1,
+        high_reward_rv=rv.Normal(mu=10, sigma=1, rng=rng),
+        medium_reward_rv=rv.Normal(mu=5, sigma=1, rng=rng),
+        low_reward_rv=rv.Normal(mu=1, sigma=1, rng=rng),
+        phase_duration_rv=rv.DiscreteUniform(min_value=5, max_value=10, rng=rng),
+    )
+    agent_list = [
+        agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=NUM_ARMS, rng=rng),
+        agent_module.ThompsonSamplingAgent_slidingWin(name="TS-SlidingWin", num_arms=NUM_ARMS, win_len=10, rng=rng),
+        agent_module.ThompsonSamplingAgent_resetWinOnRareEvent(
+            name="TS-ResetWin", num_arms=NUM_ARMS, win_len=10, tail_mass_threshold=0.05, rng=rng
+        ),
+    ]
+    return bandit, agent_list
+
+
+def run_sim(bandit, agent_list, checkpoint_path: str = None):
+    return sim.sim(
+        bandit=bandit,
+        agent_list=agent_list,
+        num_rounds=30,
+        num_sim_runs=2,
+        checkpoint_path=checkpoint_path,
+        num_rounds_per_checkpoint=7,
+    )
+
+
+def test_resume_from_checkpoint(tmp_path):
+    global NUM_PULLS_BEFORE_CRASH
+    mean_sim_result = run_sim(*get_bandit_and_agent_list())
+
+    checkpoint_path = str(tmp_path / "checkpoint.pkl")
+    NUM_PULLS_BEFORE_CRASH = 3 * 30 + 3 * 20
+    with pytest.raises(RuntimeError):
+        run_sim(*get_bandit_and_agent_list(), checkpoint_path=checkpoint_path)
+
+    # Waits for the write in progress, if any, at the time of the crash.
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and thread.daemon:
+            thread.join()
+
+    checkpoint = checkpoint_module.load_checkpoint(path=checkpoint_path)
+    check(checkpoint.run_index in (0, 1), "", run_index=checkpoint.run_index)
+    log(INFO, "", run_index=checkpoint.run_index, round_index=checkpoint.round_index)
+
+    NUM_PULLS_BEFORE_CRASH = None
+    bandit, agent_list = get_bandit_and_agent_list(seed=1)
+    resumed_mean_sim_result = run_sim(bandit, agent_list, checkpoint_path=checkpoint_path)
+
+    check(list(resumed_mean_sim_result.agent_to_mean_rewards_map) == agent_list, "")
+    check(resumed_mean_sim_result.mean_high_reward_list == mean_sim_result.mean_high_reward_list, "")
+    for mean_reward_list, resumed_mean_reward_list in zip(
+        mean_sim_result.agent_to_mean_rewards_map.values(),
+        resumed_mean_sim_result.agent_to_mean_rewards_map.values(),
+    ):
+        check(mean_reward_list == resumed_mean_reward_list, "")
+
+    # The final checkpoint holds the whole result, so a rerun does not pull the bandit.
+    NUM_PULLS_BEFORE_CRASH = 0
+    rerun_mean_sim_result = run_sim(*get_bandit_and_agent_list(), checkpoint_path=checkpoint_path)
+    NUM_PULLS_BEFORE_CRASH = None
+    check(rerun_mean_sim_result.mean_high_reward_list == mean_sim_result.mean_high_reward_list, "")
+
+
+def test_resume_from_checkpoint_of_other_experiment(tmp_path):
+    checkpoint_path = str(tmp_path / "checkpoint.pkl")
+    run_sim(*get_bandit_and_agent_list(), checkpoint_path=checkpoint_path)
+
+    bandit, agent_list = get_bandit_and_agent_list()
+    for kwargs in [
+        {"agent_list": agent_list[:1]},
+        {"agent_list": agent_list[::-1]},
+        {"num_rounds": 40},
+        {"num_sim_runs": 3},
+    ]:
+        with pytest.raises(AssertionError):
+            sim.sim(
+                **{
+                    "bandit": bandit,
+                    "agent_list": agent_list,
+                    "num_rounds": 30,
+                    "num_sim_runs": 2,
+                    "checkpoint_path": checkpoint_path,
+                    **kwargs,
+                }
+            )
+
+
+def test_checkpoint_size_does_not_depend_on_num_rounds():
+    bandit, agent_list = get_bandit_and_agent_list()
+    sim_result = sim.sim_single_run(bandit=bandit, agent_list=agent_list, num_rounds=1)
+    sim_result.set_capacity(capacity=1_000_000)
+
+    sim_result_bytes = pickle.dumps(sim_result, protocol=pickle.HIGHEST_PROTOCOL)
+    check(len(sim_result_bytes) < 100_000, "", num_bytes=len(sim_result_bytes), nbytes=sim_result.nbytes())
+
+    loaded_sim_result = pickle.loads(sim_result_bytes)
+    check(loaded_sim_result.reward_matrix.shape == (len(agent_list), 1_000_000), "")
+    for loaded_agent, agent in zip(loaded_sim_result.agent_list, agent_list):
+        numpy.testing.assert_array_equal(loaded_sim_result.reward_array(agent=loaded_agent), sim_result.reward_array(agent=agent))
+        numpy.testing.assert_array_equal(loaded_sim_result.arm_id_array(agent=loaded_agent), sim_result.arm_id_array(agent=agent))
+    numpy.testing.assert_array_equal(loaded_sim_result.high_reward_array(), sim_result.high_reward_array())
+
+    # Appending after the load goes on from the recorded rounds.
+    loaded_sim_result.append_high_reward_sample(reward=1)
+    check(loaded_sim_result.num_high_rewards == 2, "")
+
+
+def test_checkpoint_writer_skips_while_writing(tmp_path):
+    checkpoint_path = str(tmp_path / "checkpoint.pkl")
+    bandit, agent_list = get_bandit_and_agent_list()
+    checkpoint = checkpoint_module.Checkpoint(
+        bandit=bandit,
+        agent_list=agent_list,
+        sim_result=None,
+        mean_sim_result=None,
+        run_index=1,
+        round_index=2,
+        num_rounds=30,
+        num_sim_runs=2,
+    )
+
+    with checkpoint_module.CheckpointWriter(path=checkpoint_path) as checkpoint_writer:
+        # Stands in for a slow write.
+        write_done = threading.Event()
+        checkpoint_writer.write_thread = threading.Thread(target=write_done.wait, daemon=True)
+        checkpoint_writer.write_thread.start()
+
+        check(not checkpoint_writer.write(checkpoint=checkpoint) and checkpoint_writer.num_skipped == 1, "")
+        write_done.set()
+        checkpoint_writer.close()
+
+        check(checkpoint_writer.write(checkpoint=checkpoint), "")
+
+    check(checkpoint_writer.num_written == 1, "")
+    check(not os.path.exists(f"{checkpoint_path}.tmp"), "")
+    loaded_checkpoint = checkpoint_module.load_checkpoint(path=checkpoint_path)
+    check((loaded_checkpoint.run_index, loaded_checkpoint.round_index) == (1, 2), "")
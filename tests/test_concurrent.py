@@ -0,0 +1,63 @@
+import concurrent.futures
+import numpy
+import pytest
+
+from src.agent import agent as agent_module, concurrent as concurrent_module
+from src.utils.debug import *
+
+
+def test_concurrent_observe_vs_sequential():
+    num_arms, num_threads, num_observations_per_thread = 10, 4, 2000
+    concurrent_agent = concurrent_module.ConcurrentAgent(
+        agent=agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=num_arms),
+    )
+    agent = agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=num_arms)
+
+    rng = numpy.random.default_rng(seed=0)
+    arm_id_matrix = rng.integers(num_arms, size=(num_threads, num_observations_per_thread))
+    reward_matrix = rng.normal(loc=arm_id_matrix, scale=1)
+
+    def serve(thread_index: int):
+        for arm_id, reward in zip(arm_id_matrix[thread_index].tolist(), reward_matrix[thread_index].tolist()):
+            concurrent_agent.next_action()
+            concurrent_agent.observe(arm_id=arm_id, reward=reward)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
+        list(executor.map(serve, range(num_threads)))
+    concurrent_agent.flush()
+    concurrent_agent.close()
+
+    agent.observe_batch(arm_ids=arm_id_matrix.ravel(), rewards=reward_matrix.ravel())
+    numpy.testing.assert_array_equal(concurrent_agent.agent.count_array, agent.count_array)
+    for array, concurrent_array in zip(agent.mean_stdev_reward_arrays(), concurrent_agent.snapshot):
+        numpy.testing.assert_allclose(concurrent_array, array, rtol=1e-9)
+
+    check(numpy.argmax(concurrent_agent.snapshot[0]) == num_arms - 1, "")
+
+
+def test_concurrent_agent_w_failing_observe():
+    concurrent_agent = concurrent_module.ConcurrentAgent(
+        agent=agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=3),
+    )
+
+    concurrent_agent.observe(arm_id=10, reward=1)
+    with pytest.raises(Exception):
+        concurrent_agent.flush()
+    with pytest.raises(Exception):
+        concurrent_agent.observe_batch(arm_ids=[0], rewards=[1])
+    with pytest.raises(Exception):
+        concurrent_agent.close()
+
+
+@pytest.mark.parametrize(
+    "agent",
+    [
+        agent_module.ThompsonSamplingAgent_betaBernoulli(name="TS-Beta", num_arms=3),
+        agent_module.ThompsonSamplingAgent_gammaPoisson(name="TS-Gamma", num_arms=3),
+        agent_module.ThompsonSamplingAgent_normalGamma(name="TS-NormalGamma", num_arms=3),
+        agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=3, min_reward=0),
+    ],
+)
+def test_concurrent_agent_w_unsupported_agent(agent: agent_module.ThompsonSamplingAgent):
+    with pytest.raises(AssertionError):
+        concurrent_module.ConcurrentAgent(agent=agent)
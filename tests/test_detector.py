@@ -0,0 +1,87 @@
+import numpy
+import pytest
+
+from src.agent import agent as agent_module, detector as detector_module
+from src.prob import rv
+from src.utils.debug import *
+
+
+NUM_ARMS = 3
+
+
+def get_change_detector(name: str) -> detector_module.ChangeDetector:
+    if name == "gaussian_tail":
+        return detector_module.GaussianTailDetector(num_arms=NUM_ARMS, tail_mass_threshold=0.01)
+    elif name == "cusum":
+        return detector_module.CusumDetector(num_arms=NUM_ARMS, drift=0.5, threshold=4)
+    elif name == "page_hinkley":
+        return detector_module.PageHinkleyDetector(num_arms=NUM_ARMS, delta=0.1, threshold=5)
+
+
+def get_reward_stream(num_rewards: int):
+    # Mean rewards switch every 150 rewards.
+    rng = numpy.random.default_rng(seed=0)
+    arm_id_array = rng.integers(NUM_ARMS, size=num_rewards)
+    phase_array = (numpy.arange(num_rewards) // 150) % 2
+    reward_array = rng.normal(loc=arm_id_array + 5 * phase_array, scale=1)
+    return arm_id_array, reward_array
+
+
+def test_gaussian_tail_detector_vs_normal_rv():
+    tail_mass_threshold = 0.05
+    detector = detector_module.GaussianTailDetector(num_arms=1, tail_mass_threshold=tail_mass_threshold)
+
+    mean, stdev = 2, 1.5
+    reward_rv = rv.Normal(mu=mean, sigma=stdev)
+    for reward in numpy.linspace(-5, 9, 101).tolist():
+        tail_mass = min(reward_rv.tail_prob(reward), reward_rv.cdf(reward))
+        detected = detector.observe(arm_id=0, reward=reward, mean=mean, stdev=stdev)
+        check(detected == (tail_mass <= tail_mass_threshold), "", reward=reward, tail_mass=tail_mass, detected=detected)
+
+
+@pytest.mark.parametrize("detector_name", ["gaussian_tail", "cusum", "page_hinkley"])
+def test_observe_batch_vs_observe(detector_name: str):
+    agent = agent_module.ThompsonSamplingAgent_resetWinOnRareEvent(
+        name="TS-ResetWin", num_arms=NUM_ARMS, win_len=30, change_detector=get_change_detector(detector_name),
+    )
+    agent_w_batch = agent_module.ThompsonSamplingAgent_resetWinOnRareEvent(
+        name="TS-ResetWin", num_arms=NUM_ARMS, win_len=30, change_detector=get_change_detector(detector_name),
+    )
+
+    num_resets = 0
+    arm_id_array, reward_array = get_reward_stream(num_rewards=1000)
+    for arm_id, reward in zip(arm_id_array.tolist(), reward_array.tolist()):
+        num_rewards = agent.reward_window.num_rewards(arm_id=arm_id)
+        agent.observe(arm_id=arm_id, reward=reward)
+        if num_rewards > 0 and agent.reward_window.num_rewards(arm_id=arm_id) == 0:
+            num_resets += 1
+
+    for batch_index in range(0, 1000, 100):
+        agent_w_batch.observe_batch(
+            arm_ids=arm_id_array[batch_index : batch_index + 100],
+            rewards=reward_array[batch_index : batch_index + 100],
+        )
+
+    log(INFO, "", detector_name=detector_name, num_resets=num_resets)
+    check(num_resets > 0, "", num_resets=num_resets)
+    for arm_id in range(NUM_ARMS):
+        numpy.testing.assert_allclose(
+            agent_w_batch.reward_window.reward_array(arm_id=arm_id),
+            agent.reward_window.reward_array(arm_id=arm_id),
+        )
+
+    mean_array, stdev_array = agent.mean_stdev_reward_arrays()
+    mean_array_w_batch, stdev_array_w_batch = agent_w_batch.mean_stdev_reward_arrays()
+    numpy.testing.assert_allclose(mean_array_w_batch, mean_array, rtol=1e-9)
+    numpy.testing.assert_allclose(stdev_array_w_batch, stdev_array, rtol=1e-6)
+
+
+def test_detector_w_invalid_params():
+    for get_detector in (
+        lambda: detector_module.CusumDetector(num_arms=NUM_ARMS, drift=-1),
+        lambda: detector_module.CusumDetector(num_arms=NUM_ARMS, threshold=0),
+        lambda: detector_module.PageHinkleyDetector(num_arms=NUM_ARMS, delta=-1),
+        lambda: detector_module.PageHinkleyDetector(num_arms=NUM_ARMS, threshold=0),
+    ):
+        with pytest.raises(AssertionError):
+            get_detector()
@@ -0,0 +1,39 @@
+import numpy
+
+from src.agent import agent as agent_module
+from src.utils.debug import *
+
+
+def test_observe_batch_vs_observe():
+    num_arms = 4
+    agent = agent_module.ThompsonSamplingAgent_discounted(name="TS-Discounted", num_arms=num_arms, discount=0.97)
+    agent_w_batch = agent_module.ThompsonSamplingAgent_discounted(name="TS-Discounted", num_arms=num_arms, discount=0.97)
+
+    rng = numpy.random.default_rng(seed=0)
+    arm_id_array = rng.integers(num_arms, size=1000)
+    reward_array = rng.normal(loc=arm_id_array * 10, scale=1 + arm_id_array)
+
+    for arm_id, reward in zip(arm_id_array.tolist(), reward_array.tolist()):
+        agent.observe(arm_id=arm_id, reward=reward)
+    for batch_index in range(0, 1000, 70):
+        agent_w_batch.observe_batch(arm_ids=arm_id_array[batch_index : batch_index + 70], rewards=reward_array[batch_index : batch_index + 70])
+
+    check(agent.round_index == agent_w_batch.round_index == 1000, "")
+    numpy.testing.assert_allclose(agent_w_batch.effective_count_array(), agent.effective_count_array(), rtol=1e-9)
+    for array, array_w_batch in zip(agent.mean_stdev_reward_arrays(), agent_w_batch.mean_stdev_reward_arrays()):
+        numpy.testing.assert_allclose(array_w_batch, array, rtol=1e-9)
+
+
+def test_tracks_switching_rewards():
+    agent = agent_module.ThompsonSamplingAgent_discounted(name="TS-Discounted", num_arms=1, discount=0.9)
+    agent_sliding_win = agent_module.ThompsonSamplingAgent_slidingWin(name="TS-SlidingWin", num_arms=1, win_len=20)
+
+    rng = numpy.random.default_rng(seed=0)
+    for mean_reward in (0, 10, 0):
+        for reward in rng.normal(loc=mean_reward, scale=1, size=100).tolist():
+            agent.observe(arm_id=0, reward=reward)
+            agent_sliding_win.observe(arm_id=0, reward=reward)
+
+        mean, _ = agent.mean_stdev_reward(arm_id=0)
+        mean_sliding_win, _ = agent_sliding_win.mean_stdev_reward(arm_id=0)
+        check(abs(mean - mean_reward) < 1 and abs(mean_sliding_win - mean_reward) < 1, "", mean=mean, mean_sliding_win=mean_sliding_win)
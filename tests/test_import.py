@@ -0,0 +1,43 @@
+import json
+import pathlib
+import pytest
+import subprocess
+import sys
+
+from src.utils.debug import *
+
+
+REPO_DIR = pathlib.Path(__file__).resolve().parent.parent
+
+
+# Imports `module_list` in a fresh interpreter, and returns the import time in secs and the
+# heavy modules that got loaded.
+def import_in_subprocess(module_list: list[str]) -> tuple[float, list[str]]:
+    code = (
+        "import json, sys, time\n"
+        "start_time = time.perf_counter()\n"
+        f"for module in {module_list!r}: __import__(module)\n"
+        "duration = time.perf_counter() - start_time\n"
+        "print(json.dumps([duration, [m for m in ('matplotlib', 'scipy') if m in sys.modules]]))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code], cwd=REPO_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    duration, heavy_module_list = json.loads(output.splitlines()[-1])
+    return duration, heavy_module_list
+
+
+@pytest.mark.parametrize(
+    "module_list",
+    [
+        ["src.agent.agent", "src.env.bandit"],
+        ["src.sim.sim"],
+        ["src.sim.plot"],
+    ],
+)
+def test_import_wo_heavy_modules(module_list: list[str]):
+    duration, heavy_module_list = import_in_subprocess(module_list=module_list)
+    log(INFO, "Import time (sec)", module_list=module_list, duration=duration)
+
+    check(heavy_module_list == [], "Heavy modules should be imported lazily", heavy_module_list=heavy_module_list)
+
@@ -0,0 +1,70 @@
+import numpy
+import time
+
+from src.agent import agent as agent_module
+from src.utils.debug import *
+
+
+def get_agent_w_observed_stats(num_arms: int, num_arms_w_high_reward: int, tail_tolerance: float = None) -> agent_module.ThompsonSamplingAgent_full:
+    agent = agent_module.ThompsonSamplingAgent_full(
+        name="TS",
+        num_arms=num_arms,
+        rng=numpy.random.default_rng(seed=0),
+        tail_tolerance=tail_tolerance,
+    )
+
+    rng = numpy.random.default_rng(seed=1)
+    arm_id_array = numpy.repeat(numpy.arange(num_arms), 10)
+    mean_reward_array = numpy.where(arm_id_array < num_arms_w_high_reward, 10 + arm_id_array, 0)
+    agent.observe_batch(arm_ids=arm_id_array, rewards=rng.normal(loc=mean_reward_array, scale=1))
+
+    return agent
+
+
+def test_quantile_index_vs_argmax():
+    num_arms, num_arms_w_high_reward = 1000, 3
+    agent = get_agent_w_observed_stats(num_arms=num_arms, num_arms_w_high_reward=num_arms_w_high_reward)
+    agent_w_index = get_agent_w_observed_stats(num_arms=num_arms, num_arms_w_high_reward=num_arms_w_high_reward, tail_tolerance=1e-6)
+
+    num_actions = 4000
+    action_array = agent.next_actions(num_actions=num_actions)
+    action_array_w_index = agent_w_index.next_actions(num_actions=num_actions)
+
+    freq_array = numpy.bincount(action_array, minlength=num_arms) / num_actions
+    freq_array_w_index = numpy.bincount(action_array_w_index, minlength=num_arms) / num_actions
+    log(INFO, "", freq_array=freq_array[:num_arms_w_high_reward], freq_array_w_index=freq_array_w_index[:num_arms_w_high_reward])
+    numpy.testing.assert_allclose(freq_array, freq_array_w_index, atol=0.05)
+
+
+def test_quantile_index_w_updates():
+    num_arms = 100
+    agent = get_agent_w_observed_stats(num_arms=num_arms, num_arms_w_high_reward=1, tail_tolerance=1e-6)
+    check(agent.next_action() == 0, "")
+
+    # Make arm 50 the best arm, and check that the index picks up the update.
+    for _ in range(100):
+        agent.observe(arm_id=50, reward=100)
+    check(agent.next_action() == 50, "")
+
+    agent.observe_batch(arm_ids=numpy.full(1000, 70), rewards=numpy.full(1000, 1000))
+    check(agent.next_action() == 70, "")
+
+    # Stale entries should not grow the heap beyond the rebuild threshold.
+    check(len(agent.quantile_index.heap) <= 2 * num_arms + 1024, "", heap_len=len(agent.quantile_index.heap))
+
+
+def test_quantile_index_cold_start():
+    # All arms have the prior stats, so a heap draw would visit every arm.
+    num_arms = 200_000
+    agent = agent_module.ThompsonSamplingAgent_full(
+        name="TS", num_arms=num_arms, rng=numpy.random.default_rng(seed=0), tail_tolerance=1e-6
+    )
+
+    start_time = time.perf_counter()
+    action_list = [agent.next_action() for _ in range(10)]
+    duration = time.perf_counter() - start_time
+    log(INFO, "Cold start latency (sec)", num_arms=num_arms, duration=duration / 10)
+
+    check(all(0 <= action < num_arms for action in action_list), "", action_list=action_list)
+    check(len(set(action_list)) > 1, "", action_list=action_list)
+    check(len(agent.quantile_index.heap) == num_arms, "", heap_len=len(agent.quantile_index.heap))
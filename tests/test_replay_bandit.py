@@ -0,0 +1,55 @@
+import numpy
+import pytest
+
+from src.agent import agent as agent_module
+from src.env import bandit as bandit_module
+from src.sim import sim
+from src.utils.debug import *
+
+
+@pytest.fixture
+def reward_matrix_path(tmp_path) -> str:
+    rng = numpy.random.default_rng(seed=0)
+    reward_matrix = rng.normal(loc=[0, 5, 1, 2], scale=1, size=(1000, 4)).astype(numpy.float32)
+    path = str(tmp_path / "reward_matrix.npy")
+    numpy.save(path, reward_matrix)
+    return path
+
+
+def test_replay_bandit(reward_matrix_path: str):
+    reward_matrix = numpy.load(reward_matrix_path)
+    bandit = bandit_module.ReplayBandit.from_npy(reward_matrix_path, num_rounds_per_chunk=64)
+
+    check(isinstance(bandit.reward_matrix, numpy.ndarray) and not isinstance(bandit.reward_matrix, numpy.memmap), "")
+    check(bandit.high_reward_arm_id == 1, "", bandit=bandit)
+    numpy.testing.assert_allclose(bandit.mean_high_reward(), reward_matrix[:, 1].mean(), rtol=1e-6)
+
+    for round_index in range(len(reward_matrix)):
+        check(bandit.pull(arm_id=2) == reward_matrix[round_index, 2], "", round_index=round_index)
+        numpy.testing.assert_array_equal(bandit.pull_many(arm_ids=[3, 0]), reward_matrix[round_index, [3, 0]])
+        check(bandit.pull_high_reward() == reward_matrix[round_index, 1], "", round_index=round_index)
+        check(numpy.shares_memory(bandit.reward_chunk, bandit.reward_matrix), "Chunks should be views")
+
+    with pytest.raises(AssertionError):
+        bandit.pull(arm_id=0)
+
+    bandit.reset()
+    check(bandit.pull(arm_id=0) == reward_matrix[0, 0], "")
+
+
+def test_iter_chunks(reward_matrix_path: str):
+    bandit = bandit_module.ReplayBandit.from_npy(reward_matrix_path, high_reward_arm_id=0)
+    check(bandit.mean_reward_array is None, "Mean rewards should be computed lazily")
+
+    chunk_list = list(bandit.iter_chunks(start_round_index=100, num_rounds_per_chunk=300))
+    check([first_round_index for first_round_index, _ in chunk_list] == [100, 400, 700], "")
+    numpy.testing.assert_array_equal(numpy.concatenate([chunk for _, chunk in chunk_list]), numpy.load(reward_matrix_path)[100:])
+
+
+def test_sim_w_replay_bandit(reward_matrix_path: str):
+    bandit = bandit_module.ReplayBandit.from_npy(reward_matrix_path)
+    agent = agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=bandit.num_arms, rng=numpy.random.default_rng(seed=0))
+
+    mean_sim_result = sim.sim(bandit=bandit, agent_list=[agent], num_rounds=500)
+    check(agent.count_array.argmax() == bandit.high_reward_arm_id, "", count_array=agent.count_array)
+    check(len(mean_sim_result.agent_to_cum_mean_regret_list_map[agent]) == 500, "")
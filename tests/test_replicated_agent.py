@@ -0,0 +1,56 @@
+import numpy
+import pytest
+
+from src.agent import agent as agent_module, replicated
+from src.utils.debug import *
+
+
+def test_replicated_agent_observe_vs_agents():
+    num_arms, num_replicas, num_rounds = 4, 8, 100
+    replicated_agent = replicated.ReplicatedThompsonSamplingAgent_full(
+        name="TS", num_arms=num_arms, num_replicas=num_replicas
+    )
+    agent_list = [agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=num_arms) for _ in range(num_replicas)]
+
+    rng = numpy.random.default_rng(seed=0)
+    for _ in range(num_rounds):
+        arm_id_array = rng.integers(num_arms, size=num_replicas)
+        reward_array = rng.normal(loc=arm_id_array, scale=1)
+
+        replicated_agent.observe(arm_id_array=arm_id_array, reward_array=reward_array)
+        for agent, arm_id, reward in zip(agent_list, arm_id_array.tolist(), reward_array.tolist()):
+            agent.observe(arm_id=arm_id, reward=reward)
+
+    mean_matrix, stdev_matrix = replicated_agent.mean_stdev_reward_matrices()
+    for r, agent in enumerate(agent_list):
+        mean_array, stdev_array = agent.mean_stdev_reward_arrays()
+        numpy.testing.assert_allclose(mean_matrix[r], mean_array, rtol=1e-12)
+        numpy.testing.assert_allclose(stdev_matrix[r], stdev_array, rtol=1e-12)
+
+
+@pytest.mark.parametrize("min_reward", [None, 0])
+def test_replicated_agent_next_actions(min_reward: float):
+    num_arms, num_replicas = 3, 10_000
+    replicated_agent = replicated.ReplicatedThompsonSamplingAgent_full.from_agent(
+        agent=agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=num_arms, min_reward=min_reward),
+        num_replicas=num_replicas,
+        rng=numpy.random.default_rng(seed=0),
+    )
+    check(replicated_agent.min_reward == min_reward, "")
+
+    # Arm 1 has the highest mean in the even replicas and arm 2 in the odd ones.
+    arm_id_array = numpy.where(numpy.arange(num_replicas) % 2 == 0, 1, 2)
+    for _ in range(10):
+        replicated_agent.observe(arm_id_array=arm_id_array, reward_array=numpy.full(num_replicas, 10.0))
+
+    action_array = replicated_agent.next_actions()
+    check(action_array.shape == (num_replicas,), "")
+    check(numpy.mean(action_array == arm_id_array) > 0.99, "", fraction=numpy.mean(action_array == arm_id_array))
+
+
+def test_replicated_agent_from_unsupported_agent():
+    with pytest.raises(AssertionError):
+        replicated.ReplicatedThompsonSamplingAgent_full.from_agent(
+            agent=agent_module.ThompsonSamplingAgent_slidingWin(name="TS-SlidingWin", num_arms=3, win_len=10),
+            num_replicas=2,
+        )
@@ -0,0 +1,78 @@
+import numpy
+
+from src.env import bandit as bandit_module
+from src.prob import rv
+from src.utils.debug import *
+
+
+NUM_ARMS = 5
+
+
+def get_non_stationary_bandit() -> bandit_module.NonStationaryBandit:
+    # Reward classes are told apart by the reward value: high in [10, 11], medium in [5, 6], low in [0, 1].
+    return bandit_module.NonStationaryBandit(
+        num_arms=NUM_ARMS,
+        num_arms_w_high_reward=2,
+        num_arms_w_medium_reward=1,
+        high_reward_rv=rv.Uniform(min_value=10, max_value=11),
+        medium_reward_rv=rv.Uniform(min_value=5, max_value=6),
+        low_reward_rv=rv.Uniform(min_value=0, max_value=1),
+        phase_duration_rv=rv.DiscreteUniform(min_value=3, max_value=3),
+    )
+
+
+def to_reward_class(reward_array: numpy.ndarray) -> numpy.ndarray:
+    return numpy.where(reward_array >= 10, bandit_module.RewardClass.high, numpy.where(reward_array >= 5, bandit_module.RewardClass.medium, bandit_module.RewardClass.low))
+
+
+def test_replicated_vs_single_bandit():
+    num_replicas, num_rounds = 20, 200
+    replicated_bandit = bandit_module.ReplicatedBandit(
+        bandit=get_non_stationary_bandit(), num_replicas=num_replicas, rng=numpy.random.default_rng(seed=0)
+    )
+    bandit_list = [get_non_stationary_bandit() for _ in range(num_replicas)]
+
+    arm_id_matrix = numpy.random.default_rng(seed=1).integers(NUM_ARMS, size=(num_rounds, num_replicas))
+    for arm_id_array in arm_id_matrix:
+        reward_array = replicated_bandit.pull(arm_id_array=arm_id_array)
+        reward_array_ref = numpy.array([bandit.pull(arm_id=arm_id) for bandit, arm_id in zip(bandit_list, arm_id_array.tolist())])
+        numpy.testing.assert_array_equal(to_reward_class(reward_array), to_reward_class(reward_array_ref))
+
+    high_reward_array = replicated_bandit.pull_high_reward()
+    check(high_reward_array.shape == (num_replicas,) and numpy.all(high_reward_array >= 10), "")
+    check(replicated_bandit.mean_high_reward() == 10.5, "")
+
+
+def test_reset():
+    num_replicas = 4
+    replicated_bandit = bandit_module.ReplicatedBandit(bandit=get_non_stationary_bandit(), num_replicas=num_replicas)
+
+    # First pull switches the non-stationary arm to low, and the next 3 pulls keep it low.
+    for _ in range(2):
+        reward_array = replicated_bandit.pull(arm_id_array=numpy.zeros(num_replicas, dtype=int))
+    numpy.testing.assert_array_equal(to_reward_class(reward_array), bandit_module.RewardClass.low)
+
+    replicated_bandit.reset(replica_ids=[0, 2])
+    check(replicated_bandit.phase_duration_matrix[[0, 2]].sum() == 0, "")
+    check(numpy.all(replicated_bandit.phase_duration_matrix[[1, 3], 0] == 2), "")
+
+    for _ in range(3):
+        reward_array = replicated_bandit.pull(arm_id_array=numpy.zeros(num_replicas, dtype=int))
+    # Replicas 1 and 3 switch back to high at their 5th pull, replicas 0 and 2 are still low.
+    numpy.testing.assert_array_equal(
+        to_reward_class(reward_array),
+        [bandit_module.RewardClass.low, bandit_module.RewardClass.high] * 2,
+    )
+
+
+def test_stationary_bandit():
+    bandit = bandit_module.StationaryBandit(
+        num_arms=NUM_ARMS,
+        num_arms_w_high_reward=1,
+        high_reward_rv=rv.Normal(mu=10, sigma=1),
+        low_reward_rv=rv.Normal(mu=1, sigma=1),
+    )
+    replicated_bandit = bandit_module.ReplicatedBandit(bandit=bandit, num_replicas=1000, rng=numpy.random.default_rng(seed=0))
+
+    reward_array = replicated_bandit.pull(arm_id_array=numpy.arange(1000) % 2)
+    numpy.testing.assert_allclose([reward_array[0::2].mean(), reward_array[1::2].mean()], [10, 1], atol=0.2)
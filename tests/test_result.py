@@ -0,0 +1,137 @@
+import numpy
+import pytest
+import sys
+
+from src.agent import agent as agent_module
+from src.sim import result as result_module
+from src.utils.debug import *
+
+
+def get_sim_result_list(
+    agent_list: list[agent_module.Agent], num_sim_runs: int, num_rounds: int, seed: int = 0
+) -> list[result_module.SimResult]:
+    rng = numpy.random.default_rng(seed=seed)
+    sim_result_list = []
+    for _ in range(num_sim_runs):
+        sim_result = result_module.SimResult()
+        for reward in rng.normal(loc=10, scale=1, size=num_rounds).tolist():
+            sim_result.append_high_reward_sample(reward=reward)
+        for agent_index, agent in enumerate(agent_list):
+            for reward in rng.normal(loc=agent_index, scale=2, size=num_rounds).tolist():
+                sim_result.append_reward_sample(agent=agent, reward=reward)
+
+        sim_result_list.append(sim_result)
+
+    return sim_result_list
+
+
+def test_sim_result():
+    agent_list = [agent_module.ThompsonSamplingAgent_full(name=f"TS-{i}", num_arms=2) for i in range(2)]
+    sim_result = result_module.SimResult(agent_list=agent_list[:1], num_rounds=4)
+
+    # Goes beyond `num_rounds`, and adds the second agent on its first reward.
+    for i in range(10):
+        for agent_index, agent in enumerate(agent_list):
+            sim_result.append_reward_sample(agent=agent, reward=i + agent_index / 10, arm_id=agent_index)
+        sim_result.append_high_reward_sample(reward=100 + i)
+
+    check(sim_result.agent_list == agent_list, "")
+    numpy.testing.assert_array_equal(sim_result.reward_array(agent=agent_list[1]), numpy.arange(10) + 0.1)
+    numpy.testing.assert_array_equal(sim_result.arm_id_array(agent=agent_list[1]), numpy.ones(10))
+    numpy.testing.assert_array_equal(sim_result.high_reward_array(), 100 + numpy.arange(10))
+    check(numpy.shares_memory(sim_result.reward_array(agent=agent_list[0]), sim_result.reward_matrix), "")
+    check(numpy.shares_memory(sim_result.high_reward_array(), sim_result.high_reward_buffer), "")
+
+    # Compatibility layer
+    check(sim_result.agent_to_reward_samples_map[agent_list[0]] == [float(i) for i in range(10)], "")
+    check(sim_result.high_reward_sample_list == [100.0 + i for i in range(10)], "")
+
+    sim_result_wo_arm_ids = result_module.SimResult()
+    sim_result_wo_arm_ids.append_reward_sample(agent=agent_list[0], reward=1)
+    numpy.testing.assert_array_equal(sim_result_wo_arm_ids.arm_id_array(agent=agent_list[0]), [-1])
+
+
+def test_sim_result_replace_agents():
+    agent_list = [agent_module.ThompsonSamplingAgent_full(name=f"TS-{i}", num_arms=2) for i in range(2)]
+    sim_result = get_sim_result_list(agent_list=agent_list, num_sim_runs=1, num_rounds=5)[0]
+    reward_array = sim_result.reward_array(agent=agent_list[1]).copy()
+
+    other_agent_list = [agent_module.ThompsonSamplingAgent_full(name=f"TS-{i}", num_arms=2) for i in range(2)]
+    sim_result.replace_agents(agent_list=other_agent_list)
+    numpy.testing.assert_array_equal(sim_result.reward_array(agent=other_agent_list[1]), reward_array)
+
+    with pytest.raises(AssertionError):
+        sim_result.replace_agents(agent_list=[])
+
+
+@pytest.mark.parametrize("dtype", [numpy.float64, numpy.float32])
+def test_sim_result_memory(dtype):
+    agent = agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=2)
+    num_rounds = 100_000
+    sim_result = result_module.SimResult(agent_list=[agent], num_rounds=num_rounds, dtype=dtype)
+    reward_list = []
+    for reward in numpy.random.default_rng(seed=0).random(num_rounds).tolist():
+        sim_result.append_reward_sample(agent=agent, reward=reward)
+        sim_result.append_high_reward_sample(reward=reward)
+        reward_list.append(reward)
+
+    # Lists keep a pointer and a boxed float per reward, for both the rewards and the high rewards.
+    nbytes_w_lists = 2 * (sys.getsizeof(reward_list) + num_rounds * sys.getsizeof(1.0))
+    log(INFO, "", dtype=dtype, nbytes=sim_result.nbytes(), nbytes_w_lists=nbytes_w_lists)
+    check(sim_result.reward_array(agent=agent).dtype == dtype, "")
+    check(sim_result.nbytes() < nbytes_w_lists, "")
+
+
+def test_running_stats():
+    value_matrix = numpy.random.default_rng(seed=0).normal(loc=5, scale=3, size=(100, 20))
+    running_stats = result_module.RunningStats()
+    for value_array in value_matrix:
+        running_stats.add(value_array)
+
+    numpy.testing.assert_allclose(running_stats.mean_array, value_matrix.mean(axis=0), rtol=1e-12)
+    numpy.testing.assert_allclose(running_stats.var_array(), value_matrix.var(axis=0, ddof=1), rtol=1e-12)
+
+    lower_array, upper_array = running_stats.confidence_interval_arrays(confidence=0.95)
+    half_width_array = 1.959963984540054 * value_matrix.std(axis=0, ddof=1) / numpy.sqrt(100)
+    numpy.testing.assert_allclose(upper_array - lower_array, 2 * half_width_array, rtol=1e-12)
+
+    with pytest.raises(AssertionError):
+        running_stats.add(numpy.zeros(10))
+
+
+def test_mean_sim_result():
+    agent_list = [agent_module.ThompsonSamplingAgent_full(name=f"TS-{i}", num_arms=2) for i in range(2)]
+    num_sim_runs, num_rounds = 50, 30
+    sim_result_list = get_sim_result_list(agent_list=agent_list, num_sim_runs=num_sim_runs, num_rounds=num_rounds)
+    mean_sim_result = result_module.MeanSimResult(sim_result_list=sim_result_list)
+    check(mean_sim_result.num_sim_runs == num_sim_runs, "")
+
+    high_reward_matrix = numpy.array([sim_result.high_reward_sample_list for sim_result in sim_result_list])
+    numpy.testing.assert_allclose(mean_sim_result.mean_high_reward_list, high_reward_matrix.mean(axis=0), rtol=1e-12)
+
+    for agent in agent_list:
+        reward_matrix = numpy.array([sim_result.agent_to_reward_samples_map[agent] for sim_result in sim_result_list])
+        numpy.testing.assert_allclose(mean_sim_result.agent_to_mean_rewards_map[agent], reward_matrix.mean(axis=0), rtol=1e-12)
+
+        cum_regret_matrix = numpy.cumsum(high_reward_matrix - reward_matrix, axis=1)
+        numpy.testing.assert_allclose(
+            mean_sim_result.agent_to_cum_mean_regret_list_map[agent], cum_regret_matrix.mean(axis=0), rtol=1e-9
+        )
+
+        lower_array, upper_array = mean_sim_result.cum_regret_confidence_interval_arrays(agent=agent)
+        half_width_array = 1.959963984540054 * cum_regret_matrix.std(axis=0, ddof=1) / numpy.sqrt(num_sim_runs)
+        numpy.testing.assert_allclose((lower_array + upper_array) / 2, cum_regret_matrix.mean(axis=0), rtol=1e-9)
+        numpy.testing.assert_allclose((upper_array - lower_array) / 2, half_width_array, rtol=1e-9)
+
+        lower_array, upper_array = mean_sim_result.mean_reward_confidence_interval_arrays(agent=agent)
+        check(numpy.all(lower_array < reward_matrix.mean(axis=0)) and numpy.all(reward_matrix.mean(axis=0) < upper_array), "")
+
+
+def test_mean_sim_result_w_single_run():
+    agent = agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=2)
+    mean_sim_result = result_module.MeanSimResult()
+    check(mean_sim_result.mean_high_reward_list == [] and mean_sim_result.agent_to_mean_rewards_map == {}, "")
+
+    mean_sim_result.add_sim_result(sim_result=get_sim_result_list(agent_list=[agent], num_sim_runs=1, num_rounds=5)[0])
+    lower_array, _ = mean_sim_result.mean_reward_confidence_interval_arrays(agent=agent)
+    check(numpy.all(numpy.isnan(lower_array)), "")
@@ -0,0 +1,114 @@
+import numpy
+import pytest
+import scipy.stats
+
+from src.prob import rv
+from src.utils.debug import *
+
+
+def get_rv_list(rng: numpy.random.Generator = None) -> list[rv.RandomVariable]:
+    return [
+        rv.Normal(mu=5, sigma=2, rng=rng),
+        rv.TruncatedNormal(mu=1, sigma=2, rng=rng),
+        rv.Exponential(mu=2, D=1, rng=rng),
+        rv.Uniform(min_value=-1, max_value=3, rng=rng),
+        rv.DiscreteUniform(min_value=2, max_value=6, rng=rng),
+        rv.CustomDiscrete(value_list=[1, 10, 100], prob_weight_list=[1, 2, 1], rng=rng),
+        rv.BoundedZipf(min_value=1, max_value=50, a=1.5, rng=rng),
+    ]
+
+
+@pytest.mark.parametrize("rv_index", range(len(get_rv_list())))
+def test_sample(rv_index: int):
+    random_variable = get_rv_list(rng=numpy.random.default_rng(seed=0))[rv_index]
+
+    sample = random_variable.sample()
+    check(numpy.ndim(sample) == 0, "", random_variable=random_variable, sample=sample)
+
+    sample_array = random_variable.sample(size=10_000)
+    check(isinstance(sample_array, numpy.ndarray) and sample_array.shape == (10_000,), "", random_variable=random_variable)
+    check(
+        numpy.all((sample_array >= random_variable.min_value) & (sample_array <= random_variable.max_value)),
+        "", random_variable=random_variable,
+    )
+    if hasattr(random_variable, "mean"):
+        numpy.testing.assert_allclose(sample_array.mean(), random_variable.mean(), rtol=0.05)
+
+    # Same seed should give the same samples.
+    random_variable_w_same_seed = get_rv_list(rng=numpy.random.default_rng(seed=0))[rv_index]
+    random_variable_w_same_seed.sample()
+    numpy.testing.assert_array_equal(random_variable_w_same_seed.sample(size=10_000), sample_array)
+
+
+@pytest.mark.parametrize("rv_index", range(len(get_rv_list())))
+@pytest.mark.parametrize("block_size", [1, 7, 4096])
+def test_buffered_rv(rv_index: int, block_size: int):
+    random_variable = get_rv_list(rng=numpy.random.default_rng(seed=0))[rv_index]
+    if isinstance(random_variable, rv.TruncatedNormal):
+        with pytest.raises(AssertionError):
+            rv.BufferedRandomVariable(random_variable=random_variable, block_size=block_size)
+        return
+
+    buffered_rv = rv.BufferedRandomVariable(
+        random_variable=get_rv_list(rng=numpy.random.default_rng(seed=0))[rv_index],
+        block_size=block_size,
+    )
+    if hasattr(random_variable, "mean"):
+        check(buffered_rv.mean() == random_variable.mean(), "", buffered_rv=buffered_rv)
+
+    sample_list = [buffered_rv.sample() for _ in range(10)]
+    sample_array = buffered_rv.sample(size=1000)
+    check(buffered_rv.sample(size=0).shape == (0,), "", buffered_rv=buffered_rv)
+    check(
+        numpy.all((sample_array >= random_variable.min_value) & (sample_array <= random_variable.max_value)),
+        "", buffered_rv=buffered_rv,
+    )
+
+    # Buffering should not change the samples.
+    numpy.testing.assert_array_equal(sample_list, [random_variable.sample() for _ in range(10)])
+    numpy.testing.assert_array_equal(sample_array, random_variable.sample(size=1000))
+
+
+@pytest.mark.parametrize(
+    "lower, upper",
+    [
+        (0, 21),  # Rejection from Normal
+        (2, 3),  # Inverse-CDF
+        (-3, -2),  # Inverse-CDF, mirrored
+        (5, 5.01),  # Inverse-CDF over a narrow region
+        (40, numpy.inf),  # Rejection from Exponential
+        (-numpy.inf, -45),  # Rejection from Exponential, mirrored
+    ],
+)
+def test_sample_truncated_normal(lower: float, upper: float):
+    mu, sigma = 0.5, 1.5
+    dist = scipy.stats.truncnorm(a=(lower - mu) / sigma, b=(upper - mu) / sigma, loc=mu, scale=sigma)
+
+    sample_array = rv.sample_truncated_normal(
+        rng=numpy.random.default_rng(seed=0), mu=mu, sigma=sigma, lower=lower, upper=upper, size=20_000
+    )
+    check(numpy.all((sample_array >= lower) & (sample_array <= upper)), "")
+    check(scipy.stats.kstest(sample_array, dist.cdf).pvalue > 0.001, "", lower=lower, upper=upper)
+
+    # Scalar samples should consume `rng` like the batch of a single element.
+    rng, rng_w_array = numpy.random.default_rng(seed=1), numpy.random.default_rng(seed=1)
+    for _ in range(100):
+        sample = rv.sample_truncated_normal(rng=rng, mu=mu, sigma=sigma, lower=lower, upper=upper)
+        sample_w_array = rv.sample_truncated_normal(rng=rng_w_array, mu=[mu], sigma=sigma, lower=lower, upper=upper)
+        check(isinstance(sample, float) and sample_w_array.shape == (1,), "")
+        numpy.testing.assert_allclose(sample, sample_w_array[0], rtol=1e-12)
+
+
+def test_sample_truncated_normal_w_param_arrays():
+    rng = numpy.random.default_rng(seed=0)
+    num_arms = 1000
+    mu_array = numpy.linspace(-5, 5, num_arms)
+    sigma_array = numpy.full(num_arms, 0.5)
+
+    sample_matrix = rv.sample_truncated_normal(
+        rng=rng, mu=mu_array, sigma=sigma_array, lower=0, upper=numpy.inf, size=(200, num_arms)
+    )
+    check(sample_matrix.shape == (200, num_arms) and numpy.all(sample_matrix >= 0), "")
+
+    mean_array = scipy.stats.truncnorm(a=-mu_array / sigma_array, b=numpy.inf, loc=mu_array, scale=sigma_array).mean()
+    numpy.testing.assert_allclose(sample_matrix.mean(axis=0), mean_array, rtol=0.1, atol=0.02)
@@ -0,0 +1,59 @@
+import asyncio
+import numpy
+
+from src.agent import agent as agent_module
+from src.serve import server as server_module
+from src.utils.debug import *
+
+
+def test_decision_server_w_micro_batching():
+    num_arms, num_requests, max_batch_size = 5, 2000, 64
+
+    async def run():
+        agent = agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=num_arms, rng=numpy.random.default_rng(seed=0))
+        async with server_module.DecisionServer(agent=agent, max_batch_size=max_batch_size, max_wait=0.002) as server:
+            client = server_module.LocalClient(server=server)
+
+            rng = numpy.random.default_rng(seed=1)
+            reward_func = lambda arm_id: rng.normal(loc=arm_id, scale=0.1)
+            arm_id_list = await asyncio.gather(
+                *[client.decide_and_feedback(reward_func=reward_func) for _ in range(num_requests)]
+            )
+
+        return agent, server, arm_id_list
+
+    agent, server, arm_id_list = asyncio.run(run())
+
+    check(len(arm_id_list) == num_requests, "")
+    check(all(0 <= arm_id < num_arms for arm_id in arm_id_list), "")
+    check(int(agent.count_array.sum()) == num_requests, "", count_array=agent.count_array)
+
+    # Each request is served in two batches (decision and feedback), so batching should cut
+    # the number of batches well below the number of requests.
+    check(server.num_batches <= 2 * num_requests / 4, "", num_batches=server.num_batches)
+
+    latency_percentiles = server.latency_percentiles()
+    log(INFO, "", num_batches=server.num_batches, latency_percentiles=latency_percentiles)
+    check(set(latency_percentiles.keys()) == {50, 90, 99}, "", latency_percentiles=latency_percentiles)
+    check(latency_percentiles[50] <= latency_percentiles[99], "")
+
+
+def test_decision_server_stop_fails_pending_requests():
+    async def run():
+        agent = agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=3)
+        server = server_module.DecisionServer(agent=agent, max_batch_size=64, max_wait=10)
+        await server.start()
+
+        # The first request is dequeued into a batch that waits for `max_wait`, and the
+        # second one may still be in the queue.
+        task_list = [asyncio.create_task(server.decide()) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        await server.stop()
+
+        # Requests after `stop()` fail right away.
+        task_list.append(asyncio.create_task(server.decide()))
+
+        return await asyncio.wait_for(asyncio.gather(*task_list, return_exceptions=True), timeout=1)
+
+    result_list = asyncio.run(run())
+    check(all(isinstance(result, RuntimeError) for result in result_list), "", result_list=result_list)
@@ -0,0 +1,191 @@
+import functools
+import numpy
+import pytest
+
+from src.agent import agent as agent_module
+from src.env import bandit as bandit_module
+from src.prob import rv
+from src.sim import result as result_module, sim
+from src.utils.debug import *
+
+
+NUM_ARMS = 3
+
+
+def get_bandit(rng: numpy.random.Generator) -> bandit_module.Bandit:
+    return bandit_module.NonStationaryBandit(
+        num_arms=NUM_ARMS,
+        num_arms_w_high_reward=1,
+        num_arms_w_medium_reward=1,
+        high_reward_rv=rv.Normal(mu=10, sigma=1, rng=rng),
+        medium_reward_rv=rv.Normal(mu=5, sigma=1, rng=rng),
+        low_reward_rv=rv.Normal(mu=1, sigma=1, rng=rng),
+        phase_duration_rv=rv.DiscreteUniform(min_value=10, max_value=20, rng=rng),
+    )
+
+
+def get_agent_list(rng: numpy.random.Generator, win_len: int = 20) -> list[agent_module.Agent]:
+    return [
+        agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=NUM_ARMS, rng=rng),
+        agent_module.ThompsonSamplingAgent_slidingWin(name="TS-SlidingWin", num_arms=NUM_ARMS, win_len=win_len, rng=rng),
+    ]
+
+
+def sim_parallel(num_workers: int, num_rounds: int = 20, num_sim_runs: int = 4):
+    return sim.sim_parallel(
+        bandit_factory=get_bandit,
+        agent_list_factory=functools.partial(get_agent_list, win_len=10),
+        num_rounds=num_rounds,
+        num_sim_runs=num_sim_runs,
+        num_workers=num_workers,
+        seed=0,
+    )
+
+
+def test_sim_parallel_does_not_depend_on_num_workers():
+    mean_sim_result = sim_parallel(num_workers=1)
+    check([agent.name for agent in mean_sim_result.agent_to_mean_rewards_map] == ["TS", "TS-SlidingWin"], "")
+    check(len(mean_sim_result.mean_high_reward_list) == 20, "")
+
+    for num_workers in [2, 3]:
+        mean_sim_result_w_workers = sim_parallel(num_workers=num_workers)
+        check(mean_sim_result_w_workers.mean_high_reward_list == mean_sim_result.mean_high_reward_list, "")
+        for mean_reward_list, mean_reward_list_w_workers in zip(
+            mean_sim_result.agent_to_mean_rewards_map.values(),
+            mean_sim_result_w_workers.agent_to_mean_rewards_map.values(),
+        ):
+            check(mean_reward_list == mean_reward_list_w_workers, "")
+
+
+def test_sim_single_run_w_factories_is_reproducible():
+    # The bandit and agents are built fresh from the seed, so nothing carries over from an earlier run.
+    sim_result = sim.sim_single_run_w_factories(
+        bandit_factory=get_bandit,
+        agent_list_factory=get_agent_list,
+        num_rounds=5,
+        seed_sequence=numpy.random.SeedSequence(0),
+    )
+    sim_result_again = sim.sim_single_run_w_factories(
+        bandit_factory=get_bandit,
+        agent_list_factory=get_agent_list,
+        num_rounds=5,
+        seed_sequence=numpy.random.SeedSequence(0),
+    )
+    check(
+        list(sim_result.agent_to_reward_samples_map.values()) == list(sim_result_again.agent_to_reward_samples_map.values()),
+        "",
+    )
+    check(sim_result.high_reward_sample_list == sim_result_again.high_reward_sample_list, "")
+    for agent in sim_result.agent_list:
+        arm_id_array = sim_result.arm_id_array(agent=agent)
+        check(len(arm_id_array) == 5 and numpy.all((0 <= arm_id_array) & (arm_id_array < NUM_ARMS)), "")
+
+
+def test_sim_single_run_w_factories_returns_agent_keys():
+    sim_result = sim.sim_single_run_w_factories(
+        bandit_factory=get_bandit,
+        agent_list_factory=get_agent_list,
+        num_rounds=1,
+        seed_sequence=numpy.random.SeedSequence(0),
+    )
+    check(
+        sim_result.agent_list == [result_module.AgentKey(index=0, name="TS"), result_module.AgentKey(index=1, name="TS-SlidingWin")],
+        "",
+        agent_list=sim_result.agent_list,
+    )
+
+
+def get_stationary_bandit(rng: numpy.random.Generator = None) -> bandit_module.Bandit:
+    return bandit_module.StationaryBandit(
+        num_arms=NUM_ARMS,
+        num_arms_w_high_reward=1,
+        high_reward_rv=rv.Normal(mu=10, sigma=1, rng=rng),
+        low_reward_rv=rv.Normal(mu=5, sigma=2, rng=rng),
+    )
+
+
+def get_ts_agent_list(rng: numpy.random.Generator = None) -> list[agent_module.Agent]:
+    return [agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=NUM_ARMS, rng=rng)]
+
+
+def test_sim_vectorized_vs_sim_parallel():
+    num_rounds = 20
+    agent_list = get_ts_agent_list()
+    mean_sim_result = sim.sim_vectorized(
+        bandit=get_stationary_bandit(), agent_list=agent_list, num_rounds=num_rounds, num_sim_runs=2000, seed=0
+    )
+    check(list(mean_sim_result.agent_to_mean_rewards_map) == agent_list, "")
+    check(len(mean_sim_result.agent_to_cum_mean_regret_list_map[agent_list[0]]) == num_rounds, "")
+
+    mean_sim_result_ref = sim.sim_parallel(
+        bandit_factory=get_stationary_bandit,
+        agent_list_factory=get_ts_agent_list,
+        num_rounds=num_rounds,
+        num_sim_runs=40,
+        num_workers=1,
+        seed=0,
+    )
+
+    mean_reward_list = next(iter(mean_sim_result.agent_to_mean_rewards_map.values()))
+    mean_reward_list_ref = next(iter(mean_sim_result_ref.agent_to_mean_rewards_map.values()))
+    numpy.testing.assert_allclose(numpy.mean(mean_reward_list), numpy.mean(mean_reward_list_ref), atol=0.5)
+    numpy.testing.assert_allclose(mean_sim_result.mean_high_reward_list, 10, atol=0.2)
+    lower_array, upper_array = mean_sim_result.cum_regret_confidence_interval_arrays(agent=agent_list[0])
+    cum_mean_regret_array = numpy.array(mean_sim_result.agent_to_cum_mean_regret_list_map[agent_list[0]])
+    numpy.testing.assert_allclose((lower_array + upper_array) / 2, cum_mean_regret_array, rtol=1e-9, atol=1e-9)
+    check(numpy.all(upper_array - lower_array > 0), "")
+
+    # The first action is drawn from the prior, so it is the high reward arm with prob 1 / NUM_ARMS.
+    numpy.testing.assert_allclose(mean_reward_list[0], (10 + 5 * (NUM_ARMS - 1)) / NUM_ARMS, atol=0.3)
+
+
+def test_sim_vectorized_vs_sim_single_run():
+    # With a single run, `sim_vectorized()` draws the same samples as `sim_single_run()` with the
+    # bandit and agents on the same child RNGs of `SeedSequence(seed)`.
+    num_rounds, seed = 30, 0
+    agent_list = [
+        agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=NUM_ARMS),
+        agent_module.ThompsonSamplingAgent_full(name="TS-MinReward", num_arms=NUM_ARMS, min_reward=0),
+    ]
+    mean_sim_result = sim.sim_vectorized(
+        bandit=get_stationary_bandit(), agent_list=agent_list, num_rounds=num_rounds, num_sim_runs=1, seed=seed
+    )
+
+    bandit_seed_sequence, *agent_seed_sequence_list = numpy.random.SeedSequence(seed).spawn(1 + len(agent_list))
+    agent_list_ref = [
+        agent_module.ThompsonSamplingAgent_full(
+            name=agent.name, num_arms=NUM_ARMS, rng=numpy.random.default_rng(agent_seed_sequence), min_reward=agent.min_reward
+        )
+        for agent, agent_seed_sequence in zip(agent_list, agent_seed_sequence_list)
+    ]
+    mean_sim_result_ref = result_module.MeanSimResult(
+        sim_result_list=[
+            sim.sim_single_run(
+                bandit=get_stationary_bandit(rng=numpy.random.default_rng(bandit_seed_sequence)),
+                agent_list=agent_list_ref,
+                num_rounds=num_rounds,
+            )
+        ]
+    )
+
+    check(mean_sim_result.mean_high_reward_list == mean_sim_result_ref.mean_high_reward_list, "")
+    for agent, agent_ref in zip(agent_list, agent_list_ref):
+        check(
+            mean_sim_result.agent_to_mean_rewards_map[agent] == mean_sim_result_ref.agent_to_mean_rewards_map[agent_ref],
+            "",
+            agent=agent,
+        )
+        numpy.testing.assert_allclose(
+            mean_sim_result.agent_to_cum_mean_regret_list_map[agent],
+            mean_sim_result_ref.agent_to_cum_mean_regret_list_map[agent_ref],
+            rtol=1e-12,
+        )
+
+
+def test_sim_vectorized_w_unsupported_agent():
+    for agent in (
+        agent_module.ThompsonSamplingAgent_slidingWin(name="TS-SlidingWin", num_arms=NUM_ARMS, win_len=10),
+        agent_module.ThompsonSamplingAgent_full(name="TS", num_arms=NUM_ARMS, tail_tolerance=1e-6),
+    ):
+        with pytest.raises(AssertionError):
+            sim.sim_vectorized(bandit=get_stationary_bandit(), agent_list=[agent], num_rounds=1)
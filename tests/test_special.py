@@ -0,0 +1,146 @@
+import math
+import numpy
+import pytest
+import scipy.stats
+
+from src.prob import rv, special
+from src.utils.debug import *
+
+
+def test_norm():
+    x_array = numpy.linspace(-40, 40, 1001)
+    numpy.testing.assert_allclose(special.norm_pdf(x_array), scipy.stats.norm.pdf(x_array), rtol=1e-12, atol=1e-300)
+    numpy.testing.assert_allclose(special.norm_cdf(x_array), scipy.stats.norm.cdf(x_array), rtol=1e-12, atol=1e-300)
+    numpy.testing.assert_allclose(special.norm_sf(x_array), scipy.stats.norm.sf(x_array), rtol=1e-12, atol=1e-300)
+
+    for x in [-10, -1.5, 0, 2, 10]:
+        check(isinstance(special.norm_cdf(x), float), "", x=x)
+        numpy.testing.assert_allclose(special.norm_cdf(x), scipy.stats.norm.cdf(x), rtol=1e-12)
+
+
+def test_erfc():
+    x_array = numpy.concatenate([numpy.linspace(-6, 27, 100_001), [-numpy.inf, numpy.inf]])
+    numpy.testing.assert_allclose(special.erfc(x_array), [math.erfc(x) for x in x_array], rtol=1e-14, atol=1e-300)
+
+
+def test_norm_ppf():
+    p_array = numpy.concatenate([numpy.logspace(-300, -1, 1000), numpy.linspace(0.01, 0.99, 999), 1 - numpy.logspace(-16, -1, 500)])
+    numpy.testing.assert_allclose(special.norm_ppf(p_array), scipy.stats.norm.ppf(p_array), rtol=1e-13)
+    numpy.testing.assert_array_equal(special.norm_ppf([0, 0.5, 1]), [-numpy.inf, 0, numpy.inf])
+
+    for p in [1e-300, 1e-5, 0.3, 0.975]:
+        numpy.testing.assert_allclose(special.norm_ppf(p), scipy.stats.norm.ppf(p), rtol=1e-13)
+
+
+@pytest.mark.parametrize(
+    "lower, upper",
+    [(0, numpy.inf), (-numpy.inf, 1), (-1, 2), (3, 6), (-30, -25), (0, 10), (3, 3.2)],
+)
+def test_truncated_norm(lower: float, upper: float):
+    mu, sigma = 0.5, 1.5
+    dist = scipy.stats.truncnorm(a=(lower - mu) / sigma, b=(upper - mu) / sigma, loc=mu, scale=sigma)
+
+    mean, std = special.truncated_norm_mean_std(mu=mu, sigma=sigma, lower=lower, upper=upper)
+    numpy.testing.assert_allclose(mean, dist.mean(), rtol=1e-6)
+    numpy.testing.assert_allclose(std, dist.std(), rtol=1e-5)
+
+    x_array = numpy.linspace(max(lower, -50) - 1, min(upper, 50) + 1, 201)
+    numpy.testing.assert_allclose(
+        special.truncated_norm_cdf(x_array, mu=mu, sigma=sigma, lower=lower, upper=upper),
+        dist.cdf(x_array), rtol=1e-6, atol=1e-12,
+    )
+    numpy.testing.assert_allclose(
+        special.truncated_norm_sf(x_array, mu=mu, sigma=sigma, lower=lower, upper=upper),
+        dist.sf(x_array), rtol=1e-6, atol=1e-12,
+    )
+
+
+def test_truncated_norm_vectorized():
+    mu_array = numpy.array([0, 1, -2, 5])
+    sigma_array = numpy.array([1, 0.5, 2, 1])
+    mean_array, std_array = special.truncated_norm_mean_std(mu=mu_array, sigma=sigma_array, lower=0, upper=numpy.inf)
+
+    for i, (mu, sigma) in enumerate(zip(mu_array, sigma_array)):
+        mean, std = special.truncated_norm_mean_std(mu=mu, sigma=sigma, lower=0, upper=numpy.inf)
+        numpy.testing.assert_allclose([mean_array[i], std_array[i]], [mean, std], rtol=1e-12)
+
+
+def test_erfcx():
+    import scipy.special
+
+    x_array = numpy.concatenate([numpy.linspace(0, 30, 10_001), [1e5, 1e9]])
+    numpy.testing.assert_allclose(special.erfcx(x_array), scipy.special.erfcx(x_array), rtol=1e-13)
+    for x in [0, 1, 8, 20, 1e9]:
+        numpy.testing.assert_allclose(special.erfcx(x), scipy.special.erfcx(x), rtol=1e-13)
+
+
+@pytest.mark.parametrize(
+    "lower, upper",
+    [(40, numpy.inf), (-numpy.inf, -40), (40, 41), (-41, -40), (100, numpy.inf)],
+)
+def test_truncated_norm_mean_std_w_far_tail(lower: float, upper: float):
+    # `Z` underflows to 0 over these intervals, while the truncated distribution is well defined.
+    check(scipy.stats.norm.sf(min(abs(lower), abs(upper))) < 1e-300, "")
+    dist = scipy.stats.truncnorm(a=lower, b=upper)
+
+    mean, std = special.truncated_norm_mean_std(mu=0, sigma=1, lower=lower, upper=upper)
+    numpy.testing.assert_allclose(mean, dist.mean(), rtol=1e-9)
+    numpy.testing.assert_allclose(std, dist.std(), rtol=1e-4)
+
+    mean_array, std_array = special.truncated_norm_mean_std(mu=numpy.zeros(20), sigma=1, lower=lower, upper=upper)
+    numpy.testing.assert_allclose(mean_array, mean, rtol=1e-12)
+    numpy.testing.assert_allclose(std_array, std, rtol=1e-12)
+
+
+def test_truncated_norm_mean_std_w_empty_interval():
+    with pytest.raises(AssertionError):
+        special.truncated_norm_mean_std(mu=0, sigma=1, lower=1, upper=1)
+    with pytest.raises(AssertionError):
+        special.truncated_norm_mean_std(mu=numpy.zeros(20), sigma=1, lower=1, upper=1)
+
+
+@pytest.mark.parametrize("mid", [0, 3, -9.9089, 40, 1000])
+def test_truncated_norm_mean_std_w_narrow_interval(mid: float):
+    # Over a narrow interval, the truncated Normal approaches the uniform distribution.
+    lower, upper = mid - 5e-8, mid + 5e-8
+    width = upper - lower
+    mean, std = special.truncated_norm_mean_std(mu=0, sigma=1, lower=lower, upper=upper)
+    numpy.testing.assert_allclose(mean, (lower + upper) / 2, rtol=0, atol=width * 1e-3)
+    numpy.testing.assert_allclose(std, width / numpy.sqrt(12), rtol=1e-9)
+
+
+def test_truncated_norm_mean_std_scalar_vs_array():
+    rng = numpy.random.default_rng(seed=0)
+    lower_array = rng.uniform(-45, 45, size=1000)
+    upper_array = lower_array + 10 ** rng.uniform(-8, 1.5, size=1000)
+
+    mean_list, std_list = zip(
+        *[special.truncated_norm_mean_std(mu=0, sigma=1, lower=lower, upper=upper) for lower, upper in zip(lower_array, upper_array)]
+    )
+    for size in (1000, special.ERFC_ARRAY_MIN_SIZE - 1):
+        mean_array, std_array = special.truncated_norm_mean_std(
+            mu=numpy.zeros(size), sigma=1, lower=lower_array[:size], upper=upper_array[:size]
+        )
+        numpy.testing.assert_allclose(mean_array, mean_list[:size], rtol=1e-12)
+        numpy.testing.assert_allclose(std_array, std_list[:size], rtol=1e-10)
+
+
+@pytest.mark.parametrize("mu, sigma", [(5, 2), (1, 2), (0, 0.1), (-1, 1)])
+def test_rv_closed_forms(mu: float, sigma: float):
+    x_array = numpy.linspace(-10, 10, 101)
+    truncated_normal = rv.TruncatedNormal(mu=mu, sigma=sigma)
+    for random_variable, dist in [
+        (rv.Normal(mu=mu, sigma=sigma), scipy.stats.norm(mu, sigma)),
+        (
+            truncated_normal,
+            scipy.stats.truncnorm(
+                a=(truncated_normal.lower - mu) / sigma, b=(truncated_normal.upper - mu) / sigma, loc=mu, scale=sigma
+            ),
+        ),
+    ]:
+        numpy.testing.assert_allclose(random_variable.cdf(x_array), dist.cdf(x_array), rtol=1e-6, atol=1e-12)
+        numpy.testing.assert_allclose(random_variable.tail_prob(x_array), dist.sf(x_array), rtol=1e-6, atol=1e-12)
+        numpy.testing.assert_allclose(random_variable.mean(), dist.mean(), rtol=1e-6)
+        numpy.testing.assert_allclose(random_variable.std(), dist.std(), rtol=1e-6)
+        for x in x_array[::10]:
+            numpy.testing.assert_allclose(random_variable.cdf(x), dist.cdf(x), rtol=1e-6, atol=1e-12)
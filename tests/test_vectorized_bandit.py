@@ -0,0 +1,71 @@
+import numpy
+
+from src.env import bandit as bandit_module
+from src.prob import family as family_module, rv
+from src.utils.debug import *
+
+
+def get_reward_rv_list(rng: numpy.random.Generator = None) -> list[rv.RandomVariable]:
+    custom_discrete = rv.CustomDiscrete(value_list=[1, 10, 100], prob_weight_list=[1, 2, 1], rng=rng)
+    return [
+        rv.Normal(mu=5, sigma=2),
+        rv.TruncatedNormal(mu=1, sigma=2),
+        rv.Exponential(mu=2, D=1),
+        rv.Uniform(min_value=-1, max_value=3),
+        rv.DiscreteUniform(min_value=2, max_value=6),
+        custom_discrete,
+        rv.Normal(mu=-3, sigma=1),
+        custom_discrete,
+        rv.BoundedZipf(min_value=1, max_value=50, a=1.5, rng=rng),
+    ]
+
+
+def test_group_into_families():
+    reward_rv_list = get_reward_rv_list()
+    family_list, family_id_array, index_in_family_array = family_module.group_into_families(rv_list=reward_rv_list)
+
+    check(len(family_list) == 7, "", family_list=family_list)
+    check(family_id_array[0] == family_id_array[6] and index_in_family_array[6] == 1, "")
+    check(family_id_array[5] == family_id_array[7] and index_in_family_array[7] == 0, "")
+    for i, random_variable in enumerate(reward_rv_list):
+        mean = family_list[family_id_array[i]].mean_array()[index_in_family_array[i]]
+        numpy.testing.assert_allclose(mean, random_variable.mean(), rtol=1e-9)
+
+
+def test_pull_many():
+    reward_rv_list = get_reward_rv_list(rng=numpy.random.default_rng(seed=0))
+    bandit = bandit_module.VectorizedBandit(reward_rv_list=reward_rv_list, rng=numpy.random.default_rng(seed=1))
+    check(bandit.high_reward_arm_id == 5, "", bandit=bandit)
+    numpy.testing.assert_allclose(bandit.mean_high_reward(), reward_rv_list[5].mean())
+
+    num_pulls_per_arm = 20_000
+    arm_id_array = numpy.repeat(numpy.arange(bandit.num_arms), num_pulls_per_arm).reshape(bandit.num_arms, -1)
+    reward_array = bandit.pull_many(arm_ids=arm_id_array)
+    check(reward_array.shape == arm_id_array.shape, "", shape=reward_array.shape)
+
+    for arm_id, random_variable in enumerate(reward_rv_list):
+        check(
+            numpy.all((reward_array[arm_id] >= random_variable.min_value) & (reward_array[arm_id] <= random_variable.max_value)),
+            "", random_variable=random_variable,
+        )
+        numpy.testing.assert_allclose(reward_array[arm_id].mean(), random_variable.mean(), rtol=0.05, atol=0.05)
+
+    check(isinstance(bandit.pull(arm_id=0), float), "")
+
+    # Same seed should give the same rewards.
+    bandit_w_same_seed = bandit_module.VectorizedBandit(
+        reward_rv_list=get_reward_rv_list(rng=numpy.random.default_rng(seed=0)), rng=numpy.random.default_rng(seed=1)
+    )
+    numpy.testing.assert_array_equal(bandit_w_same_seed.pull_many(arm_ids=arm_id_array), reward_array)
+
+
+def test_from_stationary_bandit():
+    bandit = bandit_module.StationaryBandit(
+        num_arms=5, num_arms_w_high_reward=1, high_reward_rv=rv.Normal(mu=10, sigma=1), low_reward_rv=rv.Normal(mu=1, sigma=1)
+    )
+    vectorized_bandit = bandit_module.VectorizedBandit.from_stationary_bandit(bandit=bandit, rng=numpy.random.default_rng(seed=0))
+
+    check(len(vectorized_bandit.family_list) == 1, "", family_list=vectorized_bandit.family_list)
+    check(vectorized_bandit.mean_high_reward() == 10, "")
+    reward_array = vectorized_bandit.pull_many(arm_ids=numpy.zeros((100, 5), dtype=int) + numpy.arange(5))
+    check(numpy.all(reward_array[:, 0].mean() > reward_array[:, 1:].mean(axis=0)), "")
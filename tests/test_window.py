@@ -0,0 +1,59 @@
+import numpy
+import pytest
+
+from src.agent import agent as agent_module, window as window_module
+from src.utils.debug import *
+
+
+@pytest.mark.parametrize("win_len", [1, 7, 50])
+@pytest.mark.parametrize("reward_offset", [0, 1e6])
+def test_ring_buffer_vs_deque(win_len: int, reward_offset: float):
+    num_arms = 4
+    ring_buffer_window = window_module.RingBufferRewardWindow(num_arms=num_arms, win_len=win_len)
+    deque_window = window_module.DequeRewardWindow(num_arms=num_arms, win_len=win_len)
+
+    rng = numpy.random.default_rng(seed=0)
+    for _ in range(2000):
+        arm_id = int(rng.integers(num_arms))
+        if rng.random() < 0.01:
+            ring_buffer_window.clear(arm_id=arm_id)
+            deque_window.clear(arm_id=arm_id)
+            continue
+
+        reward = reward_offset + rng.normal(loc=arm_id, scale=0.5)
+        ring_buffer_window.append(arm_id=arm_id, reward=reward)
+        deque_window.append(arm_id=arm_id, reward=reward)
+
+        check(ring_buffer_window.num_rewards(arm_id) == deque_window.num_rewards(arm_id), "")
+        numpy.testing.assert_array_equal(ring_buffer_window.reward_array(arm_id), deque_window.reward_array(arm_id))
+
+        mean, stdev = ring_buffer_window.mean_stdev_reward(arm_id=arm_id)
+        mean_ref, stdev_ref = deque_window.mean_stdev_reward(arm_id=arm_id)
+        numpy.testing.assert_allclose(mean, mean_ref, rtol=1e-12)
+        numpy.testing.assert_allclose(stdev, stdev_ref, rtol=1e-6, atol=1e-9)
+
+
+def test_agent_w_ring_buffer_vs_deque():
+    num_arms, win_len = 3, 10
+    agent_list = [
+        agent_module.ThompsonSamplingAgent_resetWinOnRareEvent(
+            name="TS-ResetWin",
+            num_arms=num_arms,
+            win_len=win_len,
+            tail_mass_threshold=0.01,
+            window_backend=window_backend,
+        )
+        for window_backend in (window_module.WindowBackend.ring_buffer, window_module.WindowBackend.deque)
+    ]
+
+    rng = numpy.random.default_rng(seed=0)
+    for i in range(500):
+        arm_id = int(rng.integers(num_arms))
+        reward = rng.normal(loc=(arm_id + 10 * (i // 100)), scale=1)
+        for agent in agent_list:
+            agent.observe(arm_id=arm_id, reward=reward)
+
+    mean_array, stdev_array = agent_list[0].mean_stdev_reward_arrays()
+    mean_array_ref, stdev_array_ref = agent_list[1].mean_stdev_reward_arrays()
+    numpy.testing.assert_allclose(mean_array, mean_array_ref, rtol=1e-12)
+    numpy.testing.assert_allclose(stdev_array, stdev_array_ref, rtol=1e-9)